@@ -10,6 +10,7 @@ from textual.binding import Binding
 from textual.screen import Screen
 
 from abacura.config import Config
+from abacura.mud.recording import RecordingError, parse_speed
 from abacura.mud.session import Session
 from abacura.utils import pycharm
 
@@ -23,6 +24,7 @@ class Abacura(App):
     CSS_PATH = ["./css/abacura.css"]
     SCREENS = {}
     START_SESSION: Optional[str] = None
+    REPLAY: Optional[tuple[str, float]] = None
     BINDINGS = [
         Binding("ctrl+d", "toggle_dark", "Toggle dark mode"),
         Binding("ctrl+q", "quit", "Quit", priority=True),
@@ -45,7 +47,12 @@ class Abacura(App):
     def on_mount(self) -> None:
         """When app is mounted, create first session"""
         self.create_session("null")
-        if self.START_SESSION:
+        if self.REPLAY:
+            # replay under the start session name so its configuration and modules are used
+            name = self.START_SESSION or "replay"
+            self.create_session(name)
+            self.sessions[name].replay_file, self.sessions[name].replay_speed = self.REPLAY
+        elif self.START_SESSION:
             self.sessions["null"].connect(self.START_SESSION)
 
     def create_session(self, name: str) -> None:
@@ -78,7 +85,9 @@ class Abacura(App):
 @click.option("-d", "--debug", "debug", type=str)
 @click.option("-s", "--start", "start", type=str)
 @click.option("-i", "--inspector", "inspector", is_flag=True, default=False)
-def main(config, debug, start, inspector):
+@click.option("-r", "--replay", "replay", type=click.Path(exists=True, dir_okay=False))
+@click.option("--speed", "speed", type=str, default="1", help="Replay speed, such as 1, 10x or max")
+def main(config, debug, start, inspector, replay, speed):
     if debug:
         host, port = debug.split(":")
         pycharm.PycharmDebugger().connect(host, int(port))
@@ -105,6 +114,11 @@ def main(config, debug, start, inspector):
     app = Abacura(_config, inspector)
 
     Abacura.START_SESSION = start
+    if replay:
+        try:
+            Abacura.REPLAY = (replay, parse_speed(speed))
+        except RecordingError as exc:
+            raise click.BadParameter(str(exc), param_hint="--speed")
 
     app.run()
 
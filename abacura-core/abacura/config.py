@@ -65,6 +65,10 @@ class Config:
     def ring_log(self, section: str) -> str:
         """Returns the location of the ring log"""
         return Path(os.path.join(self.data_directory(section), "ringlog.db")).as_posix()
+
+    def msdp_history(self, section: str) -> str:
+        """Returns the location of the persisted MSDP history"""
+        return Path(os.path.join(self.data_directory(section), "msdphistory.db")).as_posix()
     
     @property
     def config(self) -> TOMLDocument:
@@ -1,24 +1,76 @@
 """
 The mud module contains Session objects and protocol handlers
 """
-import re
+import time
 import traceback
+from itertools import count
+from typing import Optional
+
+from rich.text import Text
 from rich.traceback import Traceback
-from abacura.utils.renderables import AbacuraError, AbacuraWarning, Panel, box
 
+from abacura.utils import strip_ansi
+from abacura.utils.ansi import ansi_text
+from abacura.utils.renderables import AbacuraError, AbacuraWarning, Panel, box
 
-ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+# shared by every session in the process
+_sequence = count(1)
 
 
 class OutputMessage:
+    """A line of output, with the time it was received and its position in the output of the process
+
+    The stripped line and the rich Text are computed the first time they are used
+    and kept until the message changes.  The Text is shared, copy it before modifying.
+    Actions only strip a line when a trigger matching stripped lines could match it,
+    and the background ring log writer strips logged lines on its own thread.
+    """
+
+    __slots__ = ("_message", "gag", "epoch_ns", "sequence", "_stripped", "_text")
 
     def __init__(self, message: str, gag: bool = False):
-        self.message: str = message
-        if type(message) is str:
-            self.stripped = ansi_escape.sub('', message)
-        else:
-            self.stripped = message
+        self._message = message
         self.gag: bool = gag
+        self.epoch_ns: int = time.time_ns()
+        self.sequence: int = next(_sequence)
+        self._stripped: Optional[str] = None
+        self._text: Optional[Text] = None
+
+    def __getstate__(self) -> dict:
+        return {"message": self._message, "gag": self.gag, "epoch_ns": self.epoch_ns, "sequence": self.sequence}
+
+    def __setstate__(self, state: dict):
+        # messages pickled before __slots__ only have message, stripped and gag
+        self._message = state["message"]
+        self.gag = state.get("gag", False)
+        self.epoch_ns = state.get("epoch_ns") or time.time_ns()
+        self.sequence = state.get("sequence") or next(_sequence)
+        self._stripped = None
+        self._text = None
+
+    @property
+    def message(self) -> str:
+        return self._message
+
+    @message.setter
+    def message(self, message: str):
+        self._message = message
+        self._stripped = None
+        self._text = None
+
+    @property
+    def stripped(self) -> str:
+        if self._stripped is None:
+            message = self._message
+            self._stripped = strip_ansi(message) if type(message) is str else message
+        return self._stripped
+
+    @property
+    def text(self) -> Text:
+        """The message with its ANSI colours as rich Text"""
+        if self._text is None:
+            self._text = ansi_text(self._message)
+        return self._text
 
 
 class BaseSession:
@@ -30,7 +82,7 @@ class BaseSession:
     def debuglog(self, msg, **kwargs):
         """Subclasses will handle this"""
 
-    def outputlog(self, message: OutputMessage):
+    def outputlog(self, message: OutputMessage, render: str = ''):
         """Subclasses will handle this"""
 
     def show_warning(self, msg, title: str = "Warning"):
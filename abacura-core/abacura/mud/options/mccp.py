@@ -0,0 +1,47 @@
+"""MCCP2 and MCCP3 stream compression"""
+from textual import log
+
+from abacura.mud.options import IAC, SE, SB, DO, TelnetOption
+from abacura.mud.telnet import TelnetDecoder, TelnetWriter
+
+COMPRESS2 = b'\x56'
+COMPRESS3 = b'\x57'
+
+
+class MCCP2(TelnetOption):
+    """Server to client compression, inflates the inbound stream after IAC SB COMPRESS2 IAC SE"""
+    code: int = 86
+    name: str = "MCCP2"
+
+    def __init__(self, decoder: TelnetDecoder, writer: TelnetWriter):
+        self.decoder = decoder
+        self.writer = writer
+
+    def will(self) -> None:
+        """IAC WILL handler"""
+        self.writer.write(IAC + DO + COMPRESS2)
+        log.debug("IAC DO MCCP2")
+
+    def sb(self, sb):
+        """IAC SB handler"""
+        log.debug("MCCP2 compression starting")
+        self.decoder.start_decompression()
+
+
+class MCCP3(TelnetOption):
+    """Client to server compression, deflates everything we send after IAC SB COMPRESS3 IAC SE"""
+    code: int = 87
+    name: str = "MCCP3"
+
+    def __init__(self, writer: TelnetWriter):
+        self.writer = writer
+
+    def will(self) -> None:
+        """IAC WILL handler"""
+        if self.writer.compressing:
+            return
+
+        self.writer.write(IAC + DO + COMPRESS3)
+        self.writer.write(IAC + SB + COMPRESS3 + IAC + SE)
+        self.writer.start_compression()
+        log.debug("MCCP3 compression starting")
@@ -1,13 +1,13 @@
 """MSDP telnet option processor"""
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import re
 from typing import Any
 
 from textual import log
 
 from abacura.mud.options import IAC, SE, SB, TelnetOption
-from abacura.mud import OutputMessage
 from abacura.plugins.events import AbacuraMessage
+from abacura.utils import strip_ansi as strip_ansi_codes
 
 VAR = b'\x01'
 VAL = b'\x02'
@@ -16,23 +16,141 @@ TABLE_CLOSE= b'\x04'
 ARRAY_OPEN = b'\x05'
 ARRAY_CLOSE= b'\x06'
 
-#TODO: Move ansi_escape somewhere else, we'll need it for triggers
-ansi_escape = re.compile(r'\x1b(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+# MSDP control characters, once the payload has been decoded to a str
+_VAR, _VAL, _TABLE_OPEN, _TABLE_CLOSE, _ARRAY_OPEN, _ARRAY_CLOSE = "\x01", "\x02", "\x03", "\x04", "\x05", "\x06"
+
+_IAC = re.compile(rb'\xff')
+# end of a name or scalar value
+_STOP = re.compile('[\x01-\x06]')
+# a table body of plain VAR name VAL value pairs, nothing nested and no repeated VAL
+_FLAT_TABLE = re.compile('(?:\x01[^\x01-\x06]*\x02[^\x01-\x06]*)*')
+
+# what an empty value means for variables that are normally a table or array
+EMPTY_VALUES = {"GROUP": list, "REMORT_LEVELS": list, "ROOM_EXITS": dict, "AFFECTS": dict}
+
+
+def _parse_text(text: str, pos: int) -> tuple[str, int]:
+    match = _STOP.search(text, pos)
+    end = len(text) if match is None else match.start()
+    return text[pos:end], end
+
+
+def _parse_value(text: str, pos: int) -> tuple[Any, int]:
+    """Parse the value following a VAL, which may be a scalar, a table or an array"""
+    c = text[pos:pos + 1]
+    if c == _TABLE_OPEN:
+        return _parse_table(text, pos + 1)
+    if c == _ARRAY_OPEN:
+        return _parse_array(text, pos + 1)
+    return _parse_text(text, pos)
+
+
+def _parse_table(text: str, pos: int) -> tuple[dict, int]:
+    """Parse VAR/VAL pairs up to TABLE_CLOSE, a VAR with several VALs becomes a list"""
+    close = text.find(_TABLE_CLOSE, pos)
+    end = len(text) if close < 0 else close
+    segment = text[pos:end]
+    if _FLAT_TABLE.fullmatch(segment):
+        # names and values strictly alternate
+        items = iter(segment.replace(_VAL, _VAR).split(_VAR))
+        next(items)
+        return dict(zip(items, items)), end + 1
+
+    table = {}
+    size = len(text)
+    while pos < size:
+        c = text[pos]
+        if c == _VAR:
+            name, pos = _parse_text(text, pos + 1)
+            values = []
+            while text[pos:pos + 1] == _VAL:
+                value, pos = _parse_value(text, pos + 1)
+                values.append(value)
+            table[name] = values[0] if len(values) == 1 else values if values else ""
+        elif c == _TABLE_CLOSE:
+            return table, pos + 1
+        else:
+            pos += 1
+    return table, pos
+
+
+def _parse_array(text: str, pos: int) -> tuple[list, int]:
+    """Parse VAL items up to ARRAY_CLOSE"""
+    close = text.find(_ARRAY_CLOSE, pos)
+    end = len(text) if close < 0 else close
+    segment = text[pos:end]
+    if _VAR not in segment and _TABLE_OPEN not in segment and _ARRAY_OPEN not in segment:
+        # an array of scalars
+        return segment.split(_VAL)[1:], end + 1
+
+    items = []
+    size = len(text)
+    while pos < size:
+        c = text[pos]
+        if c == _VAL:
+            value, pos = _parse_value(text, pos + 1)
+            items.append(value)
+        elif c == _ARRAY_CLOSE:
+            return items, pos + 1
+        else:
+            pos += 1
+    return items, pos
+
+
+def _decode_text(buf, strip_ansi: bool) -> str:
+    """Decode the payload up to IAC once, stripping ANSI codes from every value in one pass"""
+    view = memoryview(buf)
+    iac = _IAC.search(view)
+    text = str(view if iac is None else view[:iac.start()], "UTF-8", "replace")
+    if strip_ansi:
+        # escape sequences never contain MSDP control characters
+        text = strip_ansi_codes(text)
+    return text
+
+
+def decode_msdp(buf, strip_ansi: bool = False) -> dict[str, Any]:
+    """
+    Decode an MSDP subnegotiation payload into {variable: value}
+
+    Tables become dicts and arrays become lists, nested to any depth.  The
+    payload is decoded from UTF-8 once, and ANSI codes are stripped only when
+    strip_ansi is set.  Decoding stops at IAC, so the payload may include the
+    trailing IAC of the subnegotiation.
+    """
+    return _parse_table(_decode_text(buf, strip_ansi), 0)[0]
+
 
 @dataclass
 class MSDPMessage(AbacuraMessage):
     """
-    MSDP event message
-    :param event_type: defaults to core.msdp
+    MSDP event message, dispatched as core.msdp.<VAR>, use core.msdp.* to receive all variables
+    :param event_type: defaults to core.msdp.<subtype>
     :param subtype: specific MSDP variable changed
     :param value: the new value of the MSDP variable
     :param oldvalue: the original value of the MSDP variable
     """
-    event_type:str = "core.msdp"
+    event_type:str = ""
     subtype: str = ""
     value: str = ""
     oldvalue: str = ""
 
+    def __post_init__(self):
+        if not self.event_type:
+            self.event_type = f"core.msdp.{self.subtype}"
+
+
+@dataclass
+class MSDPBatchMessage(AbacuraMessage):
+    """
+    MSDP batch message, sent at each prompt when msdp_batch is enabled
+    :param event_type: defaults to core.msdp.batch, which core.msdp.* listeners do not receive
+    :param changed: names of the MSDP variables that changed since the last prompt
+    :param values: all current MSDP values
+    """
+    event_type: str = "core.msdp.batch"
+    changed: set = field(default_factory=set)
+    values: dict = field(default_factory=dict)
+
 
 # TODO all these need to use the regular socket to trap send instead of calling writer directly
 class MSDP(TelnetOption):
@@ -48,6 +166,15 @@ class MSDP(TelnetOption):
         self.values = {}
         self.initialized: bool = False
 
+        # opt-in: drop updates that don't change a value and batch the rest until the next prompt
+        config = getattr(session, "config", None)
+        self.batch: bool = bool(config and config.get_specific_option(session.name, "msdp_batch", False))
+        self.changed: set[str] = set()
+        self.updates_received: int = 0
+        self.updates_suppressed: int = 0
+        self.updates_dispatched: int = 0
+        self.batches_dispatched: int = 0
+
     def msdpvar(self, buf) -> tuple[bytes, bytes]:
         """Handle MSDP VAR sequences"""
         buf = buf[1:]
@@ -59,70 +186,19 @@ class MSDP(TelnetOption):
         val, _, remainder = buf.partition(IAC)
         return val, remainder
 
-    # TODO generic handler for MSDP array and tables needed
-    def msdparray(self, buf):
-        """NotImplemented: generic MSDP array parser"""
-
-    def msdptable(self, buf):
-        """NotImplemented: generic MSDP table parser"""
-
-    # TODO move this to abacura-kallisti once we have config options for MSDP parser
-    def parse_reportable_variables(self, buf) -> list:
-        """Kallisti-specific parser for REPORTABLE_VARIABLES"""
-        buf = buf[1:-1]
-        return [x.decode("UTF-8") for x in buf.split(VAL) if len(x) > 1]
-
-    def parse_group(self, buf) -> list:
-        """Kallisti-specifc parser for GROUP"""
-
-        def parse_group_member(line) -> dict:
-            items = line.split(b'\x01')
-            member = {}
-            items = items[1:]
-            for item in items:
-                pair = item.split(b'\x02')
-                #try:
-                #    member[pair[0].decode("UTF-8")] = int(pair[1])
-                #except ValueError:
-                member[pair[0].decode("UTF-8")] = ansi_escape.sub('',pair[1].decode("UTF-8"))
-
-            return member
-
-        # Empty group
-        if buf == b'':
+    def msdparray(self, buf) -> list:
+        """Parse an MSDP array, ARRAY_OPEN VAL ... ARRAY_CLOSE"""
+        text = _decode_text(buf, True)
+        if not text.startswith(_ARRAY_OPEN):
             return []
+        return _parse_array(text, 1)[0]
 
-        buf = buf[3:-2]
-        elements = buf.split(b'\x04\x02\x03')
-
-        log(elements)
-
-        element_list = []
-        for element in elements:
-            log(f"Parsing {element}")
-            element_list.append(parse_group_member(element))
-
-        log(element_list)
-        return element_list
-
-    def parse_exits(self, buf) -> dict:
-        """Kallisti-specific parser for ROOM_EXITS"""
-        if buf == b'':
+    def msdptable(self, buf) -> dict:
+        """Parse an MSDP table, TABLE_OPEN VAR ... VAL ... TABLE_CLOSE"""
+        text = _decode_text(buf, True)
+        if not text.startswith(_TABLE_OPEN):
             return {}
-
-        buf = buf[2:-1]
-
-        items = buf.split(b'\x01')
-
-        exits = {}
-        for item in items:
-            pair = item.split(b'\x02')
-            #try:
-            #    exits[pair[0].decode("UTF-8")] = int(pair[1])
-            #except ValueError:
-            exits[pair[0].decode("UTF-8")] = ansi_escape.sub('',pair[1].decode("UTF-8"))
-
-        return exits
+        return _parse_table(text, 1)[0]
 
     def request_all_values(self) -> None:
         """Automatically request all possible MSDP values"""
@@ -138,45 +214,44 @@ class MSDP(TelnetOption):
 
     def sb(self, sb):
         log.debug("MSDP SB parsing")
-        sb = sb[1:]
-        first = sb[0:1]
-        if first == b'\x01':
-            varname, sb = self.msdpvar(sb)
-            var = varname.decode("UTF-8")
-            value, sb = self.msdpval(sb)
-            oldvalue = self.values.setdefault(var,None)
-
-            if var == "REPORTABLE_VARIABLES":
-                #self.handler(f"MSDP: Requesting all variables from {var}")
-                self.values[var] = self.parse_reportable_variables(value)
-                if not self.initialized:
-                    self.request_all_values()
-                    self.initialized = True
-            elif var == "GROUP":
-                self.values[var] = self.parse_group(value)
-            elif var == "REMORT_LEVELS":
-                self.values[var] = self.parse_group(value)
-            elif var == "ROOM_EXITS":
-                self.values[var] = self.parse_exits(value)
-            elif var == "AFFECTS":
-                self.values[var] = self.parse_exits(value)
-            else:
-                self.values[var] = ansi_escape.sub('',value.decode("UTF-8"))
-                #try:
-                #    self.values[var] = int(self.values[var])
-                #except ValueError:
-                #    pass
-
-            # Write into the output log for debugging timing issues
-            self.session.outputlog(OutputMessage(f"!MSDP_{var}={value.decode()}"))
-
-            # Two dispatchs here, first is for all-value listeners
-            msg = MSDPMessage(subtype=var, value=self.values[var], oldvalue=oldvalue)
-            self.session.dispatch(msg)
-            # Second dispatch for variable-specific listeners
-            msg.event_type = f"core.msdp.{var}"
-            self.session.dispatch(msg)
-
-        else:
+        payload = memoryview(sb)[1:]
+        if payload[0:1] != VAR:
             # TODO this is a candidate for some kind of protocol.log
-            self.handler(f"MSDP: Don't know how to handle {sb}")
+            self.handler(f"MSDP: Don't know how to handle {bytes(payload)}")
+            return
+
+        for var, value in decode_msdp(payload, strip_ansi=True).items():
+            self.updates_received += 1
+            oldvalue = self.values.setdefault(var, None)
+
+            if value == "" and var in EMPTY_VALUES:
+                value = EMPTY_VALUES[var]()
+
+            if self.batch:
+                if value == oldvalue:
+                    self.updates_suppressed += 1
+                    continue
+                self.changed.add(var)
+
+            self.values[var] = value
+
+            if var == "REPORTABLE_VARIABLES" and not self.initialized:
+                self.request_all_values()
+                self.initialized = True
+
+            # Keep a history of changes for debugging timing issues
+            if value != oldvalue:
+                self.session.msdp_history.record(var, value)
+
+            # One dispatch reaches core.msdp.<VAR> and core.msdp.* listeners, and deprecated core.msdp ones
+            self.session.dispatch(MSDPMessage(subtype=var, value=value, oldvalue=oldvalue))
+            self.updates_dispatched += 1
+
+    def end_batch(self) -> None:
+        """A prompt arrived, send one core.msdp.batch message for everything that changed since the last one"""
+        if not self.changed:
+            return
+
+        changed, self.changed = self.changed, set()
+        self.batches_dispatched += 1
+        self.session.dispatch(MSDPBatchMessage(changed=changed, values=self.values))
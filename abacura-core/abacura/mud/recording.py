@@ -0,0 +1,129 @@
+"""Raw session recordings and timed replay
+
+A recording is a header followed by one record per socket read:
+an 8 byte offset in nanoseconds since the recording started, a 4 byte
+length and the raw inbound bytes, exactly as they arrived from the server.
+"""
+from __future__ import annotations
+
+import struct
+import time
+from collections import Counter
+from typing import BinaryIO, Callable, Iterator, Optional
+
+RECORDING_MAGIC = b'ABACURA-REC\x01'
+RECORD_HEADER = struct.Struct('<QI')
+
+
+class RecordingError(Exception):
+    pass
+
+
+class SessionRecorder:
+    """Append raw inbound socket data with monotonic timestamps to a file"""
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.file: Optional[BinaryIO] = open(filename, "wb")
+        self.file.write(RECORDING_MAGIC)
+        self.start_ns = time.monotonic_ns()
+        self.records: int = 0
+        self.bytes_recorded: int = 0
+
+    def record(self, data: bytes) -> None:
+        if self.file is None:
+            return
+
+        self.file.write(RECORD_HEADER.pack(time.monotonic_ns() - self.start_ns, len(data)))
+        self.file.write(data)
+        self.records += 1
+        self.bytes_recorded += len(data)
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def is_recording(filename: str) -> bool:
+    with open(filename, "rb") as f:
+        return f.read(len(RECORDING_MAGIC)) == RECORDING_MAGIC
+
+
+def read_recording(filename: str) -> Iterator[tuple[int, bytes]]:
+    """Yield (offset_ns, data) for each record in a recording"""
+    with open(filename, "rb") as f:
+        if f.read(len(RECORDING_MAGIC)) != RECORDING_MAGIC:
+            raise RecordingError(f"{filename} is not an abacura recording")
+
+        while header := f.read(RECORD_HEADER.size):
+            if len(header) < RECORD_HEADER.size:
+                raise RecordingError(f"{filename} is truncated")
+            offset_ns, length = RECORD_HEADER.unpack(header)
+            yield offset_ns, f.read(length)
+
+
+def parse_speed(speed: str) -> float:
+    """Convert a replay speed such as '1', '10x' or 'max' into a multiplier, 0 means unthrottled"""
+    speed = speed.strip().lower()
+    if speed == "max":
+        return 0
+
+    try:
+        multiplier = float(speed.rstrip("x"))
+    except ValueError:
+        raise RecordingError(f"Invalid replay speed '{speed}'")
+
+    if multiplier <= 0:
+        raise RecordingError(f"Invalid replay speed '{speed}'")
+    return multiplier
+
+
+class ReplayWriter:
+    """Stands in for the StreamWriter during a replay, discarding everything sent"""
+
+    def __init__(self):
+        self.bytes_discarded: int = 0
+        self.closed: bool = False
+
+    def write(self, data: bytes) -> None:
+        self.bytes_discarded += len(data)
+
+    def is_closing(self) -> bool:
+        return self.closed
+
+    def close(self) -> None:
+        self.closed = True
+
+    async def drain(self) -> None:
+        pass
+
+
+class StageTimer:
+    """Accumulate call counts and elapsed time for the stages of the output pipeline"""
+
+    def __init__(self):
+        self.elapsed_ns = Counter()
+        self.calls = Counter()
+        self.depth = Counter()
+
+    def wrap(self, stage: str, fn: Callable) -> Callable:
+        elapsed_ns = self.elapsed_ns
+        calls = self.calls
+        depth = self.depth
+
+        def timed(*args, **kwargs):
+            calls[stage] += 1
+            if depth[stage]:
+                # the outer call of the same stage is already timing this one
+                return fn(*args, **kwargs)
+
+            depth[stage] += 1
+            start = time.perf_counter_ns()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed_ns[stage] += time.perf_counter_ns() - start
+                depth[stage] -= 1
+
+        return timed
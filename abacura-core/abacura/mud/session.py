@@ -6,7 +6,7 @@ import re
 import time
 from datetime import datetime
 from importlib import import_module
-from typing import TYPE_CHECKING, Optional, Union, Any, Generator
+from typing import TYPE_CHECKING, Optional, Union, Any, Generator, List, Tuple
 
 from rich.segment import Segment, Segments
 from rich.style import Style
@@ -20,13 +20,17 @@ from abacura.config import Config
 from abacura.mud import BaseSession, OutputMessage
 from abacura.mud.logger import AbacuraLogger
 from abacura.mud.options.msdp import MSDP
+from abacura.mud.telnet import TelnetWriter
 from abacura.plugins import command, ContextProvider, CommandError, CommandArgumentError
 from abacura.plugins.director import Director
+from abacura.plugins.events import AbacuraMessage
 from abacura.plugins.loader import PluginLoader
 from abacura.plugins.task_queue import TaskManager
 from abacura.screens import SessionScreen
+from abacura.utils.ansi import ansi_text
 from abacura.utils.fifo_buffer import FIFOBuffer
-from abacura.utils.ring_buffer import RingBufferLogSql
+from abacura.utils.msdp_history import MSDPHistory
+from abacura.utils.ring_buffer import LogKey, RingBufferLogSql
 from abacura.utils.renderables import AbacuraPanel, tabulate
 
 
@@ -62,11 +66,17 @@ class Session(BaseSession):
         self.name = name
         self.host: Optional[str] = None
         self.port: Optional[int] = None
-        self.writer: Optional[asyncio.StreamWriter] = None
+        self.replay_file: Optional[str] = None
+        self.replay_speed: float = 1
+        self.writer: Optional[TelnetWriter] = None
         self.tl: Optional[RichLog] = None
         self.debugtl: Optional[RichLog] = None
         self.output_history: FIFOBuffer = FIFOBuffer(1000)
 
+        history_filename = self.config.msdp_history(name) if self.config.get_specific_option(name, "msdp_persist") else ''
+        self.msdp_history = MSDPHistory(history_filename,
+                                        max_age=self.config.get_specific_option(name, "msdp_history_seconds", 3600),
+                                        max_changes=self.config.get_specific_option(name, "msdp_history_size", 10000))
         self.core_msdp: MSDP = MSDP(self.output, self.send, self)
         self.options = {}
 
@@ -75,6 +85,14 @@ class Session(BaseSession):
 
         self.writer = None
         self.connected = False
+
+        # lines waiting to be written to the RichLog at the end of the read burst or frame
+        self.pending_output: list = []
+        self.pending_since: float = 0
+        self.frame_interval: float = self.config.get_specific_option(name, "output_frame_ms", 16) / 1000
+        self.frames: int = 0
+        self.frame_lines: int = 0
+
         self.command_char = self.config.get_specific_option(self.name, "command_char", "#")
 
         self.speedwalk_re = re.compile(speedwalk_pattern)
@@ -84,13 +102,15 @@ class Session(BaseSession):
 
         ring_filename = self.config.ring_log(name) or ":memory:"
         ring_size = self.config.get_specific_option(name, "ring_size", 10000)
-        self.ring_buffer = RingBufferLogSql(ring_filename, ring_size)
+        self.ring_buffer = RingBufferLogSql(ring_filename, ring_size,
+                                            background=self.config.get_specific_option(name, "ring_background", False),
+                                            overflow=self.config.get_specific_option(name, "ring_overflow", "block"),
+                                            fts=self.config.get_specific_option(name, "ring_fts", True))
 
         self.director: Director = Director(session=self)
         self.director.register_object(obj=self)
 
-        self.dispatch = self.director.event_manager.dispatch
-        self.add_listener = self.director.event_manager.add_listener
+        self.add_listener = self.director.add_listener
 
         core_injections = {"config": self.config, "session": self, "app": self.abacura,
                            "sessions": self.abacura.sessions, "core_msdp": self.core_msdp,
@@ -140,7 +160,13 @@ class Session(BaseSession):
 
         telnet_client = getattr(self.plugin_loader.plugins["TelnetPlugin"], "telnet_client")
 
-        if self.host and self.port:
+        if self.replay_file:
+            replay_client = getattr(self.plugin_loader.plugins["TelnetPlugin"], "replay_client")
+            self.abacura.run_worker(
+                replay_client(self.replay_file, self.replay_speed, handlers=[self.core_msdp]),
+                name=f"replay-{self.name}", group=self.name,
+                description=f"Replay of {self.replay_file} for {self.name}")
+        elif self.host and self.port:
             log.warning(f"Attempting connection to {self.host} and {self.port} for {self.name}")
             self.abacura.run_worker(
                 telnet_client(self.host, self.port, handlers=[self.core_msdp]),
@@ -210,13 +236,18 @@ class Session(BaseSession):
 
     # TODO raw can come out now that we isinstance
     def send(self, msg: Union[str, bytes], raw: bool = False, echo_color: str = "orange1") -> None:
-        """Send to writer (socket)"""
+        """Send to writer (socket), writes in the same loop iteration are coalesced by the TelnetWriter"""
         if self.writer is not None:
             try:
+                sent = True
                 if isinstance(msg, str):
-                    self.writer.write(bytes(msg + "\n", "UTF-8"))
+                    sent = self.writer.write(bytes(msg + "\n", "UTF-8"))
                 elif isinstance(msg, bytes):
-                    self.writer.write(msg)
+                    sent = self.writer.write(msg)
+
+                if not sent:
+                    self.show_error("Outbound queue is full, the server is not reading, command dropped")
+                    return
 
                 self.last_socket_write = time.monotonic()
 
@@ -230,7 +261,9 @@ class Session(BaseSession):
             self.output(f"[bold red]# NO-SESSION SEND: {msg}", markup=True, highlight=True)
 
     def echo_command(self, cmd, color="white"):
-        if not self.tl or len(self.tl.lines) < 2:
+        # the prompt may still be waiting to be written
+        self.flush_output()
+        if not self.tl or self.tl.detached or len(self.tl.lines) < 2:
             return
 
         cmd_segment = Segment(cmd, Style(color=color, italic=True))
@@ -246,7 +279,7 @@ class Session(BaseSession):
             self.tl.lines[i] = new_strip
             self.tl._line_cache.clear()
             self.tl.render()
-            self.outputlog(OutputMessage(cmd))
+            self.outputlog(OutputMessage(cmd), render=f"echo:{color}")
             return
 
         self.output(Segments([cmd_segment]))
@@ -274,10 +307,45 @@ class Session(BaseSession):
                 self.debugtl.write(f"{date_time} \[{facility}]")
                 self.debugtl.write(msg)
 
-    def outputlog(self, message: OutputMessage):
-        """Write to long-term logger and short-term ring buffer"""
+    def dispatch(self, message: AbacuraMessage):
+        # looked up on each call, so a replay can time every dispatch
+        return self.director.event_manager.dispatch(message)
+
+    def outputlog(self, message: OutputMessage, render: str = '') -> Optional[LogKey]:
+        """Write to long-term logger and short-term ring buffer
+
+        render records how the line was displayed: '' for ANSI output, 'markup' or 'text',
+        either followed by '+highlight', or 'echo:<color>' for a command echoed after a prompt
+        """
         self.logger.info(message.message)
-        self.ring_buffer.log(message)
+        return self.ring_buffer.log(message, render)
+
+    def render_logged(self, rows: List[Tuple[str, str]]) -> List[Text]:
+        """Render (message, render) rows read back from the ring buffer the way they were first displayed"""
+        texts = []
+        for message, render in rows:
+            if render.startswith("echo:"):
+                echo = Text(message, Style(color=render[5:], italic=True))
+                # echo_command appended it to one of the last two lines, if either was a prompt
+                for i in (-1, -2):
+                    if len(texts) >= -i and texts[i].plain.rstrip().endswith(">"):
+                        texts[i] = texts[i] + echo
+                        break
+                else:
+                    texts.append(echo)
+                continue
+
+            if render.startswith("markup"):
+                text = Text.from_markup(message)
+            elif render.startswith("text"):
+                text = Text(message)
+            else:
+                text = self.director.substitute_manager.render_text(ansi_text(message, cache=False))
+            if render.endswith("+highlight"):
+                text = self.tl.highlighter(text)
+            texts.append(text)
+
+        return texts
 
     def output(self, msg,
                markup: bool = False, highlight: bool = False, ansi: bool = False, actionable: bool = True,
@@ -298,25 +366,70 @@ class Session(BaseSession):
 
         if not message.gag:
 
-            self.tl.markup = markup
-            self.tl.highlight = highlight
+            render = ''
+            if ansi and self.director:
+                renderable = self.director.substitute_manager.render(message)
+            elif ansi:
+                renderable = ansi_text(message.message)
+            elif isinstance(message.message, str):
+                renderable = Text.from_markup(message.message) if markup else Text(message.message)
+                render = "markup" if markup else "text"
+                if highlight:
+                    renderable = self.tl.highlighter(renderable)
+                    render += "+highlight"
+            else:
+                renderable = message.message
 
-            scroll_end = self.tl.viewing_end()
+            key = self.outputlog(message, render) if loggable else None
+            self.queue_output(renderable, key)
 
-            if ansi:
-                self.tl.write(Text.from_ansi(message.message))
-            else:
-                self.tl.write(message.message)
+    def queue_output(self, renderable, key: Optional[LogKey] = None):
+        """Buffer a renderable for the RichLog, written with the others at the end of the read burst
 
-            if loggable:
-                self.outputlog(message)
+        A long burst is written out every frame_interval seconds so the display keeps up.
+        """
+        self.pending_output.append((renderable, key))
+        if len(self.pending_output) == 1:
+            self.pending_since = time.monotonic()
+            try:
+                asyncio.get_running_loop().call_soon(self.flush_output)
+            except RuntimeError:
+                self.flush_output()
+        elif time.monotonic() - self.pending_since >= self.frame_interval:
+            self.flush_output()
+
+    def flush_output(self):
+        """Write the buffered renderables to the RichLog with one layout, scroll and refresh"""
+        pending, self.pending_output = self.pending_output, []
+        if not pending or self.tl is None:
+            return
 
-            self.tl.markup = False
-            self.tl.highlight = False
+        scroll_end = self.tl.viewing_end()
+        with self.abacura.batch_update():
+            # consecutive lines of text are rendered together as one Text
+            texts = []
+            keys = []
+            for renderable, key in pending:
+                if isinstance(renderable, Text):
+                    texts.append(renderable)
+                    if key:
+                        keys.append(key)
+                    continue
+                if texts:
+                    self.tl.write(Text("\n").join(texts), scroll_end=False, keys=(keys[0], keys[-1]) if keys else None)
+                    texts = []
+                    keys = []
+                self.tl.write(renderable, scroll_end=False, keys=(key, key) if key else None)
+
+            if texts:
+                self.tl.write(Text("\n").join(texts), scroll_end=False, keys=(keys[0], keys[-1]) if keys else None)
 
             if scroll_end:
                 self.tl.scroll_end(animate=False)
 
+        self.frames += 1
+        self.frame_lines += len(pending)
+
     @command
     def connect(self, name: str, host: str = '', port: int = 0) -> None:
         """
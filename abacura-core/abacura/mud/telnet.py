@@ -0,0 +1,351 @@
+"""Incremental telnet stream decoder
+
+The decoder consumes arbitrary chunks of socket data and runs a small
+IAC/SB state machine over them.  Sequences may be split across chunk
+boundaries; any partial state is carried over to the next call to feed().
+Once MCCP compression starts, the rest of the stream is inflated before decoding.
+"""
+import asyncio
+import zlib
+from typing import Callable, Optional
+
+IAC_BYTE = 0xff
+SB_BYTE = 0xfa
+SE_BYTE = 0xf0
+GA_BYTE = 0xf9
+WILL_BYTE = 0xfb
+WONT_BYTE = 0xfc
+DO_BYTE = 0xfd
+DONT_BYTE = 0xfe
+
+NEGOTIATION_COMMANDS = (WILL_BYTE, WONT_BYTE, DO_BYTE, DONT_BYTE)
+
+# decoder states
+DATA = 0
+COMMAND = 1
+OPTION = 2
+SUBNEGOTIATION_OPTION = 3
+SUBNEGOTIATION = 4
+SUBNEGOTIATION_IAC = 5
+
+
+class TelnetDecoder:
+    """Split a telnet byte stream into lines, prompts and IAC commands
+
+    :param on_line: called with the bytes of each complete line (without the newline)
+    :param on_prompt: called with the pending bytes when IAC GA is received
+    :param on_negotiation: called with (command, option) for IAC WILL/WONT/DO/DONT
+    :param on_subnegotiation: called with (option, payload) for IAC SB ... IAC SE
+    :param on_command: called with the command byte of any other IAC sequence
+    """
+
+    def __init__(self,
+                 on_line: Callable[[bytearray], None],
+                 on_prompt: Callable[[bytearray], None],
+                 on_negotiation: Callable[[int, int], None],
+                 on_subnegotiation: Callable[[int, bytearray], None],
+                 on_command: Optional[Callable[[int], None]] = None):
+        self.on_line = on_line
+        self.on_prompt = on_prompt
+        self.on_negotiation = on_negotiation
+        self.on_subnegotiation = on_subnegotiation
+        self.on_command = on_command
+
+        self.state: int = DATA
+        self.line = bytearray()
+        self.command: int = 0
+        self.sb_option: int = 0
+        self.sb_buffer = bytearray()
+
+        self.decompressor = None
+        self.bytes_received: int = 0
+        self.compressed_bytes: int = 0
+        self.inflated_bytes: int = 0
+        self.lines_decoded: int = 0
+
+    @property
+    def pending(self) -> bool:
+        """True when a partial line is waiting for a newline or prompt"""
+        return len(self.line) > 0
+
+    def flush(self) -> Optional[bytes]:
+        """Return and clear any partial line"""
+        if not self.line:
+            return None
+
+        line = bytes(self.line)
+        self.line.clear()
+        return line
+
+    @property
+    def compressing(self) -> bool:
+        return self.decompressor is not None
+
+    def start_decompression(self) -> None:
+        """Inflate everything after the current subnegotiation (MCCP2)"""
+        self.decompressor = zlib.decompressobj()
+
+    def feed(self, data: bytes) -> None:
+        """Decode a chunk of socket data, dispatching callbacks for everything complete"""
+        self.bytes_received += len(data)
+        self._route(data)
+
+    def _route(self, data) -> None:
+        if self.decompressor is None:
+            self._decode(data)
+        else:
+            self._inflate(data)
+
+    def _inflate(self, data) -> None:
+        decompressor = self.decompressor
+        self.compressed_bytes += len(data)
+        inflated = decompressor.decompress(data)
+        self.inflated_bytes += len(inflated)
+
+        if decompressor.eof:
+            # server ended the compressed stream, whatever follows is plain telnet
+            self.decompressor = None
+            unused = decompressor.unused_data
+            self.compressed_bytes -= len(unused)
+            self._decode(inflated)
+            if unused:
+                self._route(unused)
+        elif inflated:
+            self._decode(inflated)
+
+    def _decode(self, data) -> None:
+        view = memoryview(data)
+        size = len(data)
+        decompressor = self.decompressor
+        pos = 0
+
+        while pos < size:
+            state = self.state
+
+            if state == DATA:
+                iac = data.find(IAC_BYTE, pos)
+                end = size if iac < 0 else iac
+                pos = self._feed_text(data, view, pos, end)
+                if iac < 0:
+                    break
+                pos = iac + 1
+                self.state = COMMAND
+
+            elif state == COMMAND:
+                cmd = data[pos]
+                pos += 1
+                self._command(cmd)
+
+            elif state == OPTION:
+                option = data[pos]
+                pos += 1
+                self.state = DATA
+                self.on_negotiation(self.command, option)
+
+            elif state == SUBNEGOTIATION_OPTION:
+                self.sb_option = data[pos]
+                pos += 1
+                self.sb_buffer.clear()
+                self.state = SUBNEGOTIATION
+
+            elif state == SUBNEGOTIATION:
+                iac = data.find(IAC_BYTE, pos)
+                if iac < 0:
+                    self.sb_buffer += view[pos:]
+                    break
+                self.sb_buffer += view[pos:iac]
+                pos = iac + 1
+                self.state = SUBNEGOTIATION_IAC
+
+            else:
+                # SUBNEGOTIATION_IAC
+                cmd = data[pos]
+                pos += 1
+                if cmd == SE_BYTE:
+                    self.state = DATA
+                    self.on_subnegotiation(self.sb_option, self.sb_buffer)
+                    self.sb_buffer = bytearray()
+                    if self.decompressor is not decompressor:
+                        # compression started, the rest of this chunk is compressed, inflate it in place
+                        if pos < size:
+                            self._route(view[pos:])
+                        return
+                elif cmd == IAC_BYTE:
+                    # escaped 0xff inside the subnegotiation payload
+                    self.sb_buffer.append(IAC_BYTE)
+                    self.state = SUBNEGOTIATION
+                else:
+                    # protocol violation, keep the byte and carry on until IAC SE
+                    self.sb_buffer.append(IAC_BYTE)
+                    self.sb_buffer.append(cmd)
+                    self.state = SUBNEGOTIATION
+
+    def _feed_text(self, data: bytes, view: memoryview, pos: int, end: int) -> int:
+        """Append plain text between pos and end, emitting each complete line"""
+        nl = data.find(b'\n', pos, end)
+        while nl >= 0:
+            self.line += view[pos:nl]
+            self.lines_decoded += 1
+            self.on_line(self.line)
+            self.line = bytearray()
+            pos = nl + 1
+            nl = data.find(b'\n', pos, end)
+
+        if pos < end:
+            self.line += view[pos:end]
+
+        return end
+
+    def _command(self, cmd: int) -> None:
+        """Handle the byte following an IAC in the data stream"""
+        if cmd in NEGOTIATION_COMMANDS:
+            self.command = cmd
+            self.state = OPTION
+        elif cmd == SB_BYTE:
+            self.state = SUBNEGOTIATION_OPTION
+        elif cmd == IAC_BYTE:
+            # escaped 0xff data byte
+            self.line.append(IAC_BYTE)
+            self.state = DATA
+        elif cmd == GA_BYTE:
+            self.state = DATA
+            self.on_prompt(self.line)
+            self.line = bytearray()
+        else:
+            self.state = DATA
+            if self.on_command:
+                self.on_command(cmd)
+
+
+class TelnetWriter:
+    """Outbound queue wrapping a StreamWriter
+
+    Everything written during one pass of the event loop is coalesced into a
+    single socket write.  When the transport buffer passes high_water, flushing
+    pauses until drain() brings it back under low_water.  Outbound data can
+    also be compressed (MCCP3).
+
+    The queue holds at most max_queue bytes, a write that would grow it further
+    is dropped and write() returns False.  Writers that can wait should await
+    drain() instead, which returns once the transport has caught up.
+    """
+
+    def __init__(self, writer, high_water: int = 65536, low_water: int = 16384, max_queue: int = 1048576):
+        self.writer = writer
+        self.high_water = high_water
+        self.low_water = low_water
+        self.max_queue = max_queue
+        self.compressor = None
+        self.queue = bytearray()
+        self.queued_writes: int = 0
+        self.flush_scheduled: bool = False
+        self.draining: bool = False
+
+        self.bytes_written: int = 0
+        self.bytes_sent: int = 0
+        self.writes: int = 0
+        self.socket_writes: int = 0
+        self.drains: int = 0
+        self.writes_dropped: int = 0
+        self.bytes_dropped: int = 0
+
+        transport = getattr(writer, "transport", None)
+        if transport is not None:
+            transport.set_write_buffer_limits(high=high_water, low=low_water)
+
+    @property
+    def compressing(self) -> bool:
+        return self.compressor is not None
+
+    @property
+    def queue_depth(self) -> int:
+        """Bytes waiting in the outbound queue"""
+        return len(self.queue)
+
+    @property
+    def bytes_in_flight(self) -> int:
+        """Bytes handed to the transport but not yet sent"""
+        transport = getattr(self.writer, "transport", None)
+        return 0 if transport is None else transport.get_write_buffer_size()
+
+    def start_compression(self) -> None:
+        """Compress everything written from now on"""
+        # whatever is already queued was written before compression started
+        self.flush()
+        self.compressor = zlib.compressobj()
+
+    def write(self, data: bytes) -> bool:
+        """Queue data to be sent at the end of this loop iteration, False if the queue is full and it was dropped"""
+        if len(self.queue) + len(data) > self.max_queue:
+            # the peer stopped reading, don't let the queue grow without bound
+            self.writes_dropped += 1
+            self.bytes_dropped += len(data)
+            return False
+
+        self.bytes_written += len(data)
+        self.writes += 1
+        self.queue += data
+        self.queued_writes += 1
+
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self._scheduled_flush)
+        return True
+
+    def _scheduled_flush(self) -> None:
+        self.flush_scheduled = False
+        if not self.draining:
+            self.flush()
+
+    def flush(self) -> None:
+        """Send everything in the queue with one socket write"""
+        if not self.queue:
+            return
+
+        if self.writer.is_closing():
+            self.queue.clear()
+            self.queued_writes = 0
+            return
+
+        data = bytes(self.queue)
+        self.queue.clear()
+        self.queued_writes = 0
+
+        if self.compressor is not None:
+            data = self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+        self.bytes_sent += len(data)
+        self.socket_writes += 1
+        self.writer.write(data)
+
+        if self.bytes_in_flight > self.high_water and not self.draining:
+            self.draining = True
+            asyncio.get_running_loop().create_task(self._drain())
+
+    async def _drain(self) -> None:
+        self.drains += 1
+        try:
+            await self.writer.drain()
+        except ConnectionError:
+            self.queue.clear()
+            self.queued_writes = 0
+        finally:
+            self.draining = False
+
+        self.flush()
+
+    async def drain(self) -> None:
+        """Send the queue and wait until the transport is back under low_water"""
+        self.flush()
+        try:
+            await self.writer.drain()
+        except ConnectionError:
+            self.queue.clear()
+            self.queued_writes = 0
+
+    def close(self) -> None:
+        self.flush()
+        self.writer.close()
+
+    def __getattr__(self, name):
+        return getattr(self.writer, name)
@@ -2,8 +2,9 @@ from __future__ import annotations
 
 from typing import TYPE_CHECKING, Callable, Dict
 
-from abacura.plugins.actions import Action
+from abacura.plugins.actions import Action, BlockAction, OutputBlock, CONSUME
 from abacura.plugins.director import Director
+from abacura.plugins.substitutes import Substitute
 from abacura.plugins.tickers import Ticker
 from abacura.plugins.commands import CommandError, CommandArgumentError
 from abacura.plugins.task_queue import TaskManager
@@ -14,6 +15,7 @@ if TYPE_CHECKING:
     from abacura.mud.options.msdp import MSDP
     from abacura.mud.session import Session
     from abacura.config import Config
+    from abacura.plugins.events import AbacuraMessage
 
 
 class ContextProvider:
@@ -40,13 +42,16 @@ class Plugin:
         self.output_history: FIFOBuffer[OutputMessage] = self._context['buffer']
         self.output = self.session.output
         self.debuglog = self.session.debuglog
-        self.dispatch = self.director.event_manager.dispatch
         self.register_actions = True
 
     @classmethod
     def set_context(cls, context: Dict):
         cls._context = context
 
+    def dispatch(self, message: AbacuraMessage):
+        # looked up on each call, so a replay can time every dispatch
+        return self.director.event_manager.dispatch(message)
+
     def get_name(self):
         return self.__class__.__name__
     
@@ -54,13 +59,23 @@ class Plugin:
         doc = getattr(self, '__doc__', None)
         return doc
 
-    def add_action(self, pattern: str, callback_fn: Callable, flags: int = 0, name: str = '', color: bool = False):
-        act = Action(source=self, pattern=pattern, callback=callback_fn, flags=flags, name=name, color=color)
+    def add_action(self, pattern: str, callback_fn: Callable, flags: int = 0, name: str = '', color: bool = False,
+                   priority: int = 0):
+        act = Action(source=self, pattern=pattern, callback=callback_fn, flags=flags, name=name, color=color,
+                     priority=priority)
         self.director.action_manager.add(act)
 
     def remove_action(self, name: str):
         self.director.action_manager.remove(name)
 
+    def add_block_action(self, start: str, callback_fn: Callable[[OutputBlock], None], continuation: str = '',
+                         end: str = '', flags: int = 0, name: str = '', color: bool = False, priority: int = 0,
+                         max_lines: int = 100, prompt_ends: bool = True):
+        block = BlockAction(source=self, start=start, callback=callback_fn, continuation=continuation, end=end,
+                            flags=flags, name=name, color=color, priority=priority, max_lines=max_lines,
+                            prompt_ends=prompt_ends)
+        self.director.action_manager.add_block(block)
+
     def add_ticker(self, seconds: float, callback_fn: Callable, repeats: int = -1, name: str = '', commands: str = ''):
         t = Ticker(source=self, seconds=seconds, callback=callback_fn, repeats=repeats, name=name, commands=commands)
         self.director.ticker_manager.add(t)
@@ -68,11 +83,14 @@ class Plugin:
     def remove_ticker(self, name: str):
         self.director.ticker_manager.remove(name)
 
-    def add_substitute(self, pattern: str, repl: str, name: str = ''):
-        pass
+    def add_substitute(self, pattern: str, repl: str, name: str = '', flags: int = 0, priority: int = 0,
+                       markup: bool = False):
+        sub = Substitute(source=self, pattern=pattern, repl=repl, flags=flags, name=name, priority=priority,
+                         markup=markup)
+        self.director.substitute_manager.add(sub)
 
     def remove_substitute(self, name: str):
-        pass
+        self.director.substitute_manager.remove(name)
 
     def send(self, message: str, raw: bool = False, echo_color: str = 'orange1'):
         self.session.send(message, raw=raw, echo_color=echo_color)
@@ -89,6 +107,23 @@ def action(pattern: str, flags: int = 0, color: bool = False, priority: int = 0)
     return add_action
 
 
+def block_action(start: str, continuation: str = '', end: str = '', flags: int = 0, color: bool = False,
+                 priority: int = 0, max_lines: int = 100, prompt_ends: bool = True):
+    """Decorator for a callback taking the OutputBlock of lines from start to end, see BlockAction"""
+    def add_block_action(block_fn):
+        block_fn.block_start = start
+        block_fn.block_continuation = continuation
+        block_fn.block_end = end
+        block_fn.block_flags = flags
+        block_fn.block_color = color
+        block_fn.block_priority = priority
+        block_fn.block_max_lines = max_lines
+        block_fn.block_prompt_ends = prompt_ends
+        return block_fn
+
+    return add_block_action
+
+
 def command(function=None, name: str = '', hide: bool = False, override: bool = False):
     def add_command(fn):
         fn.command_name = name or fn.__name__
@@ -2,12 +2,16 @@ from __future__ import annotations
 
 import inspect
 import re
-from queue import PriorityQueue
-from typing import TYPE_CHECKING, Callable, Match
+import time
+from bisect import insort
+from dataclasses import dataclass
+from operator import attrgetter
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Match, Optional, Sequence
 
 from textual import log
 
 from abacura.mud import OutputMessage
+from abacura.plugins.actions.prefilter import PrefilterIndex
 
 if TYPE_CHECKING:
     pass
@@ -17,6 +21,80 @@ class ActionError(Exception):
     pass
 
 
+# an action callback returns CONSUME to stop any further actions from matching the line
+CONSUME = object()
+
+# once a line is gagged, actions with this priority number or higher are skipped
+GAGGED_SKIP_PRIORITY = 100
+
+
+# mean regex time per character searched above which a pattern is likely to backtrack badly
+BACKTRACK_NS_PER_CHAR = 1000
+
+# shorter lines are dominated by the fixed cost of a search
+BACKTRACK_MIN_CHARS = 32
+
+
+class ActionStats:
+    """Evaluation and match counts of one action, with sampled regex and callback times"""
+
+    def __init__(self):
+        self.evaluations: int = 0
+        self.matches: int = 0
+        self.timed_evaluations: int = 0
+        self.regex_ns: int = 0
+        self.worst_regex_ns: int = 0
+        self.long_line_ns: int = 0
+        self.long_line_chars: int = 0
+        self.callback_ns: int = 0
+        self.worst_callback_ns: int = 0
+
+    def record_search(self, elapsed_ns: int, chars: int):
+        self.timed_evaluations += 1
+        self.regex_ns += elapsed_ns
+        if elapsed_ns > self.worst_regex_ns:
+            self.worst_regex_ns = elapsed_ns
+        if chars >= BACKTRACK_MIN_CHARS:
+            self.long_line_ns += elapsed_ns
+            self.long_line_chars += chars
+
+    def record_callback(self, elapsed_ns: int):
+        self.callback_ns += elapsed_ns
+        if elapsed_ns > self.worst_callback_ns:
+            self.worst_callback_ns = elapsed_ns
+
+    @property
+    def mean_regex_ns(self) -> float:
+        return self.regex_ns / max(1, self.timed_evaluations)
+
+    @property
+    def ns_per_char(self) -> float:
+        return self.long_line_ns / max(1, self.long_line_chars)
+
+    @property
+    def estimated_ns(self) -> float:
+        """Regex time extrapolated from the sampled searches to every evaluation, plus callback time"""
+        return self.mean_regex_ns * self.evaluations + self.callback_ns
+
+    @property
+    def backtracking_risk(self) -> bool:
+        return self.ns_per_char > BACKTRACK_NS_PER_CHAR
+
+
+def to_int(value) -> int:
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return 0
+
+
+def to_float(value) -> float:
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return float(0)
+
+
 class Action:
     def __init__(self, source: object, pattern: str, callback: Callable,
                  flags: int = 0, name: str = '', color: bool = False, priority: int = 0):
@@ -44,79 +122,298 @@ class Action:
         if invalid_types:
             raise TypeError(f"Invalid action parameter type: {callback}({invalid_types})")
 
+        self.stats = ActionStats()
+
+        # the number of groups in a match is fixed by the pattern
+        self.missing_groups: bool = self.compiled_re.groups < self.expected_match_groups
+        self.bind: Callable[[Match, OutputMessage], Sequence] = self.compile_binder()
+
+    def compile_binder(self) -> Callable[[Match, OutputMessage], Sequence]:
+        """Generate the function that turns a match into the arguments for the callback
+
+        Each parameter is resolved once, here, to the match, the message or the
+        next match group with an optional converter.
+        """
+        converters = {int: "to_int", float: "to_float", str: "str"}
+        args = []
+        group = 0
+        for arg_type in self.parameter_types:
+            if arg_type in (Match, 'Match'):
+                args.append("match")
+            elif arg_type in (OutputMessage, 'OutputMessage'):
+                args.append("message")
+            else:
+                converter = converters.get(arg_type)
+                args.append(f"{converter}(g[{group}])" if converter else f"g[{group}]")
+                group += 1
+
+        if args == [f"g[{i}]" for i in range(self.compiled_re.groups)]:
+            # only unconverted groups, in order
+            return lambda match, message: match.groups()
+
+        source = "def bind(match, message):\n"
+        if group:
+            source += "    g = match.groups()\n"
+        source += f"    return ({''.join(arg + ', ' for arg in args)})\n"
+
+        namespace = {"to_int": to_int, "to_float": to_float, "str": str}
+        exec(source, namespace)
+        return namespace["bind"]
+
     def __lt__(self, other):
         return self.priority < other.priority
 
 
+@dataclass
+class OutputBlock:
+    """The lines captured by a block action, from the line matching its start pattern"""
+    lines: List[OutputMessage]
+    start_match: Match
+    end_match: Optional[Match] = None
+    # end, continuation, prompt, restart or limit
+    ended_by: str = ''
+
+    @property
+    def first(self) -> OutputMessage:
+        return self.lines[0]
+
+
+class BlockAction:
+    """An action over several lines, matched incrementally as the lines arrive
+
+    A block opens on a line matching start and collects the lines that follow.
+    It is complete, and the callback is called with the OutputBlock, when:
+
+    - a line matches end, which is included
+    - a line does not match continuation, which is not included
+    - a prompt arrives, if prompt_ends is set: a GA, or a partial line once the socket is quiet
+    - a line matches start again, which opens the next block
+    - max_lines have been collected
+    """
+
+    def __init__(self, source: object, start: str, callback: Callable[[OutputBlock], Any],
+                 continuation: str = '', end: str = '', flags: int = 0, name: str = '', color: bool = False,
+                 priority: int = 0, max_lines: int = 100, prompt_ends: bool = True):
+        self.pattern = start
+        self.callback = callback
+        self.flags = flags
+        self.compiled_re = re.compile(start, flags)
+        self.continuation_re = re.compile(continuation, flags) if continuation else None
+        self.end_re = re.compile(end, flags) if end else None
+        self.name = name
+        self.color = color
+        self.source = source
+        self.priority = priority
+        self.max_lines = max_lines
+        self.prompt_ends = prompt_ends
+
+    @property
+    def description(self) -> str:
+        patterns = [repr(self.pattern)]
+        if self.continuation_re:
+            patterns.append(f"then {self.continuation_re.pattern!r}")
+        if self.end_re:
+            patterns.append(f"until {self.end_re.pattern!r}")
+        return " ".join(patterns)
+
+
 class ActionManager:
+    """Match output lines against actions, lowest priority number first, then in order of registration"""
+
     def __init__(self):
-        self.actions: PriorityQueue = PriorityQueue()
+        self.actions: list[Action] = []
+        self._index: Optional[PrefilterIndex[Action]] = None
+
+        self.block_actions: list[BlockAction] = []
+        self.open_blocks: Dict[BlockAction, OutputBlock] = {}
+        self._block_index: Optional[PrefilterIndex[BlockAction]] = None
+
+        # optional instrumentation, regex searches are timed on one line in every sample_every
+        self.stats: bool = False
+        self.sample_every: int = 16
+        self.lines_processed: int = 0
+        self.lines_sampled: int = 0
+
+    @property
+    def index(self) -> PrefilterIndex[Action]:
+        """Literal prefilter over the registered actions, rebuilt after any change"""
+        if self._index is None:
+            self._index = PrefilterIndex(self.actions)
+        return self._index
+
+    @property
+    def block_index(self) -> PrefilterIndex[BlockAction]:
+        """Literal prefilter over the start patterns of the block actions"""
+        if self._block_index is None:
+            self._block_index = PrefilterIndex(self.block_actions)
+        return self._block_index
 
     def register_object(self, obj: object):
         # self.unregister_object(obj)  # prevent duplicates
         for name, member in inspect.getmembers(obj, callable):
+            if hasattr(member, "block_start"):
+                block = BlockAction(start=getattr(member, "block_start"), callback=member, source=obj,
+                                    continuation=getattr(member, "block_continuation"),
+                                    end=getattr(member, "block_end"), flags=getattr(member, "block_flags"),
+                                    color=getattr(member, "block_color"), priority=getattr(member, "block_priority"),
+                                    max_lines=getattr(member, "block_max_lines"),
+                                    prompt_ends=getattr(member, "block_prompt_ends"))
+                self.add_block(block)
+
             if hasattr(member, "action_pattern"):
                 act = Action(pattern=getattr(member, "action_pattern"), callback=member, source=obj,
-                             flags=getattr(member, "action_flags"), color=getattr(member, "action_color"))
+                             flags=getattr(member, "action_flags"), color=getattr(member, "action_color"),
+                             priority=getattr(member, "action_priority", 0))
                 self.add(act)
 
     def unregister_object(self, obj: object):
-        self.actions.queue[:] = [a for a in self.actions.queue if a.source != obj]
+        self.actions = [a for a in self.actions if a.source != obj]
+        self._index = None
+        self.remove_blocks([b for b in self.block_actions if b.source == obj])
 
     def add(self, action: Action):
         log.debug(f"Appending action '{action.name}' from '{action.source}'")
-        self.actions.put(action)
+        insort(self.actions, action, key=attrgetter("priority"))
+        self._index = None
 
     def remove(self, name: str):
-        self.actions.queue[:] = [a for a in self.actions.queue if a.name != name]
+        self.actions = [a for a in self.actions if a.name != name]
+        self._index = None
+        self.remove_blocks([b for b in self.block_actions if b.name == name])
+
+    def add_block(self, block: BlockAction):
+        log.debug(f"Appending block action '{block.name}' from '{block.source}'")
+        insort(self.block_actions, block, key=attrgetter("priority"))
+        self._block_index = None
+
+    def remove_blocks(self, blocks: List[BlockAction]):
+        if not blocks:
+            return
+
+        self.block_actions = [b for b in self.block_actions if b not in blocks]
+        self._block_index = None
+        for block in blocks:
+            self.open_blocks.pop(block, None)
+
+    def reset_stats(self):
+        self.lines_processed = 0
+        self.lines_sampled = 0
+        for act in self.actions:
+            act.stats = ActionStats()
 
     def process_output(self, message: OutputMessage):
         if type(message.message) is not str:
             return
 
-        for act in self.actions.queue:
+        if self.block_actions:
+            self.process_blocks(message)
+
+        if self.stats:
+            self.process_output_with_stats(message)
+            return
+
+        for act in self.index.candidates(message):
+            if message.gag and act.priority >= GAGGED_SKIP_PRIORITY:
+                break
+
             s = message.message if act.color else message.stripped
             match = act.compiled_re.search(s)
 
+            if match and self.initiate_callback(act, message, match) is CONSUME:
+                break
+
+    def process_blocks(self, message: OutputMessage):
+        """Extend, complete and open block actions with the next line"""
+        started = {}
+        for block in self.block_index.candidates(message):
+            match = block.compiled_re.search(message.message if block.color else message.stripped)
             if match:
-                self.initiate_callback(act, message, match)
+                started[block] = match
+
+        # callbacks run once every block has seen the line, so one failing cannot skip the others
+        completed = []
+        for block, output_block in list(self.open_blocks.items()):
+            if block in started:
+                completed.append(self.close_block(block, "restart"))
+                continue
+
+            s = message.message if block.color else message.stripped
+            if block.end_re and (match := block.end_re.search(s)):
+                output_block.lines.append(message)
+                output_block.end_match = match
+                completed.append(self.close_block(block, "end"))
+            elif block.continuation_re and not block.continuation_re.search(s):
+                completed.append(self.close_block(block, "continuation"))
+            else:
+                output_block.lines.append(message)
+                if len(output_block.lines) >= block.max_lines:
+                    completed.append(self.close_block(block, "limit"))
+
+        for block, match in started.items():
+            self.open_blocks[block] = OutputBlock(lines=[message], start_match=match)
+
+        self.complete_blocks(completed)
+
+    def end_blocks(self):
+        """A prompt arrived, complete the open blocks that end with one"""
+        ended = [block for block in self.open_blocks if block.prompt_ends]
+        self.complete_blocks([self.close_block(block, "prompt") for block in ended])
+
+    def close_block(self, block: BlockAction, ended_by: str) -> tuple[BlockAction, OutputBlock]:
+        output_block = self.open_blocks.pop(block)
+        output_block.ended_by = ended_by
+        return block, output_block
 
     @staticmethod
-    def initiate_callback(action: Action, message: OutputMessage, match: Match):
-        g = list(match.groups())
+    def complete_blocks(completed: list[tuple[BlockAction, OutputBlock]]):
+        """Call the callback of each completed block, raising the first failure once they have all run"""
+        error = None
+        for block, output_block in completed:
+            try:
+                block.callback(output_block)
+            except Exception as exc:
+                error = error or ActionError(exc)
+        if error is not None:
+            raise error
 
-        # perform type conversions
-        if len(g) < action.expected_match_groups:
-            msg = f"Incorrect # of match groups.  Expected {action.expected_match_groups}, got {g}"
-            raise ActionError(msg)
+    def process_output_with_stats(self, message: OutputMessage):
+        self.lines_processed += 1
+        sampled = self.lines_processed % self.sample_every == 0
+        self.lines_sampled += sampled
+        perf_counter_ns = time.perf_counter_ns
 
-        args = []
+        for act in self.index.candidates(message):
+            if message.gag and act.priority >= GAGGED_SKIP_PRIORITY:
+                break
 
-        for arg_type in action.parameter_types:
-            if arg_type == Match:
-                value = match
-            elif arg_type == OutputMessage or arg_type == 'OutputMessage':
-                value = message
-            elif arg_type == int:
-                try:
-                    value = int(g.pop(0))
-                except (ValueError, TypeError):
-                    value = 0
-            elif arg_type == float:
-                try:
-                    value = float(g.pop(0))
-                except (ValueError, TypeError):
-                    value = float(0)
-            elif callable(arg_type) and arg_type.__name__ != '_empty':
-                # fancy type conversion
-                 value = arg_type(g.pop(0))
+            stats = act.stats
+            s = message.message if act.color else message.stripped
+            stats.evaluations += 1
+            if sampled:
+                start = perf_counter_ns()
+                match = act.compiled_re.search(s)
+                stats.record_search(perf_counter_ns() - start, len(s))
             else:
-                value = g.pop(0)
+                match = act.compiled_re.search(s)
 
-            args.append(value)
+            if match:
+                stats.matches += 1
+                start = perf_counter_ns()
+                try:
+                    result = self.initiate_callback(act, message, match)
+                finally:
+                    stats.record_callback(perf_counter_ns() - start)
+                if result is CONSUME:
+                    break
+
+    @staticmethod
+    def initiate_callback(action: Action, message: OutputMessage, match: Match) -> Any:
+        if action.missing_groups:
+            msg = f"Incorrect # of match groups.  Expected {action.expected_match_groups}, got {list(match.groups())}"
+            raise ActionError(msg)
 
-        # call with the list of args
+        # call with the bound args
         try:
-            action.callback(*args)
+            return action.callback(*action.bind(match, message))
         except Exception as exc:
             raise ActionError(exc)
@@ -13,23 +13,70 @@ if TYPE_CHECKING:
 
 
 class ActionCommand(Plugin):
-    """Provides #ticker command"""
+    """Provides #actions command"""
     def show_actions(self):
         rows = []
-        for action in self.director.action_manager.actions.queue:
+        for action in self.director.action_manager.actions:
             callback_name = getattr(action.callback, "__qualname__", str(action.callback))
             source = action.source.__class__.__name__ if action.source else ""
 
             rows.append((repr(action.pattern), callback_name, action.priority, action.flags))
 
+        for block in self.director.action_manager.block_actions:
+            callback_name = getattr(block.callback, "__qualname__", str(block.callback))
+            rows.append((block.description, callback_name, block.priority, block.flags))
+
+        index = self.director.action_manager.index
         tbl = tabulate(rows, headers=["Pattern", "Callback", "Priority", "Flags"],
-                       caption=f" {len(rows)} actions registered")
+                       caption=f" {len(rows)} actions registered, {index.indexed} prefiltered by literal, "
+                               f"{len(self.director.action_manager.open_blocks)} blocks open")
         self.output(AbacuraPanel(tbl, title="Registered Actions"))
 
-    @command
-    def action(self):
+    def show_stats(self):
+        action_manager = self.director.action_manager
+        if not action_manager.stats:
+            action_manager.stats = True
+            self.output(f"[yellow]Counting action evaluations from now on, timing 1 line in "
+                        f"{action_manager.sample_every}", markup=True)
+
+        actions = sorted(action_manager.actions, key=lambda a: a.stats.estimated_ns, reverse=True)
+        rows = []
+        for action in actions:
+            st = action.stats
+            callback_name = getattr(action.callback, "__qualname__", str(action.callback))
+            warnings = []
+            if st.matches == 0:
+                warnings.append("never matched")
+            if st.backtracking_risk:
+                warnings.append("backtracking")
+
+            rows.append((repr(action.pattern), callback_name, st.evaluations, st.matches,
+                         f"{st.mean_regex_ns / 1e3:.2f}", f"{st.worst_regex_ns / 1e6:.3f}",
+                         f"{st.ns_per_char:.1f}", f"{st.callback_ns / 1e6:.1f}", f"{st.estimated_ns / 1e6:.1f}",
+                         ", ".join(warnings)))
+
+        never = len([a for a in actions if a.stats.matches == 0])
+        risky = len([a for a in actions if a.stats.backtracking_risk])
+        caption = (f" {action_manager.lines_processed} lines, {action_manager.lines_sampled} timed, "
+                   f"{never} actions never matched, {risky} at risk of backtracking")
+        tbl = tabulate(rows, headers=["Pattern", "Callback", "Evals", "Matches", "Mean us", "Worst ms",
+                                      "ns/char", "Callback ms", "Est. ms", "Warnings"],
+                       caption=caption)
+        self.output(AbacuraPanel(tbl, title="Action Stats"), actionable=False)
+
+    @command(name="actions")
+    def action(self, stats: bool = False, reset: bool = False):
         """
         View actions
 
+        :param stats: Show evaluation counts and sampled times, sorted by cost, turning on instrumentation
+        :param reset: Clear the action stats
         """
+        if reset:
+            self.director.action_manager.reset_stats()
+
+        if stats:
+            self.show_stats()
+            return
+
         self.show_actions()
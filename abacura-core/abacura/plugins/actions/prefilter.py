@@ -0,0 +1,228 @@
+"""Literal prefilter for regular expression triggers
+
+Most trigger patterns contain literal text that any matching line must also
+contain.  Each pattern is reduced to one required key:
+
+- a whole word, bounded on both sides by non-word characters or anchors, that
+  can be looked up in the set of words of a line
+- otherwise, the longest literal run, tested with a substring search
+- otherwise nothing, and the pattern is always evaluated
+
+A line then only needs to be searched with the patterns whose key it contains,
+and since a key is never present when the pattern could not match, the result
+is the same as searching with every pattern.
+"""
+from __future__ import annotations
+
+import re
+from typing import Generic, Iterable, NamedTuple, Optional, Protocol, TypeVar
+
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:  # pragma: no cover
+    import sre_parse
+    import sre_constants
+
+LITERAL = sre_constants.LITERAL
+SUBPATTERN = sre_constants.SUBPATTERN
+AT = sre_constants.AT
+
+BOUNDARY_BEFORE = {sre_constants.AT_BEGINNING, sre_constants.AT_BEGINNING_STRING, sre_constants.AT_BOUNDARY}
+BOUNDARY_AFTER = {sre_constants.AT_END, sre_constants.AT_END_STRING, sre_constants.AT_BOUNDARY}
+
+WORD = re.compile(r"\w+")
+
+# shorter keys match too many lines to be worth indexing
+MIN_WORD = 3
+MIN_LITERAL = 3
+
+
+class Trigger(Protocol):
+    compiled_re: re.Pattern
+    color: bool
+
+
+class Line(Protocol):
+    """A line of output, such as an OutputMessage, which may only strip its ANSI codes when asked"""
+    message: str
+    stripped: str
+
+
+class PlainLine(NamedTuple):
+    """A line that has no ANSI codes"""
+    stripped: str
+
+    @property
+    def message(self) -> str:
+        return self.stripped
+
+
+T = TypeVar("T", bound=Trigger)
+
+
+def literal_runs(pattern: str, flags: int = 0) -> list[tuple[str, bool, bool]]:
+    """Return (text, bounded_before, bounded_after) for each run of required literal characters
+
+    A run is bounded when an anchor that only matches next to a non-word character
+    (or the start or end of the line) sits directly before or after it.
+    """
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except re.error:
+        return []
+
+    runs = []
+    chars = []
+    bounded_before = False
+    previous_at = None
+
+    def end_run(next_at=None):
+        nonlocal chars
+        if chars:
+            runs.append(("".join(chars), bounded_before, next_at in BOUNDARY_AFTER))
+            chars = []
+
+    def walk(items):
+        nonlocal bounded_before, previous_at
+        for op, av in items:
+            if op is LITERAL:
+                if not chars:
+                    bounded_before = previous_at in BOUNDARY_BEFORE
+                chars.append(chr(av))
+                previous_at = None
+            elif op is SUBPATTERN and not av[1] and not av[2]:
+                # a required group without its own flags is part of the sequence
+                walk(av[3])
+            elif op is AT:
+                end_run(av)
+                previous_at = av
+            else:
+                end_run()
+                previous_at = None
+
+    walk(parsed)
+    end_run()
+    return runs
+
+
+def bounded_words(text: str, bounded_before: bool, bounded_after: bool) -> list[str]:
+    """Words in a literal run that are guaranteed to be whole words of any matching line"""
+    words = []
+    for m in WORD.finditer(text):
+        if m.start() == 0 and not bounded_before:
+            continue
+        if m.end() == len(text) and not bounded_after:
+            continue
+        words.append(m.group())
+    return words
+
+
+def prefilter_key(compiled_re: re.Pattern) -> tuple[Optional[str], Optional[str]]:
+    """Return (word, literal) for a compiled pattern, at most one of which is set"""
+    flags = compiled_re.flags
+    ignore_case = bool(flags & re.IGNORECASE)
+    runs = literal_runs(compiled_re.pattern, flags)
+
+    if flags & re.ASCII:
+        # \b would treat non-ascii letters as boundaries, but WORD does not
+        runs = [(text, False, False) for text, _, _ in runs]
+
+    words = [w for run in runs for w in bounded_words(*run)]
+    if ignore_case:
+        # only ascii keys fold the same way for the regex engine and casefold()
+        words = [w.casefold() for w in words if w.isascii()]
+
+    words = [w for w in words if len(w) >= MIN_WORD]
+    if words:
+        return max(words, key=len), None
+
+    if ignore_case:
+        return None, None
+
+    literals = [text for text, _, _ in runs if len(text) >= MIN_LITERAL]
+    if literals:
+        return None, max(literals, key=len)
+
+    return None, None
+
+
+class PrefilterIndex(Generic[T]):
+    """Select the triggers worth searching for a line, in their original order
+
+    Triggers with color set are matched against the line with its ANSI codes,
+    the others against the stripped line.
+    """
+
+    def __init__(self, triggers: Iterable[T]):
+        self.triggers: list[T] = list(triggers)
+
+        self.words: dict[str, list[int]] = {}
+        self.folded_words: dict[str, list[int]] = {}
+        self.literals: list[tuple[int, str]] = []
+        self.color_literals: list[tuple[int, str]] = []
+        self.always: list[int] = []
+        self.color_always: list[int] = []
+
+        for position, trigger in enumerate(self.triggers):
+            word, literal = prefilter_key(trigger.compiled_re)
+            if trigger.color:
+                # ANSI codes split words, so only substrings can be used
+                key = None if trigger.compiled_re.flags & re.IGNORECASE else literal or word
+                if key:
+                    self.color_literals.append((position, key))
+                else:
+                    self.color_always.append(position)
+            elif word and trigger.compiled_re.flags & re.IGNORECASE:
+                self.folded_words.setdefault(word, []).append(position)
+            elif word:
+                self.words.setdefault(word, []).append(position)
+            elif literal:
+                self.literals.append((position, literal))
+            else:
+                self.always.append(position)
+
+        # re.IGNORECASE matches some non-ascii letters, such as dotless i, to ascii ones casefold() keeps apart
+        self.all_folded: list[int] = [position for positions in self.folded_words.values() for position in positions]
+        self.indexed = len(self.triggers) - len(self.always) - len(self.color_always)
+
+    def __len__(self) -> int:
+        return len(self.triggers)
+
+    def candidates(self, line: Line) -> list[T]:
+        """Triggers that could match this line, in the order they were given
+
+        The stripped line is only read when there are keys to look for in it.
+        """
+        positions = self.always[:]
+
+        words = self.words
+        folded_words = self.folded_words
+        if words or folded_words:
+            non_ascii = False
+            for token in set(WORD.findall(line.stripped)):
+                if token in words:
+                    positions += words[token]
+                if folded_words:
+                    if not token.isascii():
+                        non_ascii = True
+                        continue
+                    folded = token.casefold()
+                    if folded in folded_words:
+                        positions += folded_words[folded]
+            if non_ascii:
+                positions += self.all_folded
+
+        if self.literals:
+            stripped = line.stripped
+            positions += [position for position, literal in self.literals if literal in stripped]
+
+        if self.color_literals or self.color_always:
+            message = line.message
+            positions += self.color_always
+            positions += [position for position, literal in self.color_literals if literal in message]
+
+        if not positions:
+            return []
+
+        triggers = self.triggers
+        return [triggers[position] for position in sorted(set(positions))]
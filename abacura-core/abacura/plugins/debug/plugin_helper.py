@@ -2,7 +2,8 @@ from collections import Counter
 
 from rich.text import Text
 
-from abacura.plugins import Plugin, command
+from abacura.plugins import Plugin, command, CommandError
+from abacura.plugins.director import WeakOwner
 from abacura.utils.renderables import tabulate, AbacuraPanel, AbacuraWarning, OutputColors
 
 
@@ -103,3 +104,35 @@ class PluginHelper(Plugin):
             tbl = Text("No plugins reloaded.")
 
         self.output(AbacuraPanel(tbl, title="Plugin Reload"))
+
+    @command
+    def director(self, view: str = "leaks") -> None:
+        """
+        Inspect director registrations
+
+        :param view: 'leaks' lists registrations whose owners are detached from the DOM
+        """
+        if view.lower() != "leaks":
+            raise CommandError(f"Unknown director view '{view}'")
+
+        rows = []
+        for source in self.director.get_registered_sources():
+            weak = isinstance(source, WeakOwner)
+            owner = source.ref() if weak else source
+
+            if owner is None:
+                state = "collected"
+            elif getattr(owner, "is_attached", True):
+                continue
+            else:
+                state = "detached"
+
+            registrations = self.director.get_registrations_for_object(source)
+            for r in registrations:
+                name = source.name if weak else f"{type(owner).__module__}.{type(owner).__qualname__}"
+                action = "purged on next call" if weak else "leaking, call unregister_object"
+                rows.append((name, state, r.registration_type, r.name, r.callback.__qualname__, action))
+
+        tbl = tabulate(rows, headers=["Owner", "State", "Type", "Name", "Callback", "Cleanup"],
+                       caption=f" {len(rows)} registrations with detached owners")
+        self.output(AbacuraPanel(tbl, title="Director Leaks"))
@@ -1,9 +1,12 @@
 from __future__ import annotations
 
+import inspect
+import weakref
 from dataclasses import dataclass
-from typing import TYPE_CHECKING, List, Callable
+from typing import TYPE_CHECKING, Dict, List, Callable, Optional
 
 from abacura.plugins.actions import ActionManager
+from abacura.plugins.substitutes import SubstituteManager
 from abacura.plugins.aliases.manager import AliasManager
 from abacura.plugins.commands import CommandManager
 from abacura.plugins.events import EventManager
@@ -21,36 +24,159 @@ class Registration:
     details: str
 
 
+REGISTRATION_ATTRIBUTES = ("action_pattern", "block_start", "command_name", "event_trigger", "ticker_seconds")
+
+
+class WeakHandler:
+    """Calls a method of a weakly registered object, purging the registration once the object has gone
+
+    Carries the method's signature, docstring and decorator attributes so the
+    managers can treat it like the bound method itself.
+    """
+
+    def __init__(self, owner: WeakOwner, method: Callable):
+        self.owner = owner
+        self.__func__ = method.__func__
+        self.__name__ = method.__name__
+        self.__qualname__ = method.__qualname__
+        self.__module__ = method.__module__
+        self.__doc__ = method.__doc__
+        self.__signature__ = inspect.signature(method)
+        self.__dict__.update(method.__func__.__dict__)
+
+    def __call__(self, *args, **kwargs):
+        obj = self.owner.get()
+        if obj is None:
+            return None
+        return self.__func__(obj, *args, **kwargs)
+
+
+class WeakOwner:
+    """Stands in for an object registered with weak=True, so the director doesn't keep it alive
+
+    The registration is purged when the object is collected, or when a widget
+    that has been attached to the DOM is found detached from it.
+    """
+
+    def __init__(self, obj: object, on_dead: Callable[[WeakOwner], None]):
+        self.key = id(obj)
+        self.ref = weakref.ref(obj, lambda _: on_dead(self))
+        self.on_dead = on_dead
+        self.name = f"{type(obj).__module__}.{type(obj).__qualname__}"
+        self.was_attached: bool = getattr(obj, "is_attached", False)
+        self.handlers: Dict[str, WeakHandler] = {}
+
+    def get(self) -> Optional[object]:
+        obj = self.ref()
+        if obj is None:
+            return None
+
+        attached = getattr(obj, "is_attached", None)
+        if attached is None or attached:
+            self.was_attached = self.was_attached or bool(attached)
+            return obj
+
+        if self.was_attached:
+            # the widget has been unmounted
+            self.on_dead(self)
+            return None
+
+        return obj
+
+    def add_method(self, method: Callable) -> WeakHandler:
+        if method.__name__ not in self.handlers:
+            self.handlers[method.__name__] = WeakHandler(self, method)
+        return self.handlers[method.__name__]
+
+    def __dir__(self):
+        return list(self.handlers)
+
+    def __getattr__(self, name: str):
+        try:
+            return self.__dict__["handlers"][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __repr__(self):
+        return f"<weak {self.name}>"
+
+
 class Director:
     def __init__(self, session: Session):
         self.session = session
         self.action_manager: ActionManager = ActionManager()
+        self.substitute_manager: SubstituteManager = SubstituteManager()
         self.command_manager: CommandManager = CommandManager(session)
         self.ticker_manager: TickerManager = TickerManager()
         self.alias_manager: AliasManager = AliasManager(session)
         self.event_manager: EventManager = EventManager()
-
-    def register_object(self, obj: object):
-        if getattr(obj, "register_actions", True):
+        self.weak_owners: Dict[int, WeakOwner] = {}
+
+    def get_weak_owner(self, obj: object) -> WeakOwner:
+        if id(obj) not in self.weak_owners:
+            self.weak_owners[id(obj)] = WeakOwner(obj, on_dead=self.unregister_object)
+        return self.weak_owners[id(obj)]
+
+    def register_object(self, obj: object, weak: bool = False):
+        """
+        Register the actions, tickers, commands and events of an object
+
+        :param obj: The object to register
+        :param weak: Don't keep the object alive, its registrations are purged
+                     when it is collected or, for widgets, unmounted
+        """
+        register_actions = getattr(obj, "register_actions", True)
+        if weak:
+            owner = self.get_weak_owner(obj)
+            for _, member in inspect.getmembers(obj, inspect.ismethod):
+                if any(hasattr(member, attribute) for attribute in REGISTRATION_ATTRIBUTES):
+                    owner.add_method(member)
+            obj = owner
+
+        if register_actions:
             self.action_manager.register_object(obj)
 
         self.ticker_manager.register_object(obj)
         self.command_manager.register_object(obj)
         self.event_manager.register_object(obj)
 
+    def add_listener(self, listener: Callable, weak: bool = False):
+        """Add an event listener, with weak=True a bound method doesn't keep its object alive"""
+        if weak:
+            owner = self.get_weak_owner(listener.__self__)
+            self.event_manager.add_listener(owner.add_method(listener), source=owner)
+        else:
+            self.event_manager.add_listener(listener)
+
     def unregister_object(self, obj: object):
+        if not isinstance(obj, WeakOwner):
+            obj = self.weak_owners.get(id(obj), obj)
+        if isinstance(obj, WeakOwner) and self.weak_owners.get(obj.key) is obj:
+            del self.weak_owners[obj.key]
+
         self.action_manager.unregister_object(obj)
+        self.substitute_manager.unregister_object(obj)
         self.ticker_manager.unregister_object(obj)
         self.command_manager.unregister_object(obj)
         self.event_manager.unregister_object(obj)
 
     def get_registrations_for_object(self, obj: object) -> List:
         registrations: List[Registration] = []
+        obj = self.weak_owners.get(id(obj), obj)
 
-        for act in self.action_manager.actions.queue:
+        for act in self.action_manager.actions:
             if act.source == obj:
                 registrations.append(Registration("action", act.name, act.callback, act.pattern))
 
+        for block in self.action_manager.block_actions:
+            if block.source == obj:
+                registrations.append(Registration("block action", block.name, block.callback, block.description))
+
+        for sub in self.substitute_manager.substitutes:
+            if sub.source == obj:
+                detail = f"{sub.pattern!r} -> {sub.repl!r}"
+                registrations.append(Registration("substitute", sub.name, sub.replacement, detail))
+
         for tkr in self.ticker_manager.tickers:
             if tkr.source == obj:
                 detail = f"seconds={tkr.seconds}, repeats={tkr.repeats}"
@@ -61,9 +187,21 @@ class Director:
                 registrations.append(Registration("command", cmd.name, cmd.callback, cmd.get_description()))
 
         # Create lookup of members
-        for trigger, pq in self.event_manager.events.items():
-            for et in pq.queue:
+        for trigger, tasks in self.event_manager.events.items():
+            for et in tasks:
                 if et.source == obj:
                     registrations.append(Registration("event", et.trigger, et.handler, f"priority={et.priority}"))
 
         return registrations
+
+    def get_registered_sources(self) -> List[object]:
+        """Every object with a registration, weakly registered objects as their WeakOwner"""
+        sources = [act.source for act in self.action_manager.actions]
+        sources += [block.source for block in self.action_manager.block_actions]
+        sources += [sub.source for sub in self.substitute_manager.substitutes]
+        sources += [tkr.source for tkr in self.ticker_manager.tickers]
+        sources += [cmd.source for cmd in self.command_manager.commands.values()]
+        sources += [et.source for tasks in self.event_manager.events.values() for et in tasks]
+
+        unique = {id(source): source for source in sources if source is not None}
+        return list(unique.values())
@@ -1,12 +1,21 @@
 """Common stuff for mud.events module"""
+import asyncio
 import inspect
+import time
 from dataclasses import dataclass, field
-from queue import PriorityQueue
-from typing import Dict, Callable
-from collections import Counter
+from operator import attrgetter
+from typing import Dict, Callable, Tuple
+from collections import Counter, deque
 
 from textual import log
 
+# event types wildcard triggers do not receive, they are only sent to listeners for the exact name
+WILDCARD_EXCLUDED = frozenset({"core.msdp.batch"})
+
+# events that used to be dispatched under one name and are now dispatched as <name>.<subtype>,
+# listeners for the old name are deprecated and receive them as if they were <name>.*
+RENAMED_EVENTS = frozenset({"core.msdp"})
+
 @dataclass
 class AbacuraMessage:
     """Base message object to pass into events"""
@@ -16,18 +25,56 @@ class AbacuraMessage:
 
 @dataclass(order=True)
 class EventTask:
-    """Task for the event PriorityQueue"""
+    """A registered event handler"""
     priority: int
     source: object = field(compare=False)
     handler: Callable = field(compare=False)
     trigger: str
+    deferred: bool = field(default=False, compare=False)
+
+    @property
+    def name(self) -> str:
+        return f"{self.handler.__module__}.{self.handler.__qualname__}"
+
+
+class HandlerTiming:
+    """Call count and run time of one event handler"""
+
+    def __init__(self):
+        self.calls: int = 0
+        self.total_ns: int = 0
+        self.worst_ns: int = 0
+        self.worst_event: str = ""
+        self.samples: deque = deque(maxlen=1000)
+
+    def record(self, elapsed_ns: int, event_type: str):
+        self.calls += 1
+        self.total_ns += elapsed_ns
+        self.samples.append(elapsed_ns)
+        if elapsed_ns > self.worst_ns:
+            self.worst_ns = elapsed_ns
+            self.worst_event = event_type
+
+    @property
+    def mean_ns(self) -> float:
+        return self.total_ns / max(1, self.calls)
 
+    @property
+    def p99_ns(self) -> int:
+        samples = sorted(self.samples)
+        return samples[int(len(samples) * 0.99)] if samples else 0
 
-def event(trigger: str = '', priority: int = 5):
-    """Decorator for event functions"""
+
+def event(trigger: str = '', priority: int = 5, deferred: bool = False):
+    """Decorator for event functions
+
+    Deferred handlers, and any async def handler, run from the event loop
+    after the current dispatch rather than inside it.
+    """
     def add_event(fn):
         fn.event_trigger = trigger
         fn.event_priority = priority
+        fn.event_deferred = deferred
 
         return fn
 
@@ -35,12 +82,47 @@ def event(trigger: str = '', priority: int = 5):
 
 
 class EventManager:
-    """Load and Manage Events"""
+    """Load and Manage Events
 
-    def __init__(self):
+    Handlers for each trigger are kept in a tuple sorted by priority, rebuilt
+    whenever a listener is added or removed.  A trigger ending in '*' is a
+    wildcard: 'core.msdp.*' receives every event starting with 'core.msdp.', apart from
+    those in WILDCARD_EXCLUDED.  A listener for one of the RENAMED_EVENTS is
+    treated the same way, with a deprecation warning when it is added.
+    The handlers for each event type, wildcards included, are resolved once
+    and cached until the registrations change.
+
+    Deferred handlers are queued and run soon after the dispatch, a slice at
+    a time, so they don't stall reading from the socket.  A handler that is
+    still pending for the same event type is given the newer message instead
+    of being queued twice.  When max_deferred handlers are pending or running
+    as async tasks, dispatch runs the oldest queued one itself before queueing
+    another, and an async handler that would start a task beyond the limit is
+    dropped.  Handlers are only timed while timing is set.
+    """
+
+    def __init__(self, max_deferred: int = 1000, deferred_slice: float = 0.005):
         log("Booting EventManager")
-        self.events: Dict[str, PriorityQueue] = {}
+        self.events: Dict[str, Tuple[EventTask, ...]] = {}
         self.event_counts = Counter()
+        self.handlers: Dict[str, Tuple[EventTask, ...]] = {}
+        # event types with at least one deferred handler
+        self.mixed: set[str] = set()
+
+        self.max_deferred = max_deferred
+        self.deferred_slice_ns = int(deferred_slice * 1e9)
+        self.deferred: Dict[tuple, tuple[EventTask, AbacuraMessage]] = {}
+        self.deferred_scheduled: bool = False
+        self.deferred_run: int = 0
+        self.deferred_coalesced: int = 0
+        self.deferred_overflows: int = 0
+        self.deferred_errors: int = 0
+        self.deferred_dropped: int = 0
+        # the loop only keeps weak references to tasks
+        self.async_tasks: set[asyncio.Task] = set()
+
+        self.timing: bool = False
+        self.timings: Dict[str, HandlerTiming] = {}
 
     def register_object(self, obj: object):
         """Find and register all events in an object"""
@@ -54,24 +136,178 @@ class EventManager:
 
     def unregister_object(self, obj: object):
         """Remove an object's events from the manager"""
-        for trigger, pq in self.events.items():
-            pq.queue[:] = [e for e in pq.queue if e.source != obj]
+        for trigger, tasks in list(self.events.items()):
+            self.set_tasks(trigger, [e for e in tasks if e.source != obj])
+
+        for key, (task, _) in list(self.deferred.items()):
+            if task.source == obj:
+                del self.deferred[key]
 
     def add_listener(self, listener: Callable, source: object = None):
         """Add an event listener"""
         trigger: str = getattr(listener, "event_trigger")
+        if trigger in RENAMED_EVENTS:
+            log.warning(f"Event listener {getattr(listener, '__qualname__', listener)} uses '{trigger}', "
+                        f"which is deprecated, it is dispatched as '{trigger}.<name>', listen for '{trigger}.*'")
+
+        is_async = inspect.iscoroutinefunction(getattr(listener, "__func__", listener))
+        deferred = getattr(listener, "event_deferred", False) or is_async
         task = EventTask(handler=listener, source=source, trigger=trigger,
-                         priority=getattr(listener, "event_priority"))
+                         priority=getattr(listener, "event_priority"), deferred=deferred)
 
-        self.events.setdefault(trigger, PriorityQueue()).put(task)
+        self.set_tasks(trigger, self.events.get(trigger, ()) + (task,))
+
+    def set_tasks(self, trigger: str, tasks):
+        """Replace the handlers for a trigger, lowest priority number first, then in order of registration"""
+        if tasks:
+            self.events[trigger] = tuple(sorted(tasks, key=attrgetter("priority")))
+        else:
+            self.events.pop(trigger, None)
+        self.handlers.clear()
+        self.mixed.clear()
+
+    def resolve(self, event_type: str) -> Tuple[EventTask, ...]:
+        """Find the handlers for an event type, including wildcard triggers that match it"""
+        tasks = self.events.get(event_type, ())
+        wildcards = [task for trigger, wildcard_tasks in self.events.items()
+                     if (trigger[-1:] == "*" and event_type.startswith(trigger[:-1]) and trigger != event_type)
+                     or (trigger in RENAMED_EVENTS and event_type.startswith(trigger + "."))
+                     for task in wildcard_tasks]
+        if wildcards and event_type not in WILDCARD_EXCLUDED:
+            # at equal priority, wildcard listeners run first
+            tasks = tuple(sorted(tuple(wildcards) + tasks, key=attrgetter("priority")))
+
+        self.handlers[event_type] = tasks
+        if any(task.deferred for task in tasks):
+            self.mixed.add(event_type)
+        return tasks
 
     def dispatch(self, message: AbacuraMessage):
         """Dispatch events"""
-        if message.event_type not in self.events:
+        tasks = self.handlers.get(message.event_type)
+        if tasks is None:
+            tasks = self.resolve(message.event_type)
+
+        if not tasks:
             return
 
         self.event_counts[message.event_type] += 1
 
-        results = [task.handler(message) for task in self.events[message.event_type].queue]
-        if len(results) == 1:
-            return results[0]
+        if not self.timing and message.event_type not in self.mixed:
+            if len(tasks) == 1:
+                return tasks[0].handler(message)
+
+            for task in tasks:
+                task.handler(message)
+            return
+
+        result = None
+        for task in tasks:
+            if task.deferred:
+                self.defer(task, message)
+            elif self.timing:
+                result = self.call(task, message)
+            else:
+                result = task.handler(message)
+
+        return result if len(tasks) == 1 else None
+
+    def call(self, task: EventTask, message: AbacuraMessage):
+        """Run a handler, recording how long it took"""
+        start = time.perf_counter_ns()
+        try:
+            return task.handler(message)
+        finally:
+            self.record_timing(task, message, time.perf_counter_ns() - start)
+
+    def record_timing(self, task: EventTask, message: AbacuraMessage, elapsed_ns: int):
+        timing = self.timings.get(task.name)
+        if timing is None:
+            timing = self.timings[task.name] = HandlerTiming()
+        timing.record(elapsed_ns, message.event_type)
+
+    def defer(self, task: EventTask, message: AbacuraMessage):
+        """Queue a handler to run after the current dispatch"""
+        key = (id(task), message.event_type)
+        if key in self.deferred:
+            # still waiting, run it once with the newest message
+            self.deferred[key] = (task, message)
+            self.deferred_coalesced += 1
+            return
+
+        if len(self.deferred) + len(self.async_tasks) >= self.max_deferred:
+            # back-pressure, the dispatcher pays for the oldest pending handler
+            self.deferred_overflows += 1
+            if self.deferred:
+                self.run_next_deferred()
+
+        self.deferred[key] = (task, message)
+        self.schedule_deferred()
+
+    def schedule_deferred(self):
+        if self.deferred_scheduled:
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # no event loop (scripts, benchmarks), run everything now
+            while self.deferred:
+                self.run_next_deferred()
+            return
+
+        self.deferred_scheduled = True
+        loop.call_soon(self.run_deferred)
+
+    def run_deferred(self):
+        """Run pending handlers for up to one time slice, leaving the rest for the next pass of the loop"""
+        self.deferred_scheduled = False
+        deadline = time.perf_counter_ns() + self.deferred_slice_ns
+        while self.deferred and time.perf_counter_ns() < deadline:
+            self.run_next_deferred()
+
+        if self.deferred:
+            self.schedule_deferred()
+
+    def run_next_deferred(self):
+        key = next(iter(self.deferred))
+        task, message = self.deferred.pop(key)
+        self.deferred_run += 1
+
+        if inspect.iscoroutinefunction(getattr(task.handler, "__func__", task.handler)):
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                asyncio.run(self.run_async(task, message))
+                return
+
+            if len(self.async_tasks) >= self.max_deferred:
+                self.deferred_dropped += 1
+                log.warning(f"Async event handler {task.name} dropped on {message.event_type}, "
+                            f"{len(self.async_tasks)} still running")
+                return
+
+            async_task = loop.create_task(self.run_async(task, message))
+            self.async_tasks.add(async_task)
+            async_task.add_done_callback(self.async_tasks.discard)
+            return
+
+        try:
+            if self.timing:
+                self.call(task, message)
+            else:
+                task.handler(message)
+        except Exception as e:
+            self.deferred_errors += 1
+            log.error(f"Deferred event handler {task.name} failed on {message.event_type}: {e!r}")
+
+    async def run_async(self, task: EventTask, message: AbacuraMessage):
+        start = time.perf_counter_ns()
+        try:
+            await task.handler(message)
+        except Exception as e:
+            self.deferred_errors += 1
+            log.error(f"Async event handler {task.name} failed on {message.event_type}: {e!r}")
+        finally:
+            if self.timing:
+                self.record_timing(task, message, time.perf_counter_ns() - start)
@@ -7,14 +7,27 @@ class EventPlugin(Plugin):
     """Commands and things """
 
     @command(name="events")
-    def eventscommand(self, name: str = ''):
+    def eventscommand(self, name: str = '', timing: bool = False, reset: bool = False):
         """
         Show event metrics and handlers
 
         :param name: Show handlers for this event name
+        :param timing: Show handler run times, turning on timing of handlers
+        :param reset: Clear the handler run times and turn off timing
         """
         event_manager = self.session.director.event_manager
 
+        if reset:
+            event_manager.timing = False
+            event_manager.timings.clear()
+            if not timing:
+                self.output("[yellow]Event handler timing off", markup=True)
+                return
+
+        if timing:
+            self.show_timing()
+            return
+
         if name:
             keys = [key for key in event_manager.events.keys() if key.lower().startswith(name.lower())]
             exact = [key for key in keys if key.lower() == name.lower()]
@@ -30,8 +43,9 @@ class EventPlugin(Plugin):
                 if key != show_event:
                     continue
 
-                for f in value.queue:
-                    rows.append({"Priority": f.priority, "Module": f.handler.__module__, "Method": f.handler.__name__})
+                for f in value:
+                    rows.append({"Priority": f.priority, "Module": f.handler.__module__, "Method": f.handler.__name__,
+                                 "Deferred": f.deferred})
 
             self.output(AbacuraPanel(tabulate(rows), title=show_event))
             return
@@ -39,7 +53,7 @@ class EventPlugin(Plugin):
         rows = []
         for key, value in event_manager.events.items():
             row = {"Event Name": key,
-                   "# Handlers": value.qsize(),
+                   "# Handlers": len(value),
                    "# Events Processed": event_manager.event_counts[key]}
 
             # if detail:
@@ -49,6 +63,29 @@ class EventPlugin(Plugin):
 
         self.output(AbacuraPanel(tabulate(rows), title="Events"))
 
+    def show_timing(self):
+        event_manager = self.session.director.event_manager
+        if not event_manager.timing:
+            event_manager.timing = True
+            self.output("[yellow]Timing all event handlers from now on, #events --reset to stop", markup=True)
+
+        rows = []
+        timings = sorted(event_manager.timings.items(), key=lambda t: t[1].total_ns, reverse=True)
+        for name, t in timings:
+            rows.append((name, t.calls, f"{t.mean_ns / 1e6:.3f}", f"{t.p99_ns / 1e6:.3f}",
+                         f"{t.worst_ns / 1e6:.3f}", t.worst_event))
+
+        caption = (f" Deferred: {len(event_manager.deferred)} pending, {len(event_manager.async_tasks)} async running, "
+                   f"{event_manager.deferred_run} run, {event_manager.deferred_coalesced} coalesced, "
+                   f"{event_manager.deferred_overflows} overflows, {event_manager.deferred_dropped} dropped, "
+                   f"{event_manager.deferred_errors} errors")
+        if timings:
+            caption += f"\n Worst offender: {timings[0][0]} ({timings[0][1].total_ns / 1e6:.1f}ms total)"
+
+        tbl = tabulate(rows, headers=["Handler", "Calls", "Mean ms", "p99 ms", "Worst ms", "Worst Event"],
+                       caption=caption)
+        self.output(AbacuraPanel(tbl, title="Event Handler Timing"), actionable=False)
+
     @command(name="dispatch")
     def dispatch_event(self, trigger: str, value: str = ""):
         """
@@ -1,4 +1,5 @@
 import time
+from datetime import datetime
 
 from rich.panel import Panel
 from rich.pretty import Pretty
@@ -13,6 +14,7 @@ class SessionHelper(Plugin):
         super().__init__()
         if self.session.ring_buffer:
             self.add_ticker(1, self.session.ring_buffer.commit, name="ring-autocommit")
+        self.add_ticker(1, self.session.msdp_history.commit, name="msdp-history-autocommit")
 
     """Session specific commands"""
     @command(name="echo")
@@ -38,12 +40,31 @@ class SessionHelper(Plugin):
         self.session.output(text, markup=True)
 
     @command(name="msdp")
-    def msdp_command(self, variable: str = '') -> None:
+    def msdp_command(self, variable: str = '', stats: bool = False, history: bool = False, _limit: int = 20) -> None:
         """
         Dump MSDP values for debugging
 
         :param variable: The name of a variable to view, leave blank for all
+        :param stats: Show counts of updates received and dispatched
+        :param history: Show recent changes of the variable
+        :param _limit: Number of changes to show with --history
         """
+        if stats:
+            msdp = self.core_msdp
+            rows = [("Batching", "on" if msdp.batch else "off"),
+                    ("Updates received", msdp.updates_received),
+                    ("Unchanged, suppressed", msdp.updates_suppressed),
+                    ("Updates dispatched", msdp.updates_dispatched),
+                    ("Batches dispatched", msdp.batches_dispatched),
+                    ("Pending changes", len(msdp.changed))]
+            tbl = tabulate(rows, headers=["Metric", "Value"])
+            self.output(AbacuraPanel(tbl, title="MSDP Statistics"), actionable=False)
+            return
+
+        if history:
+            self.show_msdp_history(variable, _limit)
+            return
+
         if "REPORTABLE_VARIABLES" not in self.core_msdp.values:
             raise CommandError("MSDP not loaded")
 
@@ -53,6 +74,24 @@ class SessionHelper(Plugin):
             panel = Panel(Pretty(self.core_msdp.values.get(variable, None)), highlight=True)
         self.session.output(panel, highlight=True, actionable=False)
 
+    def show_msdp_history(self, variable: str, limit: int):
+        msdp_history = self.session.msdp_history
+        if not variable:
+            rows = [(name, len(msdp_history.columns[name])) for name in msdp_history.variables]
+            tbl = tabulate(rows, headers=["Variable", "Changes"],
+                           caption=f" {msdp_history.changes_recorded} changes recorded")
+            self.output(AbacuraPanel(tbl, title="MSDP History"), actionable=False)
+            return
+
+        changes = msdp_history.last(variable.upper(), limit)
+        if not changes:
+            raise CommandError(f"No history for MSDP variable '{variable}'")
+
+        rows = [(datetime.fromtimestamp(ns / 1e9).strftime('%H:%M:%S.%f')[:-3], repr(value))
+                for ns, value in changes]
+        tbl = tabulate(rows, headers=["Time", "Value"])
+        self.output(AbacuraPanel(tbl, title=f"MSDP History: {variable.upper()}"), actionable=False)
+
     @command(name="workers")
     def workers(self, group: str = ""):
         """
@@ -1,3 +1,5 @@
+import re
+import sqlite3
 import time
 
 from rich.text import Text
@@ -5,32 +7,66 @@ from textual import on
 from textual.app import ComposeResult
 from textual.containers import Grid, Horizontal
 from textual.timer import Timer
-from textual.widgets import Button, Input, Label, RichLog, Select, Checkbox
+from textual.widgets import Button, Checkbox, Input, Label, RichLog, Select
 
 from abacura.screens import AbacuraWindow
 from abacura.plugins import Plugin, command, CommandError
+from abacura.utils.ansi import ansi_text
 from abacura.utils.ring_buffer import RingBufferLogSql
 from abacura.utils.renderables import tabulate, AbacuraPropertyGroup, AbacuraPanel, Group, OutputColors
 
 
 class LogSearcher:
+    # lines a regular expression is tried on when it has no word to look up in the index
+    MAX_SCAN = 10000
+
     def __init__(self, ring_buffer: RingBufferLogSql):
         self.ring_buffer = ring_buffer
+        self.scan_limited: bool = False
 
-    def search_logs(self, like: str = "", limit: int = 100, minutes_ago: int = 0, show_msdp: bool = False) -> list:
-        like = like[1:] if len(like) and like[0] == "^" else "%" + like
-        like = like[:-1] if len(like) and like[-1] == "$" else like + "%"
+    def search_logs(self, like: str = "", limit: int = 100, minutes_ago: int = 0, regex: bool = False) -> list:
+        """Search the output log, raising ValueError for an invalid search
 
+        Plain text is a full text search for lines with all of the words, the last one
+        possibly incomplete.  Text using % or anchored with ^ or $ is a LIKE search.
+        """
         ns_ago = int(minutes_ago) * 60 * 1000 * 1000 * 1000
         epoch_start = 0 if not minutes_ago else (time.time_ns() - ns_ago)
+        self.scan_limited = False
+
+        try:
+            if regex:
+                self.scan_limited = not self.ring_buffer.pattern_query(re.compile(like))
+                return self.ring_buffer.search(pattern=like, limit=limit, epoch_start=epoch_start,
+                                               max_scan=self.MAX_SCAN)
+
+            if self.ring_buffer.fts and like.strip() and not any(c in like for c in "%^$"):
+                return self.ring_buffer.search(self.fts_query(like), limit=limit, epoch_start=epoch_start)
+        except re.error as exc:
+            raise ValueError(f"Invalid regular expression: {exc}")
+        except sqlite3.OperationalError as exc:
+            raise ValueError(f"Invalid search: {exc}")
 
-        clauses = [] if show_msdp else [r"stripped not like '!MSDP%'"]
-        clauses = [""] + clauses if len(clauses) else []
-        exclude_clause = " and ".join(clauses)
+        like = like[1:] if len(like) and like[0] == "^" else "%" + like
+        like = like[:-1] if len(like) and like[-1] == "$" else like + "%"
 
-        logs = self.ring_buffer.query(like, clause=exclude_clause, limit=limit, epoch_start=epoch_start)
+        logs = self.ring_buffer.query(like, limit=limit, epoch_start=epoch_start)
         return logs
 
+    @staticmethod
+    def fts_query(text: str) -> str:
+        """Quote each word, and match the last one as a prefix, unless the text already uses FTS5 syntax"""
+        words = text.split()
+        if '"' in text or "*" in text or "(" in text or any(w in ("AND", "OR", "NOT", "NEAR") for w in words):
+            return text
+        return " ".join('"%s"' % w for w in words) + "*"
+
+    @property
+    def scan_note(self) -> str:
+        if not self.scan_limited:
+            return ''
+        return f", newest {self.MAX_SCAN} lines searched, the regex has no word to look up"
+
 
 class LogSearchWindow(AbacuraWindow):
     """Log Screen with a search box"""
@@ -43,30 +79,37 @@ class LogSearchWindow(AbacuraWindow):
     ]
 
     # CSS_PATH = "css/kallisti.css"
-    def __init__(self, searcher: LogSearcher, find: str = "%", show_msdp: bool = False):
-        super().__init__(title="Log Search")
+    def __init__(self, searcher: LogSearcher, find: str = "%", regex: bool = False, minutes: int = 0):
+        super().__init__(title=f"Log Search, last {minutes} minutes" if minutes else "Log Search")
         self.searcher = searcher
+        self.minutes = minutes
         self.richlog = RichLog(id="logsearch-log")
         self.input = Input(id="logsearch-input", placeholder="search text")
         if find != "%":
             self.input.value = find
         row_options = [(" 100 rows", 100), ("1000 rows", 1000)]
         self.row_limit = Select[int](row_options, id="logsearch-rows", value=100)
-        self.msdp_checkbox = Checkbox("MSDP", value=show_msdp)
+        self.regex = Checkbox("Regex", regex, id="logsearch-regex")
         self.footer: Label = Label("", id="logsearch-footer")
 
         self.call_after_refresh(self.run_search, find)
         self.populate_timer: Timer | None = None
 
         self.richlog.can_focus = False
-        self.msdp_checkbox.can_focus = False
         self.row_limit.can_focus = False
+        self.regex.can_focus = False
 
     async def run_search(self, find: str = '%'):
         if self.populate_timer:
             self.populate_timer.stop()
         start = time.monotonic()
-        results = self.searcher.search_logs(find, limit=self.row_limit.value, show_msdp=self.msdp_checkbox.value)
+        try:
+            results = self.searcher.search_logs(find, limit=self.row_limit.value, minutes_ago=self.minutes,
+                                                regex=self.regex.value)
+        except ValueError as exc:
+            self.footer.renderable = Text(str(exc), style="red")
+            self.footer.refresh()
+            return
         elapsed = time.monotonic() - start
         self.call_later(self.display_results, results, elapsed)
 
@@ -78,11 +121,11 @@ class LogSearchWindow(AbacuraWindow):
             self.richlog.auto_scroll = True
             if len(results):
                 for lt, lc, ll in results:
-                    self.richlog.write(Text.from_ansi(f"{lt:15} {lc:>6} {ll[:300]}"))
+                    self.richlog.write(ansi_text(f"{lt:15} {lc:>6} {ll[:300]}", cache=False))
             else:
                 self.richlog.write(Text("No results found", style="red"))
 
-            self.footer.renderable = Text(f"{len(results)} lines returned in {elapsed:5.3f}s")
+            self.footer.renderable = Text(f"{len(results)} lines returned in {elapsed:5.3f}s{self.searcher.scan_note}")
             self.footer.refresh()
 
     def compose(self) -> ComposeResult:
@@ -93,7 +136,7 @@ class LogSearchWindow(AbacuraWindow):
 
             with Horizontal():
                 yield self.row_limit
-                yield self.msdp_checkbox
+                yield self.regex
 
             yield Label("Search Results", id="logsearch-results-label")
             yield self.richlog
@@ -101,14 +144,14 @@ class LogSearchWindow(AbacuraWindow):
 
         self.screen.set_focus(self.input)
 
-    @on(Checkbox.Changed)
-    async def checkbox_changed(self, _event: Checkbox.Changed) -> None:
-        await self.run_search(self.input.value)
-
     @on(Select.Changed)
     async def select_changed(self, _event: Select.Changed) -> None:
         await self.run_search(self.input.value)
 
+    @on(Checkbox.Changed)
+    async def regex_changed(self, _event: Checkbox.Changed) -> None:
+        await self.run_search(self.input.value)
+
     @on(Input.Changed)
     async def on_input_changed(self, event: Input.Changed):
         async def run_search():
@@ -117,7 +160,7 @@ class LogSearchWindow(AbacuraWindow):
         if self.populate_timer:
             self.populate_timer.stop()
 
-        self.populate_timer = self.set_timer(0.40, run_search)
+        self.populate_timer = self.set_timer(0.15, run_search)
 
     async def on_input_submitted(self, event: Input.Submitted):
         if self.populate_timer:
@@ -141,36 +184,56 @@ class LogSearchWindow(AbacuraWindow):
 class LogSearch(Plugin):
 
     @command
-    def log(self, find: str = "%", limit: int = 40, dump: bool = False, msdp: bool = False):
+    def log(self, find: str = "%", limit: int = 40, dump: bool = False, stats: bool = False,
+            regex: bool = False, drop_index: bool = False, _minutes: int = 0):
         """
         Search output log and show results in a window
 
-        :param find: Search for text using sql % wildcard style
+        Words find lines containing all of them, "quoted phrases" and prefix* terms are
+        supported.  Use sql % wildcards, or ^ and $ anchors, for a LIKE search.
+
+        :param find: Search for text
         :param limit: limit the number of log entries returned
-        :param msdp: Show msdp values
         :param dump: dump output to mud instead of bringing up new window
+        :param stats: show output log writer statistics
+        :param regex: find is a regular expression
+        :param drop_index: remove the full text index, set ring_fts = false to stop it being created again
+        :param _minutes: only search the last number of minutes
         """
 
         if self.session.ring_buffer is None:
             raise CommandError("No output log ring buffer configured")
 
+        if stats:
+            self.show_stats()
+            return
+
+        if drop_index:
+            self.session.ring_buffer.drop_fts()
+            self.output("[yellow]Full text index removed, searches scan the log", markup=True)
+            return
+
         ls = LogSearcher(self.session.ring_buffer)
 
         if not dump:
-            window = LogSearchWindow(ls, find, msdp)
+            window = LogSearchWindow(ls, find, regex, _minutes)
             self.session.screen.mount(window)
             return
 
-        logs = ls.search_logs(find, limit, show_msdp=msdp)
-        logs = [(t, c, Text.from_ansi(l).markup) for t, c, l in logs]
+        try:
+            logs = ls.search_logs(find, limit, minutes_ago=_minutes, regex=regex)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        logs = [(t, c, ansi_text(l, cache=False).markup) for t, c, l in logs]
 
-        pview = AbacuraPropertyGroup({"Find": find, "Limit": limit, "MSDP": msdp}, title="Properties")
+        pview = AbacuraPropertyGroup({"Find": find, "Limit": limit, "Regex": regex, "Minutes": _minutes},
+                                     title="Properties")
 
         if len(logs) == 0:
             results = Text.assemble(("Results\n\n", OutputColors.section), ("No logs found", ""))
         else:
             headers = ["Time", "Context", "Line"]
-            caption = f" {len(logs)} logs found"
+            caption = f" {len(logs)} logs found{ls.scan_note}"
             from rich.table import Table
             tbl = Table()
             tbl.add_column("Time")
@@ -182,3 +245,24 @@ class LogSearch(Plugin):
             results = tabulate(logs, headers=headers, title="Results", caption=caption, expand=True)
 
         self.output(AbacuraPanel(Group(pview, Text(), results), "Log Search", expand=True))
+
+    def show_stats(self):
+        rb = self.session.ring_buffer
+        writer = "inline"
+        if rb.queue is not None:
+            writer = "background, %s when full" % rb.overflow if rb.writer_alive else "inline, background writer stopped"
+        rows = [("Writer", writer),
+                ("Full text index", "on" if rb.fts else "off"),
+                ("Lines logged", rb.rows_logged),
+                ("Lines dropped", rb.rows_dropped),
+                ("Queue depth", rb.queue_depth),
+                ("Max queue depth", rb.max_queue_depth),
+                ("Batches written", rb.batches_written),
+                ("Rows written", rb.rows_written),
+                ("Mean batch write ms", f"{rb.mean_write_ms:.2f}"),
+                ("Worst batch write ms", f"{rb.worst_write_ns / 1e6:.2f}"),
+                ("Write errors", rb.write_errors)]
+        if rb.last_write_error:
+            rows.append(("Last write error", rb.last_write_error))
+        tbl = tabulate(rows, headers=["Metric", "Value"])
+        self.output(AbacuraPanel(tbl, title="Output Log Statistics"), actionable=False)
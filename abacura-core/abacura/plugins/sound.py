@@ -4,15 +4,20 @@ Handle MSP
 
 
 from abacura.mud import OutputMessage
-from abacura.plugins import Plugin, action
+from abacura.plugins import Plugin, action, CONSUME
 
 
 class SoundPlugin(Plugin):
     """Handle MSP sound"""
-    @action(r'^!!SOUND\((.*)\)')
+    @action(r'^!!SOUND\((.*)\)', priority=-1)
     def msp(self, wav: str, msg: OutputMessage):
         msg.gag = True
+        self.play(wav)
 
+        # an MSP trigger is not output, no other action should see it
+        return CONSUME
+
+    def play(self, wav: str):
         try:
             from playsound import playsound
         except ModuleNotFoundError as exc:
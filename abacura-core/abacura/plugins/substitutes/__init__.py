@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import re
+from bisect import insort
+from operator import attrgetter
+from typing import List, Optional
+
+from rich.text import Text
+
+from abacura.mud import OutputMessage
+from abacura.plugins.actions.prefilter import PlainLine, PrefilterIndex
+
+
+class Substitute:
+    """Replace the text matching a pattern in output lines before they are displayed
+
+    The replacement may use group references such as \\1 or \\g<name>, and with
+    markup set it is rendered as rich markup.  It takes the colour of the first
+    character it replaces.
+    """
+
+    def __init__(self, source: object, pattern: str, repl: str, flags: int = 0, name: str = '',
+                 priority: int = 0, markup: bool = False):
+        self.source = source
+        self.pattern = pattern
+        self.repl = repl
+        self.flags = flags
+        self.compiled_re = re.compile(pattern, flags)
+        self.name = name
+        self.priority = priority
+        self.markup = markup
+        # substitutes match the text as displayed, without ANSI codes
+        self.color = False
+        self.static_repl: Optional[Text] = None if "\\" in repl else self.make_text(repl)
+
+    def make_text(self, replacement: str) -> Text:
+        return Text.from_markup(replacement) if self.markup else Text(replacement)
+
+    def replacement(self, match: re.Match) -> Text:
+        if self.static_repl is not None:
+            return self.static_repl.copy()
+        return self.make_text(match.expand(self.repl))
+
+
+class SubstituteManager:
+    """Apply substitutes to each line in one pass, lowest priority number first, then in order of registration
+
+    A substitute only replaces text that no earlier substitute has already replaced.
+    """
+
+    def __init__(self):
+        self.substitutes: List[Substitute] = []
+        self._index: Optional[PrefilterIndex[Substitute]] = None
+        self.lines_substituted: int = 0
+        self.replacements: int = 0
+
+    @property
+    def index(self) -> PrefilterIndex[Substitute]:
+        if self._index is None:
+            self._index = PrefilterIndex(self.substitutes)
+        return self._index
+
+    def unregister_object(self, obj: object):
+        self.substitutes = [s for s in self.substitutes if s.source != obj]
+        self._index = None
+
+    def add(self, substitute: Substitute):
+        if substitute.name:
+            self.substitutes = [s for s in self.substitutes if s.name != substitute.name]
+        insort(self.substitutes, substitute, key=attrgetter("priority"))
+        self._index = None
+
+    def remove(self, name: str):
+        self.substitutes = [s for s in self.substitutes if s.name != name]
+        self._index = None
+
+    def render(self, message: OutputMessage) -> Text:
+        """The line as rich Text, ANSI colours included, with the substitutes applied"""
+        return self.render_text(message.text)
+
+    def render_text(self, text: Text) -> Text:
+        """Apply the substitutes to a line already converted to Text, returned unchanged when none match"""
+        if not self.substitutes:
+            return text
+
+        plain = text.plain
+        candidates = self.index.candidates(PlainLine(plain))
+        if not candidates:
+            return text
+
+        claimed = []
+        for substitute in candidates:
+            for match in substitute.compiled_re.finditer(plain):
+                start, end = match.span()
+                if not any(start < claim_end and claim_start < end or start == end == claim_start == claim_end
+                           for claim_start, claim_end, _, _ in claimed):
+                    claimed.append((start, end, substitute, match))
+
+        if not claimed:
+            return text
+
+        claimed.sort(key=lambda claim: claim[:2])
+        offsets = []
+        for start, end, _, _ in claimed:
+            offsets += (start, end)
+
+        # pieces alternate between kept text and replaced text
+        pieces = text.divide(offsets)
+        result = text.blank_copy()
+        result.append_text(pieces[0])
+        for i, (start, end, substitute, match) in enumerate(claimed):
+            replaced = pieces[2 * i + 1]
+            replacement = substitute.replacement(match)
+            for span in reversed(replaced.spans):
+                if span.start == 0:
+                    replacement.stylize_before(span.style, 0, len(replacement))
+            result.append_text(replacement)
+            result.append_text(pieces[2 * i + 2])
+
+        self.lines_substituted += 1
+        self.replacements += len(claimed)
+        return result
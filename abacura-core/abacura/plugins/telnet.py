@@ -1,21 +1,41 @@
 import asyncio
+import time
+import zlib
 from textual import log
 from typing import TYPE_CHECKING
 
-from abacura.mud.options import GA, TelnetOption
+from abacura.mud.options import IAC, WILL, WONT, TelnetOption
+from abacura.mud.options.mccp import MCCP2, MCCP3
 from abacura.mud.options.ttype import TerminalTypeOption
-from abacura.plugins import Plugin
+from abacura.mud.recording import SessionRecorder, ReplayWriter, StageTimer, read_recording
+from abacura.mud.telnet import TelnetDecoder, TelnetWriter, DO_BYTE, DONT_BYTE, WILL_BYTE, WONT_BYTE
+from abacura.plugins import Plugin, command, CommandError
 from abacura.plugins.events import AbacuraMessage
+from abacura.utils import human_format
+from abacura.utils.renderables import tabulate, AbacuraPanel
+
+NAWS = 31
+ECHO = 1
+
 
 class TelnetPlugin(Plugin):
     """Handles telnet connectivity"""
     def __init__(self):
         super().__init__()
         self.options: dict[int, TelnetOption] = {}
-        self.poll_timeout = 0.001
+        self.read_size = 65536
         self.go_ahead = self.config.get_specific_option(self.session.name, "ga")
+        # seconds to wait for more data before flushing a partial line on muds without GA,
+        # by default a partial line is flushed as soon as a read empties the socket buffer
+        self.quiet_time = float(self.config.get_specific_option(self.session.name, "quiet_time", 0))
+        self.mccp = self.config.get_specific_option(self.session.name, "mccp", True)
         self.connected = False
-        self.outb = b''
+        self.writer = None
+        self.recorder: SessionRecorder | None = None
+        self.decoder = TelnetDecoder(on_line=self.handle_line, on_prompt=self.handle_prompt,
+                                     on_negotiation=self.handle_negotiation,
+                                     on_subnegotiation=self.handle_subnegotiation,
+                                     on_command=self.handle_command)
 
     # TODO: Need a better way of handling this, possibly an autoloader
     def register_options(self, handlers: list[TelnetOption]):
@@ -27,14 +47,93 @@ class TelnetPlugin(Plugin):
         ttype = TerminalTypeOption(self.session.writer)
         self.options[ttype.code] = ttype
 
-    # TODO move this into a separate thing, it's getting too long
+        if self.mccp:
+            for option in (MCCP2(self.decoder, self.writer), MCCP3(self.writer)):
+                self.options[option.code] = option
+
+    @staticmethod
+    def decode_line(buf: bytearray) -> str:
+        return buf.decode("UTF-8", errors="ignore").replace("\r", " ").replace("\t", "        ")
+
+    def handle_line(self, buf: bytearray):
+        """A complete line arrived, send it for processing"""
+        self.output(self.decode_line(buf), ansi=True)
+
+    def handle_prompt(self, buf: bytearray):
+        """telnet GA sequence, likely end of prompt"""
+        prompt = buf.decode("UTF-8", errors="ignore")
+        self.director.action_manager.end_blocks()
+        self.output(prompt, ansi=True)
+        self.dispatch(AbacuraMessage("core.prompt", prompt))
+        self.core_msdp.end_batch()
+
+    def flush_partial_line(self, idle: bool = True):
+        """Send a partial line (prompt without GA) for processing
+
+        Blocks ending at a prompt are only completed once the socket has been idle,
+        a partial line at the end of any read may just be a line split across segments.
+        """
+        buf = self.decoder.flush()
+        if buf is not None:
+            if idle:
+                self.director.action_manager.end_blocks()
+            self.output(self.decode_line(buf), ansi=True)
+            self.core_msdp.end_batch()
+
+    def handle_negotiation(self, command: int, code: int):
+        """IAC DO/DONT/WILL/WONT sequences"""
+        option = self.options.get(code, None)
+
+        if command == DO_BYTE:
+            if option:
+                log.debug(f"IAC DO for {option.name}")
+                option.do()
+            elif code == NAWS:
+                # IAC WON'T NAWS
+                self.writer.write(IAC + WONT + bytes([NAWS]))
+
+        elif command == DONT_BYTE:
+            if option:
+                log.debug(f"IAC DONT for {option.name}")
+                option.dont()
+
+        elif command == WILL_BYTE:
+            if option:
+                log.debug(f"IAC WILL for {option.name}")
+                option.will()
+            elif code == ECHO:
+                self.dispatch(AbacuraMessage(event_type="core.password_mode", value="on"))
+            else:
+                self.writer.write(IAC + WILL + bytes([code]))
+                log.debug(f"IAC WILL for Unknown ({code})")
+
+        elif command == WONT_BYTE:
+            if option:
+                log.debug(f"IAC WONT for {option.name}")
+                option.wont()
+            elif code == ECHO:
+                self.dispatch(AbacuraMessage(event_type="core.password_mode", value="off"))
+
+    def handle_subnegotiation(self, code: int, payload: bytearray):
+        """IAC SB sequences, options receive the code, the payload and the trailing IAC"""
+        if code in self.options:
+            log.debug(f"IAC SB for {self.options[code].name}")
+            self.options[code].sb(bytes([code]) + payload + IAC)
+        else:
+            log.debug(f"IAC SB for Unknown ({code})")
+
+    @staticmethod
+    def handle_command(command: int):
+        log.debug(f"IAC unknown {command}")
+
     async def telnet_client(self, host: str, port: int, handlers: list[TelnetOption]) -> None:
         """async worker to handle input/output on socket"""
 
         log.info(f"Session {self.session.name} connecting to {host} {port} with {handlers}")
         try:
             reader, writer = await asyncio.open_connection(host, port)
-            self.session.writer = writer
+            self.writer = TelnetWriter(writer)
+            self.session.writer = self.writer
             self.session.connected = True
             self.connected = True
         except TimeoutError:
@@ -48,129 +147,203 @@ class TelnetPlugin(Plugin):
 
         self.register_options(handlers)
 
+        record_file = self.config.get_specific_option(self.session.name, "record_file")
+        if record_file:
+            self.start_recording(record_file)
 
         while self.connected is True:
 
-            # We read one character at a time so that we can find IAC sequences
-            # We use wait_for() so we can work with muds that don't use GA
+            # We read large chunks and let the decoder find lines and IAC sequences
+            # For muds that don't use GA, a partial line is a prompt once the socket goes quiet
             try:
-                if self.go_ahead:
-                    data = await reader.read(1)
+                if self.go_ahead or self.quiet_time <= 0 or not self.decoder.pending:
+                    data = await reader.read(self.read_size)
                 else:
-                    data = await asyncio.wait_for(reader.read(1), timeout=self.poll_timeout)
+                    data = await asyncio.wait_for(reader.read(self.read_size), timeout=self.quiet_time)
             except BrokenPipeError:
                 self.output("[bold red]# Lost connection to server.", markup=True)
                 self.connected = False
-                return
+                break
             except ConnectionResetError:
                 self.output("[bold red]# Connection reset by peer.", markup=True)
                 self.connected = False
-                return
+                break
             except asyncio.TimeoutError:
-                if len(self.outb) > 0:
-                    self.output(self.outb.decode("UTF-8", errors="ignore").replace("\r", " ").replace("\t", "        "), ansi=True)
-                    self.outb = b''
-                    self.poll_timeout = 0.001
-                else:
-                    if self.poll_timeout < 0.05:
-                        self.poll_timeout *= 2
-                        log.debug(f"timeout {self.poll_timeout}")
+                self.flush_partial_line()
                 continue
 
             # Empty string means we lost our connection
             if data == b'':
                 self.session.show_error("Lost connection to server.")
                 self.connected = False
+                continue
 
-            # End of a MUD line in buffer, send for processing
-            elif data == b'\n':
-                self.output(self.outb.decode("UTF-8", errors="ignore").replace("\r", " ").replace("\t", "        "), ansi=True)
-                self.outb = b''
-
-            # handle IAC sequences
-            elif data == b'\xff':
-                data = await reader.read(1)
-
-                # IAC DO
-                if data == b'\xfd':
-                    data = await reader.read(1)
-
-                    if ord(data) in self.options:
-                        log.debug(f"IAC DO for {self.options[ord(data)].name}")
-                        self.options[ord(data)].do()
-                    else:
-                        if data == b'\x1f':
-                            # IAC WON'T NAWS
-                            writer.write(b'\xff\xfc\x1f')
-                            #self.output("IAC WON'T NAWS")
-                        else:
-                            pass
-                            #self.output(f"IAC DO {ord(data)}")
-
-                # IAC DONT
-                if data == b'\xfe':
-                    data = await reader.read(1)
-                    if ord(data) in self.options:
-                        log.debug(f"IAC DONT for {self.options[ord(data)].name}")
-                        self.options[ord(data)].dont()
-                # IAC WILL
-                elif data == b'\xfb':
-                    data = await reader.read(1)
-                    if ord(data) in self.options:
-                        log.debug(f"IAC WILL for {self.options[ord(data)].name}")
-                        self.options[ord(data)].will()
-                    elif ord(data) == 1:
-                        self.dispatch(AbacuraMessage(event_type="core.password_mode", value="on"))
-                    else:
-                        writer.write(b'\xff\xfb' + data)
-                        log.debug(f"IAC WILL for Unknown ({ord(data)})")
-
-                # IAC WONT
-                elif data == b'\xfc':
-                    data = await reader.read(1)
-                    #self.output(f"IAC WONT {data}")
-                    if ord(data) in self.options:
-                        log.debug(f"IAC WILL for {self.options[ord(data)].name}")
-                        self.options[ord(data)].wont()
-                    elif ord(data) == 1:
-                        self.dispatch(AbacuraMessage(event_type="core.password_mode", value="off"))
-                # SB
-                elif data == b'\xfa':
-                    c = await reader.read(1)
-                    data = c
-                    buf = b''
-                    while c != b'\xf0':
-                        buf = buf + c
-                        c = await reader.read(1)
-                    if ord(data) in self.options:
-                        log.debug(f"IAC SB for {self.options[ord(data)].name}")
-                        self.options[ord(data)].sb(buf)
-                    else:
-                        log.debug(f"IAC SB for Unknown ({ord(data)})")
-
-                # TTYPE
-                #elif data == b'\x18':
-                #    writer.write(b'{IAC}')
-                #    #self.output(f"IAC TTYPE")
-
-                # NAWS
-                elif data == b'\x1f':
-                    #self.output(f"IAC NAWS")
-                    pass
-
-                # telnet GA sequence, likely end of prompt
-                elif data == GA:
-                    self.output(self.outb.decode("UTF-8", errors="ignore"), ansi=True)
-                    self.dispatch(AbacuraMessage("core.prompt", self.outb.decode("UTF-8", errors="ignore")))
-                    # self.output("")
-
-                    self.outb = b''
-
-                # IAC UNKNOWN
-                else:
-                    log.debug(f"IAC unknown {data}")
-                    #self.output(f"IAC UNKNOWN {ord(data)}")
+            try:
+                self.receive(data)
+            except zlib.error as exc:
+                self.session.show_error(f"MCCP decompression failed: {exc}")
+                self.connected = False
+                self.session.connected = False
+                self.writer.close()
 
-            # Catch everything else in our buffer and hold it
-            else:
-                self.outb = self.outb + data
+        self.stop_recording()
+
+    def receive(self, data: bytes):
+        """Process one read from the socket"""
+        if self.recorder:
+            self.recorder.record(data)
+
+        self.decoder.feed(data)
+
+        # A short read means the stream reader's buffer is empty
+        drained = len(data) < self.read_size
+        if drained and not self.go_ahead and self.quiet_time <= 0:
+            self.flush_partial_line(idle=False)
+
+    def start_recording(self, filename: str):
+        self.stop_recording()
+        self.recorder = SessionRecorder(filename)
+
+    def stop_recording(self) -> SessionRecorder | None:
+        recorder = self.recorder
+        if recorder:
+            recorder.close()
+            self.recorder = None
+        return recorder
+
+    async def replay_client(self, filename: str, speed: float, handlers: list[TelnetOption]) -> None:
+        """async worker to feed a recording through the telnet pipeline, speed 0 is as fast as possible"""
+
+        log.info(f"Session {self.session.name} replaying {filename} at speed {speed or 'max'}")
+        self.writer = TelnetWriter(ReplayWriter())
+        self.session.writer = self.writer
+        self.session.connected = True
+        self.connected = True
+        self.register_options(handlers)
+
+        # time each stage of the pipeline, stages include the stages they call
+        timer = StageTimer()
+        session = self.session
+        action_manager = self.director.action_manager
+        event_manager = self.director.event_manager
+        output = self.output
+        self.output = timer.wrap("output", output)
+        event_manager.dispatch = timer.wrap("events", event_manager.dispatch)
+        action_manager.process_output = timer.wrap("actions", action_manager.process_output)
+        session.flush_output = timer.wrap("render", session.flush_output)
+        receive = timer.wrap("telnet", self.receive)
+        flush_partial_line = timer.wrap("telnet", self.flush_partial_line)
+        frames, frame_lines = session.frames, session.frame_lines
+
+        # flush partial lines where the recorded session went quiet, whatever the replay speed
+        quiet_ns = 0 if self.go_ahead or self.quiet_time <= 0 else self.quiet_time * 1e9
+        last_ns = 0
+        start = time.monotonic()
+        try:
+            for offset_ns, data in read_recording(filename):
+                if not self.connected:
+                    break
+
+                delay = start + offset_ns / 1e9 / speed - time.monotonic() if speed else 0
+                await asyncio.sleep(max(0.0, delay))
+                if quiet_ns and offset_ns - last_ns >= quiet_ns:
+                    flush_partial_line()
+                last_ns = offset_ns
+                receive(data)
+        except Exception as exc:
+            session.show_exception(exc, msg=f"Replay of {filename} failed")
+        finally:
+            elapsed = time.monotonic() - start
+            self.output = output
+            del event_manager.dispatch
+            del action_manager.process_output
+
+        self.flush_partial_line()
+        session.flush_output()
+        del session.flush_output
+        self.connected = False
+        session.connected = False
+        self.show_replay_report(filename, timer, elapsed, session.frames - frames, session.frame_lines - frame_lines)
+
+    def show_replay_report(self, filename: str, timer: StageTimer, elapsed: float, frames: int, frame_lines: int):
+        decoder = self.decoder
+        rows = []
+        for stage, label in (("telnet", "telnet (all)"), ("output", "  output"),
+                             ("actions", "    actions"), ("events", "  events"), ("render", "render")):
+            stage_s = timer.elapsed_ns[stage] / 1e9
+            calls = timer.calls[stage]
+            rows.append((label, calls, stage_s, 1e6 * stage_s / max(1, calls), 100 * stage_s / max(elapsed, 1e-9)))
+
+        caption = (f" {human_format(decoder.bytes_received)} bytes, {human_format(decoder.lines_decoded)} lines in "
+                   f"{elapsed:.3f}s: {decoder.bytes_received / max(elapsed, 1e-9) / 1e6:.2f} MB/s, "
+                   f"{decoder.lines_decoded / max(elapsed, 1e-9):,.0f} lines/s\n"
+                   f" {frames} frames: {frames / max(elapsed, 1e-9):.1f} fps, "
+                   f"{frame_lines / max(frames, 1):.1f} lines per frame")
+        tbl = tabulate(rows, headers=["Stage", "Calls", "Seconds", "Mean us", "% Elapsed"], caption=caption)
+        self.output(AbacuraPanel(tbl, title=f"Replay of {filename}"), actionable=False)
+
+    @command
+    def record(self, filename: str = '', stop: bool = False):
+        """
+        Record raw inbound telnet data for replay with 'abacura --replay'
+
+        :param filename: File to record into
+        :param stop: Stop recording
+        """
+        if stop:
+            recorder = self.stop_recording()
+            if recorder is None:
+                raise CommandError("Not recording")
+            self.output(f"Recorded {recorder.records} reads, {human_format(recorder.bytes_recorded)} bytes "
+                        f"to {recorder.filename}")
+            return
+
+        if not filename:
+            if self.recorder is None:
+                raise CommandError("Not recording")
+            self.output(f"Recording to {self.recorder.filename}: {self.recorder.records} reads, "
+                        f"{human_format(self.recorder.bytes_recorded)} bytes")
+            return
+
+        self.start_recording(filename)
+        self.output(f"Recording to {filename}")
+
+    @command(name="telnet")
+    def telnet_command(self, view: str = "stats"):
+        """
+        Show telnet connection details
+
+        :param view: 'stats' shows traffic and compression statistics
+        """
+        if view.lower() != "stats":
+            raise CommandError(f"Unknown telnet view '{view}'")
+
+        decoder = self.decoder
+        rows = [("Received", "bytes", human_format(decoder.bytes_received)),
+                ("Received", "lines", human_format(decoder.lines_decoded))]
+
+        inflate_ratio = decoder.inflated_bytes / max(1, decoder.compressed_bytes)
+        rows.append(("MCCP2", "enabled", decoder.compressing))
+        rows.append(("MCCP2", "compressed", human_format(decoder.compressed_bytes)))
+        rows.append(("MCCP2", "inflated", human_format(decoder.inflated_bytes)))
+        rows.append(("MCCP2", "ratio", f"{inflate_ratio:.2f}"))
+        rows.append(("MCCP2", "bytes saved", human_format(decoder.inflated_bytes - decoder.compressed_bytes)))
+
+        if self.writer is not None:
+            writer = self.writer
+            rows.append(("Outbound", "writes", human_format(writer.writes)))
+            rows.append(("Outbound", "socket writes", human_format(writer.socket_writes)))
+            rows.append(("Outbound", "queue depth", f"{writer.queued_writes} ({writer.queue_depth} bytes)"))
+            rows.append(("Outbound", "bytes in flight", human_format(writer.bytes_in_flight)))
+            rows.append(("Outbound", "drains", human_format(writer.drains)))
+            rows.append(("Outbound", "dropped", f"{writer.writes_dropped} ({writer.bytes_dropped} bytes)"))
+
+            deflate_ratio = writer.bytes_written / max(1, writer.bytes_sent)
+            rows.append(("MCCP3", "enabled", writer.compressing))
+            rows.append(("MCCP3", "written", human_format(writer.bytes_written)))
+            rows.append(("MCCP3", "sent", human_format(writer.bytes_sent)))
+            rows.append(("MCCP3", "ratio", f"{deflate_ratio:.2f}"))
+            rows.append(("MCCP3", "bytes saved", human_format(writer.bytes_written - writer.bytes_sent)))
+
+        tbl = tabulate(rows, headers=["Stream", "Metric", "Value"])
+        self.output(AbacuraPanel(tbl, title="Telnet Statistics"), actionable=False)
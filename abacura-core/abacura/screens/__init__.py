@@ -7,32 +7,31 @@ from typing import TYPE_CHECKING
 from textual.app import ComposeResult
 from textual.containers import Container
 from textual.screen import Screen
-from textual.widgets import Header, RichLog
+from textual.widgets import Header
 from textual import events
 
 from abacura.widgets import CommsLog, InputBar
 from abacura.widgets.debug import DebugDock
 from abacura.widgets.footer import AbacuraFooter
+from abacura.widgets.scrollback import ScrollbackLog
 from abacura.widgets.sidebar import Sidebar
 
 if TYPE_CHECKING:
     from abacura.mud.session import Session
 
 
-class SessionRichLog(RichLog):
+class SessionRichLog(ScrollbackLog):
 
     def on_resize(self, _e: events.Resize):
         # animate this to reduce "flicker" when toggling commslog, debuglog
         self.scroll_end(duration=0.1)
 
-    def viewing_end(self) -> bool:
-        return self.scroll_offset.y >= self.virtual_size.height - self.content_size.height
-
 
 class SessionScreen(Screen):
     """Default Screen for sessions"""
 
-    MAX_LINES: int = 10000
+    # rendered lines kept in memory, older lines are paged in from the ring log
+    MAX_LINES: int = 2000
 
     BINDINGS = [
         ("pageup", "pageup", "PageUp"),
@@ -52,9 +51,11 @@ class SessionScreen(Screen):
         self.id = f"screen-{name}"
         self.tlid = f"output-{name}"
         # TODO: wrap should be a config file field option
-        self.tl: SessionRichLog = SessionRichLog(highlight=False, markup=False, wrap=True, auto_scroll=False,
-                                                 name=self.tlid, classes="mudoutput", id=self.tlid,
-                                                 max_lines=self.MAX_LINES)
+        window_lines = session.config.get_specific_option(name, "scrollback_lines", self.MAX_LINES)
+        self.tl: SessionRichLog = SessionRichLog(ring_buffer=session.ring_buffer, window_lines=window_lines,
+                                                 page_renderer=session.render_logged,
+                                                 highlight=False, markup=False, wrap=True, auto_scroll=False,
+                                                 name=self.tlid, classes="mudoutput", id=self.tlid)
         self.tl.can_focus = False
         self.footer = None
 
@@ -107,6 +108,8 @@ class SessionScreen(Screen):
         # self.tl.auto_scroll = False
         # self.tl.max_lines = self.MAX_LINES * 2
 
+        if self.tl.scroll_offset.y <= 0:
+            self.tl.page_older()
         self.tl.scroll_page_up(duration=0.3)
 
     def action_pagedown(self) -> None:
@@ -120,13 +123,18 @@ class SessionScreen(Screen):
         # self.tl.auto_scroll = False
         # self.tl.max_lines = self.MAX_LINES * 2
 
+        if self.tl.scroll_offset.y <= 0:
+            self.tl.page_older()
         self.tl.scroll_home(duration=0.3)
 
     def action_scroll_end(self) -> None:
         # self.tl.auto_scroll = True
         # self.tl.max_lines = self.MAX_LINES
 
-        self.tl.scroll_end(duration=0.3)
+        if self.tl.detached:
+            self.tl.resume_live()
+        else:
+            self.tl.scroll_end(duration=0.3)
 
 
 class AbacuraWindow(Container):
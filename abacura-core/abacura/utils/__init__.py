@@ -11,6 +11,10 @@ _pct_colors[0]  = "red"
 
 ansi_escape = re.compile(r'\x1b(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
 
+def strip_ansi(s: str) -> str:
+    """Remove ANSI escape sequences from a string, skipping the regex when there are none"""
+    return ansi_escape.sub('', s) if "\x1b" in s else s
+
 def percent_color(cval: Real) -> str:
     for key, value in _pct_colors.items():
         if key < cval:
@@ -0,0 +1,137 @@
+"""Fast conversion of MUD output with ANSI colour codes into rich Text
+
+Produces the same Text as Text.from_ansi.  MUD output only uses a handful of
+SGR sequences, so each (style, sequence) transition is resolved once and the
+resulting Style is interned.  The last few thousand converted lines are also
+cached, so a line written to the main log, the comms log and a search window
+is only converted once.
+"""
+from collections import OrderedDict
+from contextlib import suppress
+from typing import Dict, List, Optional, Tuple
+
+from rich.ansi import SGR_STYLE_MAP, re_ansi
+from rich.color import Color
+from rich.style import Style
+from rich.text import Span, Text
+
+NULL_STYLE = Style.null()
+
+
+class AnsiConverter:
+    """Convert lines with ANSI codes into Text, caching styles and recent lines"""
+
+    def __init__(self, max_lines: int = 2048):
+        self.max_lines = max_lines
+        self.transitions: Dict[Tuple[Style, str], Style] = {}
+        self.lines: OrderedDict[str, Tuple[str, List[Span]]] = OrderedDict()
+        self.conversions: int = 0
+        self.hits: int = 0
+
+    def to_text(self, ansi: str, cache: bool = True) -> Text:
+        """A new Text for a string with ANSI codes
+
+        Set cache to False for strings that will not be seen again, such as search
+        results, so they do not push recent output lines out of the cache.
+        """
+        if "\x1b" not in ansi and "\r" not in ansi and "\n" not in ansi:
+            return Text(ansi, tab_size=8)
+
+        if not cache:
+            plain, spans = self.convert(ansi)
+            return Text(plain, spans=spans, tab_size=8)
+
+        lines = self.lines
+        cached = lines.get(ansi)
+        if cached is None:
+            cached = lines[ansi] = self.convert(ansi)
+            self.conversions += 1
+            if len(lines) > self.max_lines:
+                lines.popitem(last=False)
+        else:
+            self.hits += 1
+            lines.move_to_end(ansi)
+
+        plain, spans = cached
+        return Text(plain, spans=spans[:], tab_size=8)
+
+    def convert(self, ansi: str) -> Tuple[str, List[Span]]:
+        style = NULL_STYLE
+        parts = []
+        spans = []
+        offset = 0
+        for n, line in enumerate(ansi.splitlines()):
+            if n:
+                parts.append("\n")
+                offset += 1
+            line = line.rsplit("\r", 1)[-1]
+
+            position = 0
+            for match in re_ansi.finditer(line):
+                start, end = match.span()
+                if start > position:
+                    plain = line[position:start]
+                    parts.append(plain)
+                    if style:
+                        spans.append(Span(offset, offset + len(plain), style))
+                    offset += len(plain)
+
+                osc, sequence = match.groups()
+                if sequence:
+                    if sequence == "(":
+                        # character set selection, skip the designator
+                        position = end + 1
+                        continue
+                    if sequence.endswith("m"):
+                        style = self.apply_sgr(style, sequence[1:-1])
+                elif osc is not None and osc.startswith("8;"):
+                    _params, semicolon, link = osc[2:].partition(";")
+                    if semicolon:
+                        style = style.update_link(link or None)
+                position = end
+
+            if position < len(line):
+                plain = line[position:]
+                parts.append(plain)
+                if style:
+                    spans.append(Span(offset, offset + len(plain), style))
+                offset += len(plain)
+
+        return "".join(parts), spans
+
+    def apply_sgr(self, style: Style, sgr: str) -> Style:
+        """The style after an SGR sequence, the same as rich's AnsiDecoder"""
+        key = (style, sgr)
+        result = self.transitions.get(key)
+        if result is not None:
+            return result
+
+        result = style
+        codes = [min(255, int(code) if code else 0) for code in sgr.split(";") if code.isdigit() or code == ""]
+        iter_codes = iter(codes)
+        for code in iter_codes:
+            if code == 0:
+                result = NULL_STYLE
+            elif code in SGR_STYLE_MAP:
+                result += Style.parse(SGR_STYLE_MAP[code])
+            elif code in (38, 48):
+                with suppress(StopIteration):
+                    color: Optional[Color] = None
+                    color_type = next(iter_codes)
+                    if color_type == 5:
+                        color = Color.from_ansi(next(iter_codes))
+                    elif color_type == 2:
+                        color = Color.from_rgb(next(iter_codes), next(iter_codes), next(iter_codes))
+                    if color is not None:
+                        result += Style.from_color(color) if code == 38 else Style.from_color(None, color)
+
+        self.transitions[key] = result
+        return result
+
+
+ansi_converter = AnsiConverter()
+
+
+def ansi_text(ansi: str, cache: bool = True) -> Text:
+    """Text.from_ansi, with the styles and recent lines cached"""
+    return ansi_converter.to_text(ansi, cache)
@@ -0,0 +1,121 @@
+import json
+import sqlite3
+import time
+from bisect import bisect_left, bisect_right
+from typing import Any, Optional
+
+
+class MSDPColumn:
+    """Timestamps and values of one MSDP variable, oldest first"""
+
+    def __init__(self):
+        self.times: list[int] = []
+        self.values: list = []
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def append(self, epoch_ns: int, value: Any):
+        self.times.append(epoch_ns)
+        self.values.append(value)
+
+    def remove_first(self, n: int):
+        del self.times[:n]
+        del self.values[:n]
+
+
+class MSDPHistory:
+    """Record every change of each MSDP variable for debugging and metrics
+
+    Changes are held in memory per variable, bounded by age and count.  When a
+    database file is given they are also written to the msdp_log table in
+    batches, and rows older than max_age are removed from it as it is flushed.
+    Use a file of its own, not the ring log, whose writer can hold a write
+    transaction open long enough for these commits to fail as locked.
+    """
+
+    def __init__(self, db_filename: str = '', max_age: float = 3600, max_changes: int = 10000,
+                 batch_size: int = 500):
+        self.max_age_ns = int(max_age * 1e9)
+        self.max_changes = max_changes
+        self.batch_size = batch_size
+        self.columns: dict[str, MSDPColumn] = {}
+        self.changes_recorded: int = 0
+        self.rows_persisted: int = 0
+
+        self.pending: list[tuple[int, str, str]] = []
+        self.conn: Optional[sqlite3.Connection] = None
+        if db_filename:
+            self.conn = sqlite3.connect(db_filename)
+            self.conn.execute("create table if not exists msdp_log(epoch_ns, variable, value)")
+            self.conn.execute("create index if not exists msdp_log_n1 on msdp_log(epoch_ns)")
+
+    @property
+    def variables(self) -> list[str]:
+        return sorted(self.columns)
+
+    def record(self, variable: str, value: Any, epoch_ns: int = 0):
+        epoch_ns = epoch_ns or time.time_ns()
+        column = self.columns.get(variable)
+        if column is None:
+            column = self.columns[variable] = MSDPColumn()
+
+        column.append(epoch_ns, value)
+        self.changes_recorded += 1
+
+        if len(column) > self.max_changes:
+            # remove a large chunk if we hit the max size for efficiency
+            column.remove_first(max(1, self.max_changes // 16))
+        elif len(column) > 1 and column.times[1] < epoch_ns - self.max_age_ns:
+            # keep the newest expired change so value_at() still knows the value at the start of the window
+            column.remove_first(bisect_left(column.times, epoch_ns - self.max_age_ns) - 1)
+
+        if self.conn is not None:
+            text = value if isinstance(value, str) else json.dumps(value)
+            self.pending.append((epoch_ns, variable, text))
+            if len(self.pending) >= self.batch_size:
+                self.commit()
+
+    def between(self, variable: str, start_ns: int, end_ns: int) -> list[tuple[int, Any]]:
+        """(epoch_ns, value) for each change of variable from start_ns up to and including end_ns"""
+        column = self.columns.get(variable)
+        if column is None:
+            return []
+
+        first = bisect_left(column.times, start_ns)
+        last = bisect_right(column.times, end_ns)
+        return list(zip(column.times[first:last], column.values[first:last]))
+
+    def last(self, variable: str, n: int = 10) -> list[tuple[int, Any]]:
+        """The most recent n changes of variable, oldest first"""
+        column = self.columns.get(variable)
+        if column is None or n <= 0:
+            return []
+
+        return list(zip(column.times[-n:], column.values[-n:]))
+
+    def value_at(self, variable: str, epoch_ns: int, default: Any = None) -> Any:
+        """The value variable had at epoch_ns"""
+        column = self.columns.get(variable)
+        if column is None:
+            return default
+
+        i = bisect_right(column.times, epoch_ns)
+        return column.values[i - 1] if i else default
+
+    def commit(self):
+        """Write pending changes to the database"""
+        if self.conn is None or not self.pending:
+            return
+
+        pending, self.pending = self.pending, []
+        with self.conn:
+            self.conn.executemany("insert into msdp_log values(?, ?, ?)", pending)
+            self.conn.execute("delete from msdp_log where epoch_ns < ?", (time.time_ns() - self.max_age_ns,))
+        self.rows_persisted += len(pending)
+
+    def close(self):
+        if self.conn is not None:
+            self.commit()
+            self.conn.close()
+            self.conn = None
@@ -1,32 +1,148 @@
+import atexit
+import re
 import sqlite3
+import threading
+import time
 from datetime import datetime
+from queue import Empty, Full, Queue
 from abacura.mud import OutputMessage
-from typing import Callable, Optional
-import time
+from abacura.utils import strip_ansi
+from typing import Callable, Iterator, Optional, Tuple, List
+
+# identifies a logged line in order, ring numbers alone wrap around
+LogKey = Tuple[int, int]
+
+INSERT_SQL = """insert or replace into ring_log(ring_number, epoch_ns, context, message, stripped, render)
+                values(?, ?, ?, ?, ?, ?)"""
+
+# queued ahead of the rows still waiting, so the writer stops gathering its batch
+_FLUSH = object()
+
+MAX_RING_NUMBER = 2 ** 63 - 1
 
 
 class RingBufferLogSql:
+    """Keep the last ring_size output lines in a sqlite table for searching
+
+    With background set, lines are queued and a writer thread inserts them with
+    executemany, one transaction per batch_rows rows or batch_interval seconds,
+    so a slow disk never stalls the caller.  When the queue is full, the overflow
+    policy either blocks the caller ("block") or drops the line ("drop").  Queries
+    wait for the queued lines to be written first.  A batch that fails to write is
+    retried write_retries times and then dropped, and if the writer thread stops
+    anyway, lines are written inline again rather than queued for nobody.
+
+    Unless fts is False, or sqlite lacks FTS5, the stripped lines are also indexed
+    in the ring_log_fts full text table, kept in step with ring_log by triggers.
+    With fts False an index created earlier is left in place, and still kept up to
+    date, until drop_fts() removes it.
+
+    Each line is logged with how it was rendered, '' for ANSI output, so that
+    paging it back in can display it the same way.
+    """
+
     def __init__(self, db_filename: str = ':memory:', ring_size: int = 10000,
-                 wal: bool = True, commit_interval: int = 10):
+                 wal: bool = True, commit_interval: int = 10, background: bool = False,
+                 queue_size: int = 10000, overflow: str = "block", batch_rows: int = 500,
+                 batch_interval: float = 0.25, write_retries: int = 3, fts: bool = True):
+
+        if overflow not in ("block", "drop"):
+            raise ValueError('Invalid overflow policy %s' % overflow)
 
         self.db_filename = db_filename
         self.ring_size = ring_size
         self.commit_interval = commit_interval
-        self.conn = sqlite3.connect(db_filename)
+        self.conn = sqlite3.connect(db_filename, check_same_thread=not background)
+        # the writer thread and queries share the connection
+        self.lock = threading.Lock()
         self.rows_logged = 0
         self.log_context_provider: Optional[Callable] = None
 
+        self.overflow = overflow
+        self.batch_rows = batch_rows
+        self.batch_interval = batch_interval
+        self.write_retries = write_retries
+        self.queue: Optional[Queue] = Queue(maxsize=queue_size) if background else None
+        self.writer: Optional[threading.Thread] = None
+
+        self.rows_dropped: int = 0
+        self.max_queue_depth: int = 0
+        self.batches_written: int = 0
+        self.rows_written: int = 0
+        self.write_ns: int = 0
+        self.worst_write_ns: int = 0
+        self.write_errors: int = 0
+        self.last_write_error: str = ''
+
         if wal:
             self.conn.execute("PRAGMA journal_mode=WAL")
 
         # sql = "drop table if exists ring_log"
         # self.conn.execute(sql)
-        sql = "create table if not exists ring_log(ring_number not null primary key, epoch_ns, context, message, stripped)"
+        sql = """create table if not exists ring_log(ring_number not null primary key, epoch_ns, context, message,
+                                                     stripped, render not null default '')"""
         self.conn.execute(sql)
+        columns = [row[1] for row in self.conn.execute("pragma table_info(ring_log)")]
+        if "render" not in columns:
+            self.conn.execute("alter table ring_log add column render not null default ''")
         self.conn.execute("create index if not exists ring_log_n1 on ring_log(epoch_ns)")
+        self.fts = self.create_fts() if fts else self.has_fts()
 
         self.ring_number = self.get_current_ring_number()
 
+        if background:
+            self.writer = threading.Thread(target=self.write_batches, name="ring-log-writer", daemon=True)
+            self.writer.start()
+            atexit.register(self.close)
+
+    @property
+    def queue_depth(self) -> int:
+        return self.queue.qsize() if self.queue is not None else 0
+
+    @property
+    def mean_write_ms(self) -> float:
+        return self.write_ns / self.batches_written / 1e6 if self.batches_written else 0
+
+    @property
+    def writer_alive(self) -> bool:
+        return self.writer is not None and self.writer.is_alive()
+
+    def create_fts(self) -> bool:
+        """Create the full text index of stripped lines, returning False if sqlite has no FTS5"""
+        exists = self.has_fts()
+        try:
+            self.conn.execute("create virtual table if not exists ring_log_fts "
+                              "using fts5(stripped, content='ring_log', content_rowid='ring_number')")
+        except sqlite3.OperationalError:
+            return False
+
+        # insert or replace does not fire delete triggers, so remove the old line before it is replaced
+        self.conn.execute("""create trigger if not exists ring_log_fts_bi before insert on ring_log begin
+                               insert into ring_log_fts(ring_log_fts, rowid, stripped)
+                               select 'delete', ring_number, stripped from ring_log where ring_number = new.ring_number;
+                             end""")
+        self.conn.execute("""create trigger if not exists ring_log_fts_ai after insert on ring_log begin
+                               insert into ring_log_fts(rowid, stripped) values (new.ring_number, new.stripped);
+                             end""")
+        if not exists:
+            self.conn.execute("insert into ring_log_fts(ring_log_fts) values('rebuild')")
+        self.conn.commit()
+        return True
+
+    def has_fts(self) -> bool:
+        return self.conn.execute("select 1 from sqlite_master where name = 'ring_log_fts'").fetchone() is not None
+
+    def drop_fts(self) -> bool:
+        """Remove the full text index and the triggers maintaining it"""
+        self.flush()
+        with self.lock:
+            self.conn.execute("drop trigger if exists ring_log_fts_bi")
+            self.conn.execute("drop trigger if exists ring_log_fts_ai")
+            self.conn.execute("drop table if exists ring_log_fts")
+            self.conn.commit()
+        self.fts = False
+        return False
+
     def get_current_ring_number(self):
         sql = """select ifnull(max(ring_number), 0) 
                    from ring_log 
@@ -39,24 +155,140 @@ class RingBufferLogSql:
         # Pass a function to use to provide additional logging context
         self.log_context_provider = context_provider
 
-    def log(self, message: OutputMessage):
-        log_epoch_ns = time.time_ns()
-
+    def log(self, message: OutputMessage, render: str = '') -> Optional[LogKey]:
+        """Log a line, returning the (epoch_ns, ring_number) key it was logged with"""
         if type(message.message) not in [str, 'str']:
-            return
+            return None
 
         if self.log_context_provider is not None:
             log_context = self.log_context_provider()
         else:
             log_context = ''
 
-        values = (self.ring_number, log_epoch_ns, log_context, message.message, message.stripped)
-        self.conn.execute("insert or replace into ring_log values(?, ?, ?, ?, ?)", values)
+        key = (message.epoch_ns, self.ring_number)
+
+        if self.queue is None:
+            values = (self.ring_number, message.epoch_ns, log_context, message.message, message.stripped, render)
+            self.conn.execute(INSERT_SQL, values)
+        elif not self.enqueue((self.ring_number, message.epoch_ns, log_context, message.message, None, render)):
+            self.rows_dropped += 1
+            return None
 
         self.ring_number = (self.ring_number + 1) % self.ring_size
 
         self.rows_logged += 1
-        if self.rows_logged % self.commit_interval == 0:
+        if self.queue is None and self.rows_logged % self.commit_interval == 0:
+            self.conn.commit()
+
+        return key
+
+    def enqueue(self, values: tuple) -> bool:
+        """Queue a row for the writer, returning False if it was dropped"""
+        while self.writer.is_alive():
+            try:
+                # wake up now and then to notice a writer that has stopped
+                self.queue.put(values, block=self.overflow == "block", timeout=1)
+            except Full:
+                if self.overflow == "drop":
+                    return False
+                continue
+            self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+            return True
+
+        # nobody is emptying the queue, write what it holds and this row inline
+        rows = self.drain()
+        rows.append(values)
+        # without retries, the caller is not kept waiting
+        return self.write_rows(rows, retries=0)
+
+    def drain(self) -> list:
+        """Remove and return the rows left in the queue"""
+        rows = []
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except Empty:
+                return rows
+            if item is not None and item is not _FLUSH:
+                rows.append(item)
+            self.queue.task_done()
+
+    def write_rows(self, rows: list, retries: Optional[int] = None) -> bool:
+        """Insert and commit rows in one transaction, retrying failures, returning False if they were dropped"""
+        retries = self.write_retries if retries is None else retries
+        # queued rows are stripped here, off the caller's thread
+        rows = [row if row[4] is not None else (*row[:4], strip_ansi(row[3]), row[5]) for row in rows]
+        for attempt in range(retries + 1):
+            start = time.perf_counter_ns()
+            try:
+                with self.lock:
+                    try:
+                        self.conn.executemany(INSERT_SQL, rows)
+                        self.conn.commit()
+                    except sqlite3.Error:
+                        self.conn.rollback()
+                        raise
+            except sqlite3.Error as exc:
+                self.write_errors += 1
+                self.last_write_error = str(exc)
+                if attempt < retries:
+                    time.sleep(0.1 * (attempt + 1))
+                continue
+
+            elapsed = time.perf_counter_ns() - start
+            self.batches_written += 1
+            self.rows_written += len(rows)
+            self.write_ns += elapsed
+            self.worst_write_ns = max(self.worst_write_ns, elapsed)
+            return True
+
+        self.rows_dropped += len(rows)
+        return False
+
+    def write_batches(self):
+        """Writer thread, insert queued rows until closed"""
+        queue = self.queue
+        running = True
+        while running:
+            items = [queue.get()]
+            deadline = time.monotonic() + self.batch_interval
+            while len(items) < self.batch_rows and items[-1] is not None and items[-1] is not _FLUSH:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(queue.get(timeout=timeout))
+                except Empty:
+                    break
+
+            running = items[-1] is not None
+            rows = [item for item in items if item is not None and item is not _FLUSH]
+            try:
+                if rows:
+                    self.write_rows(rows)
+            finally:
+                for _ in items:
+                    queue.task_done()
+
+    def flush(self):
+        """Wait until every queued line has been written"""
+        if self.writer is None:
+            return
+        if not self.writer.is_alive():
+            rows = self.drain()
+            if rows:
+                self.write_rows(rows, retries=0)
+            return
+        self.queue.put(_FLUSH)
+        self.queue.join()
+
+    def close(self):
+        """Write the queued lines and stop the writer thread"""
+        if self.writer is not None and self.writer.is_alive():
+            self.queue.put(None)
+            self.writer.join()
+        self.flush()
+        with self.lock:
             self.conn.commit()
 
     def query(self, like: str = '', clause: str = '', limit: int = 100, epoch_start: int = 0, grouped: bool = False):
@@ -75,22 +307,133 @@ class RingBufferLogSql:
                   order by 3 desc 
                   limit ? 
               """ % (select, clause, group_by)
-        c = self.conn.execute(sql, (like, epoch_start, limit))
-        results = c.fetchall()
+        self.flush()
+        with self.lock:
+            results = self.conn.execute(sql, (like, epoch_start, limit)).fetchall()
+
+        return [self.format_row(ns, ctx, message) for message, rb, ns, ctx in reversed(results)]
+
+    @staticmethod
+    def format_row(ns: int, ctx: str, message: str) -> tuple:
+        dt: datetime = datetime.fromtimestamp(ns / 1e9)
+        dts = dt.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3]
+        return dts, ctx, message
+
+    def search(self, match: str = '', pattern: str = '', flags: int = 0, limit: int = 100,
+               epoch_start: int = 0, epoch_end: int = 0, max_scan: int = 10000) -> list:
+        """The newest lines matching a full text query and a regular expression, oldest first
+
+        match uses FTS5 query syntax: words, "quoted phrases", prefix* terms and AND / OR / NOT.
+        The pattern is only tried on the lines the index selects, using the words it requires
+        when there is no match.  A pattern without such a word is only tried on the newest
+        max_scan lines.  Only lines logged after epoch_start, and up to epoch_end when given,
+        are returned.
+        """
+        compiled = re.compile(pattern, flags) if pattern else None
+        if compiled is not None and not match:
+            match = self.pattern_query(compiled)
+
+        scan = compiled is not None and not match
+        results = []
+        self.flush()
+        with self.lock:
+            for scanned, (ns, ctx, message, stripped) in enumerate(self.newest_first(match)):
+                if scan and scanned >= max_scan:
+                    break
+                if ns <= epoch_start:
+                    # lines are visited in the order they were logged
+                    break
+                if epoch_end and ns > epoch_end:
+                    continue
+                if compiled is not None and not compiled.search(stripped):
+                    continue
+                results.append(self.format_row(ns, ctx, message))
+                if len(results) >= limit:
+                    break
+
+        results.reverse()
+        return results
 
-        logs = []
-        for message, rb, ns, ctx in reversed(results):
-            dt: datetime = datetime.fromtimestamp(ns / 1e9)
-            dts = dt.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3]
-            logs.append((dts, ctx, message))
+    def pattern_query(self, compiled: re.Pattern) -> str:
+        """A full text query for a word every line matching the pattern must contain"""
+        from abacura.plugins.actions.prefilter import bounded_words, prefilter_key
 
-        return logs
+        if not self.fts:
+            return ''
+        word, literal = prefilter_key(compiled)
+        if literal:
+            words = bounded_words(literal, False, False)
+            word = max(words, key=len) if words else None
+        return '"%s"' % word.replace('"', '""') if word else ''
+
+    def newest_first(self, match: str = '') -> Iterator[tuple]:
+        """(epoch_ns, context, message, stripped) of the lines matching a full text query, newest first
+
+        Ring numbers increase as lines are logged until they wrap around, so the lines
+        up to the newest ring number, then the ones after it, are in order without sorting.
+        """
+        if match and not self.fts:
+            raise ValueError("Full text search is not available")
+
+        newest = self.conn.execute("select ring_number from ring_log order by epoch_ns desc limit 1").fetchone()
+        if newest is None:
+            return
+
+        if match:
+            sql = """select r.epoch_ns, r.context, r.message, r.stripped
+                       from ring_log_fts f cross join ring_log r on r.ring_number = +f.rowid
+                      where ring_log_fts match ? and f.rowid >= ? and f.rowid <= ?
+                      order by f.rowid desc"""
+            params = [match]
+        else:
+            sql = """select epoch_ns, context, message, stripped
+                       from ring_log
+                      where ring_number >= ? and ring_number <= ?
+                      order by ring_number desc"""
+            params = []
+
+        for low, high in ((0, newest[0]), (newest[0] + 1, MAX_RING_NUMBER)):
+            yield from self.conn.execute(sql, params + [low, high])
+
+    def page(self, after: Optional[LogKey] = None, before: Optional[LogKey] = None,
+             limit: int = 500, newest: bool = True) -> List[Tuple[LogKey, str, str]]:
+        """(key, message, render) of the logged lines between two keys, oldest first
+
+        With newest set these are the lines just before 'before', otherwise the lines just after 'after'.
+        """
+        clauses = []
+        params = []
+        if after is not None:
+            clauses.append("epoch_ns >= ? and (epoch_ns > ? or ring_number > ?)")
+            params += [after[0], after[0], after[1]]
+        if before is not None:
+            clauses.append("epoch_ns <= ? and (epoch_ns < ? or ring_number < ?)")
+            params += [before[0], before[0], before[1]]
+
+        where = "where " + " and ".join(clauses) if clauses else ""
+        order = "desc" if newest else "asc"
+        sql = f"""select epoch_ns, ring_number, message, render
+                   from ring_log
+                  {where}
+                  order by epoch_ns {order}, ring_number {order}
+                  limit ?"""
+        self.flush()
+        with self.lock:
+            rows = self.conn.execute(sql, params + [limit]).fetchall()
+        if newest:
+            rows.reverse()
+
+        return [((ns, rn), message, render) for ns, rn, message, render in rows]
 
     def commit(self):
-        self.conn.commit()
+        # the writer thread commits each batch itself
+        if self.queue is None:
+            self.conn.commit()
 
     def checkpoint(self, method: str = 'truncate'):
-        self.commit()
         if method.lower() not in ['truncate', 'passive', 'full', 'restart']:
             raise ValueError('Invalid checkpoint method %s' % method)
-        self.conn.execute("pragma wal_checkpoint(%s)" % method)
+        self.flush()
+        with self.lock:
+            self.conn.commit()
+            self.conn.execute("pragma wal_checkpoint(%s)" % method)
@@ -21,7 +21,7 @@ class AbacuraFooter(Footer):
     level: reactive[str] = reactive[str]("")
 
     def on_mount(self):
-        self.screen.session.add_listener(self.update_level)
+        self.screen.session.add_listener(self.update_level, weak=True)
 
     def render(self) -> str:
         return f"#{self.session_name} {self.level}"
@@ -0,0 +1,237 @@
+"""Output log that keeps a bounded window of rendered lines and pages the rest from the ring log"""
+from __future__ import annotations
+
+from collections import deque
+from typing import Callable, Deque, List, Optional, Tuple
+
+from rich.console import RenderableType
+from rich.measure import measure_renderables
+from rich.segment import Segment
+from rich.text import Text
+from textual import events
+from textual.geometry import Size
+from textual.strip import Strip
+from textual.widgets import RichLog
+
+from abacura.utils.ansi import ansi_text
+from abacura.utils.ring_buffer import LogKey, RingBufferLogSql
+
+# the first and last ring log keys of the lines in one write
+KeyRange = Tuple[LogKey, LogKey]
+
+
+def render_ansi(rows: List[Tuple[str, str]]) -> List[Text]:
+    """Render (message, render) rows read back from the ring log as ANSI output"""
+    return [ansi_text(message, cache=False) for message, _ in rows]
+
+
+class ScrollbackLog(RichLog):
+    """A RichLog that only keeps window_lines rendered lines in memory
+
+    Each write may carry the range of ring log keys of the lines it contains.  Lines
+    that drop out of the window stay in the ring log, and scrolling to the top reads
+    the page of lines before the window back in and renders it.  When the window has
+    to give up its newest lines to make room, the log detaches from live output: new
+    writes are held, unrendered, and scrolling to the bottom pages forward through the
+    ring log until the held writes are reached.
+
+    Only logged lines can be paged back in, output that was never logged, such as
+    command tables, is gone once it leaves the window.  Paged lines are rendered
+    by page_renderer from each message and how the ring log says it was rendered.
+    """
+
+    def __init__(self, ring_buffer: Optional[RingBufferLogSql] = None, window_lines: int = 2000,
+                 page_size: int = 500, page_renderer: Callable[[List[Tuple[str, str]]], List[Text]] = render_ansi,
+                 **kwargs):
+        super().__init__(**kwargs)
+        self.ring_buffer = ring_buffer
+        self.window_lines = window_lines
+        self.page_size = page_size
+        self.page_renderer = page_renderer
+
+        self.line_keys: List[Optional[KeyRange]] = []
+        self.detached: bool = False
+        self.held: Deque[tuple] = deque(maxlen=window_lines)
+        self.at_oldest: bool = False
+        self.pages_loaded: int = 0
+
+    def render_strips(self, content: RenderableType | object, width: Optional[int] = None,
+                      expand: bool = False, shrink: bool = True) -> List[Strip]:
+        """Render content to strips the way RichLog.write does"""
+        console = self.app.console
+        render_options = console.options
+
+        renderable = self._make_renderable(content)
+
+        if isinstance(renderable, Text) and not self.wrap:
+            render_options = render_options.update(overflow="ignore", no_wrap=True)
+
+        render_width = measure_renderables(console, render_options, [renderable]).maximum
+        container_width = self.scrollable_content_region.width if width is None else width
+        if container_width:
+            if expand and render_width < container_width:
+                render_width = container_width
+            if shrink and render_width > container_width:
+                render_width = container_width
+
+        segments = console.render(renderable, render_options.update_width(render_width))
+        lines = list(Segment.split_lines(segments))
+        if not lines:
+            return [Strip.blank(render_width)]
+
+        self.max_width = max(self.max_width, max(sum([segment.cell_length for segment in line]) for line in lines))
+        strips = Strip.from_lines(lines)
+        for strip in strips:
+            strip.adjust_cell_length(render_width)
+        return strips
+
+    def write(self, content: RenderableType | object, width: Optional[int] = None, expand: bool = False,
+              shrink: bool = True, scroll_end: Optional[bool] = None, keys: Optional[KeyRange] = None):
+        """Write text or a rich renderable, with the range of ring log keys it holds"""
+        if self.detached:
+            self.held.append((content, width, expand, shrink, keys))
+            return self
+
+        strips = self.render_strips(content, width, expand, shrink)
+        self.lines.extend(strips)
+        self.line_keys.extend([keys] * len(strips))
+        self.trim_top()
+        self.virtual_size = Size(self.max_width, len(self.lines))
+
+        if self.auto_scroll if scroll_end is None else scroll_end:
+            self.scroll_end(animate=False)
+
+        return self
+
+    def clear(self):
+        self.line_keys.clear()
+        self.held.clear()
+        self.detached = False
+        self.at_oldest = False
+        return super().clear()
+
+    def viewing_end(self) -> bool:
+        return not self.detached and self.scroll_offset.y >= self.virtual_size.height - self.content_size.height
+
+    def trim_top(self):
+        """Drop the oldest lines beyond window_lines, keeping each write whole"""
+        excess = len(self.lines) - self.window_lines
+        if excess <= 0:
+            return
+
+        keys = self.line_keys
+        while excess < len(keys) and keys[excess] is not None and keys[excess] == keys[excess - 1]:
+            excess += 1
+
+        del self.lines[:excess]
+        del keys[:excess]
+        self._start_line += excess
+        self.at_oldest = False
+        self.virtual_size = Size(self.max_width, len(self.lines))
+        self.scroll_to(y=max(0, self.scroll_offset.y - excess), animate=False)
+
+    def trim_bottom(self):
+        """Drop the newest lines beyond window_lines, detaching from live output"""
+        cut = self.window_lines
+        if cut >= len(self.lines):
+            return
+
+        keys = self.line_keys
+        while cut > 0 and keys[cut] is not None and keys[cut] == keys[cut - 1]:
+            cut -= 1
+        if cut == 0:
+            return
+
+        del self.lines[cut:]
+        del keys[cut:]
+        # lines written later reuse these positions
+        self._line_cache.clear()
+        self.detached = True
+
+    def render_page(self, rows: List[Tuple[LogKey, str, str]]) -> Tuple[List[Strip], List[Optional[KeyRange]]]:
+        text = Text("\n").join(self.page_renderer([(message, render) for _, message, render in rows]))
+        strips = self.render_strips(text)
+        return strips, [(rows[0][0], rows[-1][0])] * len(strips)
+
+    def page_older(self):
+        """Render the page of logged lines before the top of the window"""
+        if self.ring_buffer is None or self.at_oldest:
+            return
+
+        before = next((keys[0] for keys in self.line_keys if keys is not None), None)
+        rows = self.ring_buffer.page(before=before, limit=self.page_size)
+        if not rows:
+            self.at_oldest = True
+            return
+
+        strips, keys = self.render_page(rows)
+        self.lines[:0] = strips
+        self.line_keys[:0] = keys
+        self._start_line -= len(strips)
+        self.trim_bottom()
+        self.pages_loaded += 1
+        self.virtual_size = Size(self.max_width, len(self.lines))
+        self.scroll_to(y=self.scroll_offset.y + len(strips), animate=False)
+        self.refresh()
+
+    def page_newer(self):
+        """Render the page of logged lines after the bottom of the window, rejoining live output at the end"""
+        if not self.detached:
+            return
+
+        after = next((keys[1] for keys in reversed(self.line_keys) if keys is not None), None)
+        before = next((keys[0] for *_, keys in self.held if keys is not None), None)
+        rows = self.ring_buffer.page(after=after, before=before, limit=self.page_size, newest=False)
+
+        if rows:
+            strips, keys = self.render_page(rows)
+            self.lines.extend(strips)
+            self.line_keys.extend(keys)
+            self.pages_loaded += 1
+        else:
+            self.detached = False
+            held = list(self.held)
+            self.held.clear()
+            for content, width, expand, shrink, keys in held:
+                self.write(content, width, expand, shrink, scroll_end=False, keys=keys)
+
+        self.trim_top()
+        self.virtual_size = Size(self.max_width, len(self.lines))
+        self.refresh()
+
+    def resume_live(self):
+        """Jump back to live output, reloading the page of logged lines before the held writes"""
+        if self.detached:
+            held = list(self.held)
+            self.clear()
+            before = next((keys[0] for *_, keys in held if keys is not None), None)
+            rows = self.ring_buffer.page(before=before, limit=self.page_size)
+            if rows:
+                strips, keys = self.render_page(rows)
+                self.lines.extend(strips)
+                self.line_keys.extend(keys)
+            for content, width, expand, shrink, keys in held:
+                self.write(content, width, expand, shrink, scroll_end=False, keys=keys)
+
+        self.scroll_end(animate=False)
+
+    def check_paging(self):
+        if self.scroll_offset.y <= 0:
+            self.page_older()
+        elif self.detached and self.scroll_offset.y >= self.max_scroll_y:
+            self.page_newer()
+
+    def watch_scroll_y(self, old_value: float, new_value: float) -> None:
+        super().watch_scroll_y(old_value, new_value)
+        if round(old_value) != round(new_value):
+            if round(new_value) <= 0 or self.detached and round(new_value) >= self.max_scroll_y:
+                self.call_later(self.check_paging)
+
+    def on_mouse_scroll_up(self, _e: events.MouseScrollUp):
+        # already at the top there is no scroll to watch
+        if self.scroll_offset.y <= 0:
+            self.call_later(self.check_paging)
+
+    def on_mouse_scroll_down(self, _e: events.MouseScrollDown):
+        if self.detached and self.scroll_offset.y >= self.max_scroll_y:
+            self.call_later(self.check_paging)
@@ -0,0 +1,101 @@
+"""
+Cost of calling an action callback once its pattern has matched
+
+Compares ActionManager.initiate_callback, which uses the binding plan
+compiled when the Action is created, against the original version that
+rebuilt the argument list from the parameter types on every match.
+
+usage: python action_binding.py [--calls N]
+"""
+import argparse
+import time
+from typing import Match
+
+from abacura.mud import OutputMessage
+from abacura.plugins.actions import Action, ActionError, ActionManager
+
+
+def original_initiate_callback(action: Action, message: OutputMessage, match: Match):
+    g = list(match.groups())
+
+    # perform type conversions
+    if len(g) < action.expected_match_groups:
+        msg = f"Incorrect # of match groups.  Expected {action.expected_match_groups}, got {g}"
+        raise ActionError(msg)
+
+    args = []
+
+    for arg_type in action.parameter_types:
+        if arg_type == Match:
+            value = match
+        elif arg_type == OutputMessage or arg_type == 'OutputMessage':
+            value = message
+        elif arg_type == int:
+            try:
+                value = int(g.pop(0))
+            except (ValueError, TypeError):
+                value = 0
+        elif arg_type == float:
+            try:
+                value = float(g.pop(0))
+            except (ValueError, TypeError):
+                value = float(0)
+        elif callable(arg_type) and arg_type.__name__ != '_empty':
+            value = arg_type(g.pop(0))
+        else:
+            value = g.pop(0)
+
+        args.append(value)
+
+    try:
+        action.callback(*args)
+    except Exception as exc:
+        raise ActionError(exc)
+
+
+def tell(name: str, text: str):
+    pass
+
+
+def reward(xp: int, bonus: int, message: OutputMessage):
+    pass
+
+
+def corpse(kind, race: str, level: int, match: Match):
+    pass
+
+
+CASES = [
+    ("2 str groups", r"^(\w+) tells you, '(.*)'", tell, "Kensho tells you, 'hello there'"),
+    ("2 int + message", r"reward for the kill, (\d+) experience points plus (\d+) bonus", reward,
+     "You receive your reward for the kill, 1234 experience points plus 56 bonus experience"),
+    ("untyped, str, int, match", r"^Corpse type: (.*), Race of deceased: (.*), Level: (\d+)", corpse,
+     "Corpse type: humanoid, Race of deceased: giant, Level: 45"),
+]
+
+
+def timeit(fn, action: Action, message: OutputMessage, match: Match, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn(action, message, match)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200000)
+    args = parser.parse_args()
+
+    print(f"{'callback':24} {'original':>10} {'compiled':>10}")
+    for name, pattern, callback, line in CASES:
+        action = Action(source=None, pattern=pattern, callback=callback)
+        message = OutputMessage(line)
+        match = action.compiled_re.search(message.stripped)
+
+        original = timeit(original_initiate_callback, action, message, match, args.calls)
+        compiled = timeit(ActionManager.initiate_callback, action, message, match, args.calls)
+        print(f"{name:24} {original:8.2f}us {compiled:8.2f}us")
+
+
+if __name__ == "__main__":
+    main()
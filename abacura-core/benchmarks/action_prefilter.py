@@ -0,0 +1,151 @@
+"""
+Action matching cost with and without the literal prefilter
+
+Registers 100, 500 and 2000 actions, a mix of LOK style triggers and
+generated user triggers, and times ActionManager.process_output against
+searching every action on every line.  Also checks both find exactly the
+same matches.
+
+usage: python action_prefilter.py [--lines N] [--counts 100,500,2000]
+"""
+import argparse
+import contextlib
+import io
+import random
+import re
+import time
+from typing import Match
+
+from abacura.mud import OutputMessage
+from abacura.plugins.actions import Action, ActionManager
+from lok_stream import CHATTER, COMBAT, ROOM
+
+LOK_PATTERNS = [
+    r"^(.*) is dead!.*R.I.P.",
+    r"^You gain (\d+) experience for mastering a skill.",
+    r"^You receive your reward for the kill, (\d+) experience points\.",
+    r"^There were (\d+) coins",
+    r"^You (mine|gather|chop down|catch|skin|butcher|extract) some (.*) ",
+    r"^<(\w+): (\w+)( \(.*\))?> '(.*)'",
+    r"^(\w+) (shout|shouts), '(.*)'",
+    r"^\[(\w+):(\(.*\)+)?] '(.*)'",
+    r"^(\w+) say[s]?, '(.*)'",
+    r"(\w+) whispers to you, '(.*)'",
+    r"^(.*) tells you, '(.*)'",
+    r"^(.*) tells the group, '(.*)'",
+    r"^Alas, you cannot go (.*)",
+    r"^(.*) is blocking your way",
+    r"^(Not here!|You can't do that here)",
+    r"\[\* You found ",
+    r"^!!SOUND\((.*)\)",
+    r"^Weight: (\d+) stones, Value: (\d+) coins, Size: (.*)",
+    r"^\[ Exits: ([neswud ]+) \]",
+    r"^(.*) lies here\.",
+]
+
+WORDS = ["giant", "dragon", "orc", "goblin", "troll", "wyvern", "golem", "wraith", "kobold", "ogre",
+         "sword", "shield", "potion", "scroll", "ring", "amulet", "helm", "boots", "cloak", "staff"]
+
+
+def make_patterns(count: int, rng: random.Random) -> list[tuple[str, int, bool]]:
+    patterns = [(p, 0, False) for p in LOK_PATTERNS]
+    while len(patterns) < count:
+        n = len(patterns)
+        word = rng.choice(WORDS)
+        kind = n % 6
+        if kind == 0:
+            patterns.append((rf"^You (\w+) a {word}{n}", 0, False))
+        elif kind == 1:
+            patterns.append((rf"(\w+) {word}{n} hits you", 0, False))
+        elif kind == 2:
+            patterns.append((rf"{word}{n} arrives from the (\w+)", re.IGNORECASE, False))
+        elif kind == 3:
+            patterns.append((rf"\[{word}{n}\] (.*)", 0, False))
+        elif kind == 4:
+            patterns.append((rf"^{word.capitalize()}{n}: (.*)", 0, False))
+        else:
+            patterns.append((rf"\x1b\[1;3{n % 8}m{word}{n}", 0, True))
+    return patterns
+
+
+def make_lines(count: int, patterns: int, rng: random.Random) -> list[str]:
+    lines = []
+    for i in range(count):
+        r = rng.random()
+        if r < 0.05:
+            n = rng.randrange(len(LOK_PATTERNS), patterns)
+            lines.append(rng.choice([f"You hit a {rng.choice(WORDS)}{n} very hard",
+                                     f"Ogre {rng.choice(WORDS)}{n} hits you",
+                                     f"{rng.choice(WORDS).upper()}{n} arrives from the north",
+                                     f"\x1b[1;3{n % 8}m{rng.choice(WORDS)}{n} is here"]))
+        else:
+            lines.append(rng.choice(rng.choice((COMBAT, CHATTER, ROOM))))
+    return lines
+
+
+def callback(match: Match):
+    pass
+
+
+def build_manager(patterns: list[tuple[str, int, bool]]) -> ActionManager:
+    manager = ActionManager()
+    with contextlib.redirect_stdout(io.StringIO()):
+        # ActionManager.add logs every action, which prints when there is no app running
+        for i, (pattern, flags, color) in enumerate(patterns):
+            manager.add(Action(source=None, pattern=pattern, callback=callback, flags=flags, color=color,
+                               name=str(i)))
+    return manager
+
+
+def search_all(manager: ActionManager, message: OutputMessage):
+    for act in manager.actions:
+        s = message.message if act.color else message.stripped
+        match = act.compiled_re.search(s)
+        if match:
+            manager.initiate_callback(act, message, match)
+
+
+def matches(actions, messages) -> list:
+    found = []
+    for message in messages:
+        for act in actions(message):
+            s = message.message if act.color else message.stripped
+            if m := act.compiled_re.search(s):
+                found.append((id(message), act.name, m.span()))
+    return found
+
+
+def timeit(fn, manager, messages) -> float:
+    start = time.perf_counter()
+    for message in messages:
+        fn(message)
+    return (time.perf_counter() - start) / len(messages) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=5000)
+    parser.add_argument("--counts", default="100,500,2000")
+    args = parser.parse_args()
+
+    print(f"{'actions':>8} {'indexed':>8} {'candidates':>11} {'search all':>12} {'prefilter':>12} {'speedup':>8}")
+    for count in [int(c) for c in args.counts.split(",")]:
+        rng = random.Random(count)
+        manager = build_manager(make_patterns(count, rng))
+        messages = [OutputMessage(line) for line in make_lines(args.lines, count, rng)]
+        index = manager.index
+
+        expected = matches(lambda m: manager.actions, messages)
+        actual = matches(lambda m: index.candidates(m), messages)
+        if sorted(expected) != sorted(actual):
+            raise SystemExit(f"prefilter found {len(actual)} matches, searching all found {len(expected)}")
+
+        candidates = sum(len(index.candidates(m)) for m in messages) / len(messages)
+        baseline = timeit(lambda m: search_all(manager, m), manager, messages)
+        indexed = timeit(manager.process_output, manager, messages)
+        print(f"{count:8} {index.indexed:8} {candidates:11.1f} {baseline:10.1f}us {indexed:10.1f}us "
+              f"{baseline / indexed:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
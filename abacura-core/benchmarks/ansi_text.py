@@ -0,0 +1,56 @@
+"""
+Cost of turning MUD output with ANSI codes into rich Text
+
+Compares Text.from_ansi against the AnsiConverter used by the session,
+converting each distinct line for the first time and then again as the
+same lines repeat (prompts, room descriptions, combat spam), and checks
+both produce the same text and spans.
+
+usage: python ansi_text.py [--lines N]
+"""
+import argparse
+import random
+import time
+
+from rich.text import Text
+
+from abacura.utils.ansi import AnsiConverter
+from lok_stream import CHATTER, COMBAT, ROOM
+
+
+def timeit(fn, lines: list[str]) -> float:
+    start = time.perf_counter()
+    for line in lines:
+        fn(line)
+    return (time.perf_counter() - start) / len(lines) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=50000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    distinct = list(dict.fromkeys(COMBAT + CHATTER + ROOM))
+    stream = [rng.choice(distinct) for _ in range(args.lines)]
+
+    converter = AnsiConverter()
+    for line in distinct:
+        expected = Text.from_ansi(line)
+        for actual in (converter.to_text(line), converter.to_text(line)):
+            if actual.plain != expected.plain or actual.spans != expected.spans:
+                raise SystemExit(f"converted text differs for {line!r}")
+
+    uncached = AnsiConverter()
+    first = timeit(lambda line: uncached.to_text(line, cache=False), stream)
+    baseline = timeit(Text.from_ansi, stream)
+    cached = timeit(converter.to_text, stream)
+
+    print(f"{len(distinct)} distinct lines, {args.lines} converted")
+    print(f"{'Text.from_ansi':24} {baseline:8.2f}us")
+    print(f"{'converter, no cache':24} {first:8.2f}us {baseline / first:6.1f}x")
+    print(f"{'converter, cached':24} {cached:8.2f}us {baseline / cached:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Event dispatch cost
+
+Compares the sorted-tuple EventManager against the original PriorityQueue
+based one with 1, 10 and 100 handlers, and an MSDP update dispatched once
+to core.msdp.* listeners against the original two dispatches.
+
+usage: python event_dispatch.py [--dispatches N]
+"""
+import argparse
+import time
+from collections import Counter
+from queue import PriorityQueue
+
+from abacura.mud.options.msdp import MSDPMessage
+from abacura.plugins.events import AbacuraMessage, EventManager, EventTask, event
+
+
+class PriorityQueueEventManager:
+    """The original EventManager"""
+
+    def __init__(self):
+        self.events = {}
+        self.event_counts = Counter()
+
+    def add_listener(self, listener, source=None):
+        trigger = getattr(listener, "event_trigger")
+        task = EventTask(handler=listener, source=source, trigger=trigger, priority=getattr(listener, "event_priority"))
+        self.events.setdefault(trigger, PriorityQueue()).put(task)
+
+    def dispatch(self, message):
+        if message.event_type not in self.events:
+            return
+
+        self.event_counts[message.event_type] += 1
+
+        results = [task.handler(message) for task in self.events[message.event_type].queue]
+        if len(results) == 1:
+            return results[0]
+
+
+def make_handler(trigger: str, priority: int):
+    @event(trigger, priority)
+    def handler(message):
+        pass
+    return handler
+
+
+def timeit(fn, message, dispatches: int) -> float:
+    start = time.perf_counter()
+    for _ in range(dispatches):
+        fn(message)
+    return (time.perf_counter() - start) / dispatches * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dispatches", type=int, default=100000)
+    args = parser.parse_args()
+
+    print(f"{'handlers':>20} {'queue us':>9} {'tuple us':>9} {'speedup':>8}")
+    for count in (1, 10, 100):
+        old, new = PriorityQueueEventManager(), EventManager()
+        for i in range(count):
+            old.add_listener(make_handler("lok.test", i % 10))
+            new.add_listener(make_handler("lok.test", i % 10))
+
+        message = AbacuraMessage("lok.test")
+        dispatches = args.dispatches // count
+        old_us = timeit(old.dispatch, message, dispatches)
+        new_us = timeit(new.dispatch, message, dispatches)
+        print(f"{count:>20} {old_us:>9.2f} {new_us:>9.2f} {old_us / new_us:>7.2f}x")
+
+    # 5 listeners for every msdp variable and one for HEALTH, as in abacura-kallisti
+    old, new = PriorityQueueEventManager(), EventManager()
+    for i in range(5):
+        old.add_listener(make_handler("core.msdp", 1 + i))
+        new.add_listener(make_handler("core.msdp.*", 1 + i))
+    old.add_listener(make_handler("core.msdp.HEALTH", 5))
+    new.add_listener(make_handler("core.msdp.HEALTH", 5))
+
+    def two_dispatches(message):
+        message.event_type = "core.msdp"
+        old.dispatch(message)
+        message.event_type = "core.msdp.HEALTH"
+        old.dispatch(message)
+
+    old_us = timeit(two_dispatches, MSDPMessage(subtype="HEALTH", value="100"), args.dispatches)
+    new_us = timeit(new.dispatch, MSDPMessage("core.msdp.HEALTH", subtype="HEALTH", value="100"), args.dispatches)
+    print(f"{'msdp update':>20} {old_us:>9.2f} {new_us:>9.2f} {old_us / new_us:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
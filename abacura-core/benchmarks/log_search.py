@@ -0,0 +1,93 @@
+"""
+Output log search latency on a large ring, full text index against LIKE
+
+Fills a ring log file with --rows lines of LOK output, each with a few
+generated words so the index is not trivially small, and a rare word on
+one line in ten thousand.  Times the searches #log and the log search
+window run, returning the newest 100 matches, and checks each full text
+search returns the same lines as the equivalent LIKE or regex scan.
+
+usage: python log_search.py [--rows N] [--repeat N]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from abacura.utils import strip_ansi
+from abacura.utils.ring_buffer import INSERT_SQL, RingBufferLogSql
+from lok_stream import CHATTER, COMBAT, ROOM
+
+RARE = "wyvern"
+
+
+def fill(ring: RingBufferLogSql, rows: int, rng: random.Random) -> tuple[float, int]:
+    syllables = ["ka", "lo", "mi", "ra", "to", "ne", "su", "vo", "ze", "th"]
+    vocabulary = ["".join(rng.choice(syllables) for _ in range(3)) for _ in range(5000)]
+    sources = COMBAT + CHATTER + ROOM
+
+    start = time.perf_counter()
+    epoch_ns = time.time_ns() - rows * 1000000
+    batch = []
+    for n in range(rows):
+        words = " ".join(rng.choice(vocabulary) for _ in range(3))
+        rare = f" a {RARE} circles overhead" if n % 10000 == 5000 else ""
+        message = f"{rng.choice(sources)} {words}{rare}"
+        batch.append((n, epoch_ns + n * 1000000, "", message, strip_ansi(message), ""))
+        if len(batch) == 50000:
+            ring.conn.executemany(INSERT_SQL, batch)
+            batch = []
+    ring.conn.executemany(INSERT_SQL, batch)
+    ring.conn.commit()
+    return time.perf_counter() - start, epoch_ns + rows * 1000000
+
+
+def timeit(fn, repeat: int) -> tuple[float, list]:
+    times = []
+    result = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ring = RingBufferLogSql(os.path.join(tmp, "ring.db"), ring_size=args.rows)
+        elapsed, end_ns = fill(ring, args.rows, random.Random(0))
+        print(f"{args.rows} rows logged and indexed in {elapsed:.1f}s")
+
+        recent = end_ns - args.rows * 1000000 // 100
+        cases = [
+            ("rare word", lambda: ring.search(f'"{RARE}"'), lambda: ring.query(f"%{RARE}%")),
+            ("common word", lambda: ring.search('"giant"'), lambda: ring.query("%giant%")),
+            ("phrase", lambda: ring.search('"tells the group"'), lambda: ring.query("%tells the group%")),
+            ("prefix", lambda: ring.search('"Telluri"*'), lambda: ring.query("%telluri%")),
+            ("two words", lambda: ring.search('"heal" "Grunt"'), lambda: ring.query("%Grunt%heal%")),
+            ("regex", lambda: ring.search(pattern=r"(\w+) tells the group, '(.*)'"),
+             lambda: ring.query("%tells the group, '%")),
+            ("rare, last 1%", lambda: ring.search(f'"{RARE}"', epoch_start=recent),
+             lambda: ring.query(f"%{RARE}%", epoch_start=recent)),
+            ("common, last 1%", lambda: ring.search('"giant"', epoch_start=recent),
+             lambda: ring.query("%giant%", epoch_start=recent)),
+        ]
+
+        print(f"{'search':18} {'fts':>10} {'like':>10} {'rows':>6}")
+        for name, fts, like in cases:
+            fts_ms, fts_rows = timeit(fts, args.repeat)
+            like_ms, like_rows = timeit(like, args.repeat)
+            if fts_rows != like_rows:
+                raise SystemExit(f"{name}: full text search found {len(fts_rows)} rows, LIKE found {len(like_rows)}")
+            print(f"{name:18} {fts_ms:8.2f}ms {like_ms:8.2f}ms {len(fts_rows):6}")
+
+
+if __name__ == "__main__":
+    main()
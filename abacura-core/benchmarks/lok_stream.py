@@ -0,0 +1,65 @@
+"""Sample LOK output used by the benchmarks when no capture file is given"""
+import random
+
+from abacura.mud.recording import is_recording, read_recording
+
+IAC_GA = b'\xff\xf9'
+
+COMBAT = [
+    "\x1b[0;37mYour slash \x1b[1;31mMASSACRES\x1b[0;37m a hill giant!",
+    "\x1b[0;37mA hill giant's smash \x1b[1;33mmauls\x1b[0;37m you.",
+    "\x1b[1;36mYou parry a hill giant's attack.\x1b[0;37m",
+    "\x1b[0;32mGrunt's pierce \x1b[1;32mdecimates\x1b[0;32m a hill giant!\x1b[0;37m",
+]
+
+CHATTER = [
+    "\x1b[1;35m[gossip] Kensho: anyone up for a run through telluria?\x1b[0;37m",
+    "\x1b[0;36mGrunt tells the group, 'heal please'\x1b[0;37m",
+    "\x1b[1;33m[market] Varo: selling a glowing longsword, 40k\x1b[0;37m",
+]
+
+ROOM = [
+    "\x1b[1;36mThe Great Hall\x1b[0;37m",
+    "   Torches flicker along the stone walls of this vast hall, casting long",
+    "shadows across the flagstones.  A pair of oak doors lead north.",
+    "\x1b[0;32m[ Exits: n e s w ]\x1b[0;37m",
+    "\x1b[1;33mA hill giant is standing here, looking for trouble.\x1b[0;37m",
+    "\x1b[0;32mA pile of gold coins lies here.\x1b[0;37m",
+]
+
+
+def msdp(var: str, value: str) -> bytes:
+    return b'\xff\xfa\x45\x01' + var.encode() + b'\x02' + value.encode() + b'\xff\xf0'
+
+
+def prompt(hp: int) -> bytes:
+    return f"\x1b[0;37m<{hp}hp 900mp 300sp> ".encode() + IAC_GA
+
+
+def generate_stream(size: int = 8 * 1024 * 1024, seed: int = 1) -> bytes:
+    """Build a stream of roughly size bytes with combat, chatter, rooms, msdp and GA prompts"""
+    rng = random.Random(seed)
+    parts = []
+    total = 0
+
+    while total < size:
+        block = rng.choice((COMBAT, COMBAT, CHATTER, ROOM))
+        lines = "\r\n".join(block) + "\r\n"
+        hp = rng.randint(1, 1200)
+        chunk = lines.encode() + msdp("HEALTH", str(hp)) + msdp("ROOM_VNUM", str(rng.randint(1, 30000))) + prompt(hp)
+        parts.append(chunk)
+        total += len(chunk)
+
+    return b''.join(parts)
+
+
+def load_stream(filename: str = '') -> bytes:
+    """Load inbound bytes from a recording (#record) or raw capture, or generate a sample stream"""
+    if not filename:
+        return generate_stream()
+
+    if is_recording(filename):
+        return b''.join(data for _, data in read_recording(filename))
+
+    with open(filename, "rb") as f:
+        return f.read()
@@ -0,0 +1,98 @@
+"""
+MCCP2/MCCP3 round trip against a local asyncio stand-in server
+
+The server offers both options, compresses its output once the client accepts
+MCCP2, and inflates everything the client sends after MCCP3 starts.
+Reports compression ratios and checks that every line survives the trip.
+
+usage: python mccp.py [raw_capture_file]
+"""
+import argparse
+import asyncio
+import time
+import zlib
+
+from abacura.mud.options.mccp import MCCP2, MCCP3
+from abacura.mud.telnet import TelnetDecoder, TelnetWriter, DO_BYTE, WILL_BYTE
+from lok_stream import load_stream
+
+IAC_WILL_MCCP2 = b'\xff\xfb\x56'
+IAC_WILL_MCCP3 = b'\xff\xfb\x57'
+IAC_DO_MCCP2 = b'\xff\xfd\x56'
+START_MCCP2 = b'\xff\xfa\x56\xff\xf0'
+START_MCCP3 = b'\xff\xfa\x57\xff\xf0'
+COMMANDS = [f"kill giant {i}\n".encode() for i in range(1000)]
+
+
+async def serve(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, stream: bytes, received: list):
+    writer.write(IAC_WILL_MCCP2 + IAC_WILL_MCCP3)
+    handshake = await reader.readuntil(START_MCCP3)
+    assert IAC_DO_MCCP2 in handshake
+
+    writer.write(START_MCCP2)
+    compressor = zlib.compressobj()
+    for i in range(0, len(stream), 8192):
+        writer.write(compressor.compress(stream[i:i + 8192]) + compressor.flush(zlib.Z_SYNC_FLUSH))
+    writer.write(compressor.flush() + b'end of stream\n')
+    await writer.drain()
+
+    decompressor = zlib.decompressobj()
+    inbound = b''
+    while len(inbound) < sum(len(c) for c in COMMANDS):
+        inbound += decompressor.decompress(await reader.read(65536))
+    received.append(inbound)
+    writer.close()
+
+
+async def main(stream: bytes):
+    received = []
+    server = await asyncio.start_server(lambda r, w: serve(r, w, stream, received), "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+
+    reader, raw_writer = await asyncio.open_connection("127.0.0.1", port)
+    writer = TelnetWriter(raw_writer)
+    lines = []
+    decoder = TelnetDecoder(on_line=lambda b: lines.append(bytes(b)), on_prompt=lambda b: None,
+                            on_negotiation=lambda c, o: None, on_subnegotiation=lambda o, p: None)
+    options = {86: MCCP2(decoder, writer), 87: MCCP3(writer)}
+
+    def on_negotiation(command, code):
+        if command == WILL_BYTE and code in options:
+            options[code].will()
+        elif command == DO_BYTE and code in options:
+            options[code].do()
+
+    decoder.on_negotiation = on_negotiation
+    decoder.on_subnegotiation = lambda code, payload: options[code].sb(payload) if code in options else None
+
+    start = time.perf_counter()
+    sent = False
+    while data := await reader.read(65536):
+        decoder.feed(data)
+        if writer.compressing and not sent:
+            for cmd in COMMANDS:
+                writer.write(cmd)
+            sent = True
+    elapsed = time.perf_counter() - start
+
+    server.close()
+    await server.wait_closed()
+
+    expected = stream.count(b'\n') + 1
+    assert len(lines) == expected, f"expected {expected} lines, decoded {len(lines)}"
+    assert lines[-1] == b'end of stream'
+    assert received[0] == b''.join(COMMANDS)
+
+    ratio = decoder.inflated_bytes / max(1, decoder.compressed_bytes)
+    print(f"MCCP2: {decoder.compressed_bytes:,} bytes on the wire, {decoder.inflated_bytes:,} inflated, "
+          f"ratio {ratio:.2f}, saved {decoder.inflated_bytes - decoder.compressed_bytes:,} bytes")
+    print(f"MCCP2: {len(lines):,} lines in {elapsed:.3f}s ({len(lines) / elapsed:,.0f} lines/s)")
+    ratio = writer.bytes_written / max(1, writer.bytes_sent)
+    print(f"MCCP3: {writer.bytes_written:,} bytes written, {writer.bytes_sent:,} sent, ratio {ratio:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("capture", nargs="?", default="")
+    args = parser.parse_args()
+    asyncio.run(main(load_stream(args.capture)))
@@ -0,0 +1,109 @@
+"""
+MSDP value parsing
+
+Compares decode_msdp against the original split-based GROUP and ROOM_EXITS
+parsers on group payloads of increasing size.  A lone ROOM_EXITS table is
+slower than the legacy split (about 0.6-0.8x): on a 48 byte payload the fixed
+cost of checking that names and values strictly alternate outweighs the split.
+
+usage: python msdp_parser.py [--iterations N]
+"""
+import argparse
+import random
+import re
+import time
+
+from abacura.mud.options.msdp import decode_msdp
+
+ansi_escape = re.compile(r'\x1b(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+
+CLASSES = ["Warrior", "Cleric", "Mage", "Rogue", "Ranger", "Paladin"]
+POSITIONS = ["Standing", "Fighting", "Resting", "Sleeping"]
+
+
+def legacy_parse_group(buf) -> list:
+    """The original parse_group, without its debug logging"""
+
+    def parse_group_member(line) -> dict:
+        items = line.split(b'\x01')
+        member = {}
+        items = items[1:]
+        for item in items:
+            pair = item.split(b'\x02')
+            member[pair[0].decode("UTF-8")] = ansi_escape.sub('', pair[1].decode("UTF-8"))
+        return member
+
+    if buf == b'':
+        return []
+
+    buf = buf[3:-2]
+    elements = buf.split(b'\x04\x02\x03')
+    return [parse_group_member(element) for element in elements]
+
+
+def legacy_parse_exits(buf) -> dict:
+    """The original parse_exits"""
+    if buf == b'':
+        return {}
+
+    buf = buf[2:-1]
+    items = buf.split(b'\x01')
+
+    exits = {}
+    for item in items:
+        pair = item.split(b'\x02')
+        exits[pair[0].decode("UTF-8")] = ansi_escape.sub('', pair[1].decode("UTF-8"))
+    return exits
+
+
+def table(values: dict) -> bytes:
+    return b'\x03' + b''.join(b'\x01' + k.encode() + b'\x02' + str(v).encode() for k, v in values.items()) + b'\x04'
+
+
+def group_value(size: int, rng: random.Random) -> bytes:
+    members = []
+    for i in range(size):
+        members.append(table({"name": f"\x1b[1;37mMember{i}\x1b[0m", "class": rng.choice(CLASSES),
+                              "level": rng.randint(1, 50), "position": rng.choice(POSITIONS), "flags": "",
+                              "health": rng.randint(0, 100), "mana": rng.randint(0, 100),
+                              "stamina": rng.randint(0, 100), "is_leader": int(i == 0), "is_subleader": 0,
+                              "with_leader": 1, "with_you": 1}))
+    return b'\x05' + b''.join(b'\x02' + m for m in members) + b'\x06'
+
+
+def exits_value(rng: random.Random) -> bytes:
+    return table({d: rng.randint(1, 30000) for d in "neswud"})
+
+
+def timeit(fn, arg, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(arg)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    rng = random.Random(1)
+
+    print(f"{'payload':>14} {'bytes':>7} {'legacy us':>10} {'decode us':>10} {'speedup':>8} {'no strip us':>12}")
+    cases = [("ROOM_EXITS", exits_value(rng), legacy_parse_exits)]
+    cases += [(f"GROUP x{size}", group_value(size, rng), legacy_parse_group) for size in (1, 6, 12, 50, 200)]
+
+    for name, value, legacy in cases:
+        var = name.split()[0]
+        payload = b'\x01' + var.encode() + b'\x02' + value + b'\xff'
+        decoded = decode_msdp(payload, strip_ansi=True)[var]
+        assert decoded == legacy(value), f"{name} decodes differently"
+
+        iterations = max(10, args.iterations // max(1, len(value) // 1000))
+        old = timeit(legacy, value, iterations)
+        new = timeit(lambda p: decode_msdp(p, strip_ansi=True), payload, iterations)
+        raw = timeit(decode_msdp, payload, iterations)
+        print(f"{name:>14} {len(value):>7} {old:>10.1f} {new:>10.1f} {old / new:>7.2f}x {raw:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
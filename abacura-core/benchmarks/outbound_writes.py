@@ -0,0 +1,56 @@
+"""
+Socket writes issued for a burst of commands
+
+Sends a 40 step speedwalk through the TelnetWriter and counts socket writes
+and packets received by a local server, compared to writing each command
+directly to the StreamWriter.
+
+usage: python outbound_writes.py [--steps N]
+"""
+import argparse
+import asyncio
+
+from abacura.mud.telnet import TelnetWriter
+
+
+async def run(steps: int, coalesce: bool) -> tuple[int, int]:
+    reads = []
+    done = asyncio.Event()
+    expected = steps * 2
+
+    async def serve(reader: asyncio.StreamReader, _writer: asyncio.StreamWriter):
+        received = 0
+        while received < expected:
+            data = await reader.read(65536)
+            reads.append(len(data))
+            received += len(data)
+        done.set()
+
+    server = await asyncio.start_server(serve, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    _reader, raw_writer = await asyncio.open_connection("127.0.0.1", port)
+    writer = TelnetWriter(raw_writer) if coalesce else raw_writer
+
+    for _ in range(steps):
+        writer.write(b"n\n")
+
+    await done.wait()
+    socket_writes = writer.socket_writes if coalesce else steps
+    writer.close()
+    server.close()
+    await server.wait_closed()
+    return socket_writes, len(reads)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--steps", type=int, default=40)
+    args = parser.parse_args()
+
+    for name, coalesce in (("direct", False), ("TelnetWriter", True)):
+        socket_writes, reads = await run(args.steps, coalesce)
+        print(f"{name:>12}: {args.steps} commands, {socket_writes} socket writes, {reads} server reads")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+"""
+Memory and CPU cost of OutputMessage per line
+
+Compares the original OutputMessage, a plain class that stripped ANSI codes
+from every line as it was created, against the slotted version that strips
+on first use.  Memory is measured with tracemalloc over a buffer of messages
+the size of the session output history, excluding the line strings
+themselves, which both versions share.
+
+usage: python output_message.py [--lines N] [--buffer N]
+"""
+import argparse
+import random
+import re
+import time
+import tracemalloc
+
+from abacura.mud import OutputMessage
+from lok_stream import CHATTER, COMBAT, ROOM
+
+ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+
+
+class OriginalOutputMessage:
+
+    def __init__(self, message: str, gag: bool = False):
+        self.message: str = message
+        if type(message) is str:
+            self.stripped = ansi_escape.sub('', message)
+        else:
+            self.stripped = message
+        self.gag: bool = gag
+
+
+def make_lines(count: int, rng: random.Random) -> list[str]:
+    # distinct strings, as they would arrive from the server
+    return [rng.choice(rng.choice((COMBAT, CHATTER, ROOM))) + f" {i}" for i in range(count)]
+
+
+def bytes_per_line(cls, lines: list[str], use) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    buffer = [cls(line) for line in lines]
+    for message in buffer:
+        use(message)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / len(buffer)
+
+
+def us_per_line(cls, lines: list[str], use) -> float:
+    start = time.perf_counter()
+    for line in lines:
+        use(cls(line))
+    return (time.perf_counter() - start) / len(lines) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=200000)
+    parser.add_argument("--buffer", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    lines = make_lines(args.lines, rng)
+    buffered = lines[:args.buffer]
+
+    # the original had no Text, each consumer converted the line itself
+    cases = [
+        ("created", lambda m: None, lambda m: None),
+        ("stripped read", lambda m: m.stripped, lambda m: m.stripped),
+        ("stripped and text read", None, lambda m: (m.stripped, m.text)),
+    ]
+
+    print(f"{'':24} {'cpu per line':>23} {'memory per line':>23}")
+    print(f"{'':24} {'original':>11} {'slotted':>11} {'original':>11} {'slotted':>11}")
+    for name, use_original, use_slotted in cases:
+        cpu = [us_per_line(OriginalOutputMessage, lines, use_original) if use_original else None,
+               us_per_line(OutputMessage, lines, use_slotted)]
+        memory = [bytes_per_line(OriginalOutputMessage, buffered, use_original) if use_original else None,
+                  bytes_per_line(OutputMessage, buffered, use_slotted)]
+        columns = [f"{'-':>11}" if us is None else f"{us:9.2f}us" for us in cpu]
+        columns += [f"{'-':>11}" if size is None else f"{size:10.0f}B" for size in memory]
+        print(f"{name:24} {' '.join(columns)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Prompt-to-screen latency for muds that don't send GA
+
+A local server replays room text followed by a bare prompt (no newline, no GA)
+at a fixed interval.  Latency is measured from the server writing the prompt
+to the client flushing it as a partial line, comparing the original
+poll/backoff reader with the drain-based flush.
+
+usage: python prompt_latency.py [--prompts N] [--interval SECONDS] [--quiet-time SECONDS]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from abacura.mud.telnet import TelnetDecoder
+
+ROOM = b"\x1b[1;36mThe Great Hall\x1b[0;37m\r\nTorches flicker along the walls.\r\n"
+PROMPT = b"<1200hp 900mp 300sp> "
+
+
+async def replay(writer: asyncio.StreamWriter, prompts: int, interval: float, sent: list):
+    for _ in range(prompts):
+        writer.write(ROOM)
+        await writer.drain()
+        await asyncio.sleep(0.001)
+        sent.append(time.perf_counter())
+        writer.write(PROMPT)
+        await writer.drain()
+        await asyncio.sleep(interval)
+    writer.close()
+
+
+def new_decoder() -> TelnetDecoder:
+    return TelnetDecoder(on_line=lambda b: None, on_prompt=lambda b: None,
+                         on_negotiation=lambda c, o: None, on_subnegotiation=lambda o, p: None)
+
+
+def flush(decoder: TelnetDecoder, flushed: list):
+    if decoder.flush() is not None:
+        flushed.append(time.perf_counter())
+
+
+async def poll_backoff(reader: asyncio.StreamReader, flushed: list):
+    """The original reader: one byte per read, doubling the timeout up to 50ms"""
+    decoder = new_decoder()
+    poll_timeout = 0.001
+    while True:
+        try:
+            data = await asyncio.wait_for(reader.read(1), timeout=poll_timeout)
+        except asyncio.TimeoutError:
+            if decoder.pending:
+                flush(decoder, flushed)
+                poll_timeout = 0.001
+            elif poll_timeout < 0.05:
+                poll_timeout *= 2
+            continue
+        if data == b'':
+            return
+        decoder.feed(data)
+
+
+async def drain_flush(reader: asyncio.StreamReader, flushed: list, quiet_time: float, read_size: int = 65536):
+    """The chunked reader: flush when the read buffer drains, optionally after a quiet time"""
+    decoder = new_decoder()
+    while True:
+        try:
+            if quiet_time <= 0 or not decoder.pending:
+                data = await reader.read(read_size)
+            else:
+                data = await asyncio.wait_for(reader.read(read_size), timeout=quiet_time)
+        except asyncio.TimeoutError:
+            flush(decoder, flushed)
+            continue
+        if data == b'':
+            return
+        decoder.feed(data)
+        if len(data) < read_size and quiet_time <= 0:
+            flush(decoder, flushed)
+
+
+async def measure(name: str, client, prompts: int, interval: float):
+    sent, flushed = [], []
+    server = await asyncio.start_server(lambda r, w: replay(w, prompts, interval, sent), "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    await client(reader, flushed)
+    server.close()
+    await server.wait_closed()
+
+    latencies = [(f - s) * 1000 for s, f in zip(sent, flushed)]
+    p99 = sorted(latencies)[int(len(latencies) * 0.99) - 1]
+    print(f"{name:>22}: mean {statistics.mean(latencies):7.3f}ms  p99 {p99:7.3f}ms  max {max(latencies):7.3f}ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--prompts", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=0.02)
+    # the telnet plugin's quiet_time option, 0 by default
+    parser.add_argument("--quiet-time", type=float, default=0)
+    args = parser.parse_args()
+
+    name = f"quiet time {args.quiet_time * 1000:g}ms" if args.quiet_time > 0 else "drain flush (after)"
+    await measure("poll/backoff (before)", poll_backoff, args.prompts, args.interval)
+    await measure(name, lambda r, f: drain_flush(r, f, args.quiet_time), args.prompts, args.interval)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
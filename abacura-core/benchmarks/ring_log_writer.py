@@ -0,0 +1,64 @@
+"""
+Time spent logging output lines to the ring log on the caller's thread
+
+Logs LOK output to a ring log file in WAL mode, inline as before and with
+the background writer, in read-burst sized groups arriving every --interval
+ms like the session does.  Reports the mean and worst cost of logging one burst, where the inline
+writer pays for its commits and any WAL checkpoint, and the time a query
+waits for the background writer to catch up.
+
+usage: python ring_log_writer.py [--lines N] [--burst N] [--interval MS] [--ring-size N]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from abacura.mud import OutputMessage
+from abacura.utils.ring_buffer import RingBufferLogSql
+from lok_stream import CHATTER, COMBAT, ROOM
+
+
+def run(ring: RingBufferLogSql, lines: list[str], burst: int, interval: float) -> tuple[float, float, float]:
+    costs = []
+    for i in range(0, len(lines), burst):
+        messages = [OutputMessage(line) for line in lines[i:i + burst]]
+        start = time.perf_counter()
+        for message in messages:
+            ring.log(message)
+        costs.append(time.perf_counter() - start)
+        time.sleep(interval)
+
+    start = time.perf_counter()
+    ring.query("%hill giant%", limit=10)
+    query = time.perf_counter() - start
+    return sum(costs) / len(costs) * 1000, max(costs) * 1000, query * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=100000)
+    parser.add_argument("--burst", type=int, default=60)
+    parser.add_argument("--interval", type=float, default=5)
+    parser.add_argument("--ring-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    lines = [rng.choice(rng.choice((COMBAT, CHATTER, ROOM))) for _ in range(args.lines)]
+
+    print(f"{args.lines} lines in bursts of {args.burst} every {args.interval}ms")
+    print(f"{'writer':12} {'mean burst':>11} {'worst burst':>12} {'query':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, background in [("inline", False), ("background", True)]:
+            ring = RingBufferLogSql(os.path.join(tmp, f"{name}.db"), args.ring_size, background=background)
+            mean, worst, query = run(ring, lines, args.burst, args.interval / 1000)
+            print(f"{name:12} {mean:9.2f}ms {worst:10.2f}ms {query:8.2f}ms")
+            if background:
+                print(f"{'':12} {ring.batches_written} batches, {ring.mean_write_ms:.2f}ms mean, "
+                      f"{ring.worst_write_ns / 1e6:.2f}ms worst, max queue depth {ring.max_queue_depth}")
+            ring.close()
+
+
+if __name__ == "__main__":
+    main()
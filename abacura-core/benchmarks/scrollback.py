@@ -0,0 +1,91 @@
+"""
+Memory held by the session output log as a session grows
+
+Writes LOK output in read-burst sized batches to a RichLog keeping the old
+10000 line scrollback and to the ScrollbackLog window the session now uses,
+logging every line to a ring log as the session does.  Reports the memory
+retained by each widget, and the time to page older lines back in.
+
+usage: python scrollback.py [--lines N] [--window N] [--page N]
+"""
+import argparse
+import asyncio
+import random
+import time
+import tracemalloc
+
+from rich.text import Text
+from textual.app import App
+from textual.widgets import RichLog
+
+from abacura.mud import OutputMessage
+from abacura.utils.ansi import ansi_text
+from abacura.utils.ring_buffer import RingBufferLogSql
+from abacura.widgets.scrollback import ScrollbackLog
+from lok_stream import CHATTER, COMBAT, ROOM
+
+BATCH = 60
+
+
+class LogApp(App):
+    def __init__(self, widget: RichLog):
+        super().__init__()
+        self.widget = widget
+
+    def compose(self):
+        yield self.widget
+
+
+async def fill(widget: RichLog, ring: RingBufferLogSql, lines: list[str], results: dict):
+    app = LogApp(widget)
+    async with app.run_test(size=(120, 40)) as pilot:
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        for i in range(0, len(lines), BATCH):
+            messages = [OutputMessage(line) for line in lines[i:i + BATCH]]
+            keys = [ring.log(message) for message in messages]
+            text = Text("\n").join(ansi_text(message.message) for message in messages)
+            if isinstance(widget, ScrollbackLog):
+                widget.write(text, scroll_end=True, keys=(keys[0], keys[-1]))
+            else:
+                widget.write(text, scroll_end=True)
+        await pilot.pause()
+        results["memory"] = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        results["lines"] = len(widget.lines)
+
+        if isinstance(widget, ScrollbackLog):
+            start = time.perf_counter()
+            for _ in range(5):
+                widget.scroll_home(animate=False)
+                widget.page_older()
+            results["page"] = (time.perf_counter() - start) / 5 * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=50000)
+    parser.add_argument("--window", type=int, default=2000)
+    parser.add_argument("--page", type=int, default=500)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    lines = [rng.choice(rng.choice((COMBAT, CHATTER, ROOM))) for _ in range(args.lines)]
+
+    widgets = [("RichLog, 10000 lines", RichLog(max_lines=10000, wrap=True, auto_scroll=False)),
+               (f"ScrollbackLog, {args.window}", None)]
+
+    print(f"{args.lines} lines written")
+    for name, widget in widgets:
+        ring = RingBufferLogSql(":memory:", ring_size=args.lines)
+        if widget is None:
+            widget = ScrollbackLog(ring_buffer=ring, window_lines=args.window, page_size=args.page,
+                                   wrap=True, auto_scroll=False)
+        results = {}
+        asyncio.run(fill(widget, ring, lines, results))
+        page = f"{results['page']:8.1f}ms per page" if "page" in results else ""
+        print(f"{name:24} {results['lines']:7} lines {results['memory'] / 1e6:8.1f}MB {page}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Telnet decoder throughput
+
+Compares the chunked TelnetDecoder against a byte-at-a-time reader
+equivalent to the original TelnetPlugin loop.
+
+usage: python telnet_decoder.py [raw_capture_file] [--chunk-size N]
+"""
+import argparse
+import time
+
+from abacura.mud.telnet import TelnetDecoder
+from lok_stream import load_stream
+
+
+def byte_at_a_time(stream: bytes) -> int:
+    """Reference implementation of the original per-byte loop"""
+    lines = 0
+    outb = b''
+    pos = 0
+    size = len(stream)
+
+    def read1():
+        nonlocal pos
+        c = stream[pos:pos + 1]
+        pos += 1
+        return c
+
+    while pos < size:
+        data = read1()
+        if data == b'\n':
+            outb.decode("UTF-8", errors="ignore")
+            outb = b''
+            lines += 1
+        elif data == b'\xff':
+            data = read1()
+            if data in (b'\xfb', b'\xfc', b'\xfd', b'\xfe'):
+                read1()
+            elif data == b'\xfa':
+                c = read1()
+                buf = b''
+                while c != b'\xf0':
+                    buf = buf + c
+                    c = read1()
+            elif data == b'\xf9':
+                outb.decode("UTF-8", errors="ignore")
+                outb = b''
+                lines += 1
+        else:
+            outb = outb + data
+
+    return lines
+
+
+def chunked(stream: bytes, chunk_size: int) -> int:
+    counter = [0]
+
+    def on_line(buf):
+        buf.decode("UTF-8", errors="ignore")
+        counter[0] += 1
+
+    decoder = TelnetDecoder(on_line=on_line, on_prompt=on_line,
+                            on_negotiation=lambda c, o: None, on_subnegotiation=lambda o, p: None)
+
+    for i in range(0, len(stream), chunk_size):
+        decoder.feed(stream[i:i + chunk_size])
+
+    return counter[0]
+
+
+def report(name: str, size: int, lines: int, elapsed: float):
+    print(f"{name:>20}: {size / elapsed / 1e6:8.2f} MB/s {lines / elapsed:12,.0f} lines/s ({elapsed:.3f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("capture", nargs="?", default="")
+    parser.add_argument("--chunk-size", type=int, default=65536)
+    args = parser.parse_args()
+
+    stream = load_stream(args.capture)
+    print(f"{len(stream):,} bytes")
+
+    start = time.perf_counter()
+    lines = byte_at_a_time(stream)
+    report("byte-at-a-time", len(stream), lines, time.perf_counter() - start)
+
+    for chunk_size in sorted({4096, 16384, args.chunk_size}):
+        start = time.perf_counter()
+        lines = chunked(stream, chunk_size)
+        report(f"chunked {chunk_size}", len(stream), lines, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+from abacura.mud.options.msdp import MSDPBatchMessage, MSDPMessage
+from abacura.plugins.events import EventManager, event
+
+
+class Listener:
+    def __init__(self):
+        self.received = []
+
+    @event("core.msdp")
+    def legacy(self, message):
+        self.received.append(("core.msdp", message.event_type))
+
+    @event("core.msdp.*")
+    def every(self, message):
+        self.received.append(("core.msdp.*", message.event_type))
+
+
+def test_deprecated_core_msdp_listeners_receive_every_variable_but_not_batches():
+    manager = EventManager()
+    listener = Listener()
+    manager.register_object(listener)
+
+    manager.dispatch(MSDPMessage(subtype="HEALTH", value="100"))
+    manager.dispatch(MSDPBatchMessage())
+
+    assert sorted(listener.received) == [("core.msdp", "core.msdp.HEALTH"), ("core.msdp.*", "core.msdp.HEALTH")]
@@ -0,0 +1,14 @@
+import pytest
+
+from abacura.mud.options.msdp import decode_msdp
+
+
+@pytest.mark.parametrize("payload, expected", [
+    (b"\x01EXITS\x02\x03\x01n\x021\x01e\x022\x04", {"EXITS": {"n": "1", "e": "2"}}),
+    (b"\x01T\x02\x03\x01a\x021\x022\x01b\x04", {"T": {"a": ["1", "2"], "b": ""}}),
+    (b"\x01T\x02\x03\x01a\x01b\x021\x04", {"T": {"a": "", "b": "1"}}),
+    (b"\x01T\x02\x03\x01a\x02\x05\x02x\x02y\x06\x01b\x022\x04", {"T": {"a": ["x", "y"], "b": "2"}}),
+    (b"\x01T\x02\x03\x04", {"T": {}}),
+])
+def test_tables_decode_the_same_with_or_without_the_fast_path(payload, expected):
+    assert decode_msdp(payload + b"\xff") == expected
@@ -0,0 +1,38 @@
+import re
+from typing import NamedTuple
+
+import pytest
+
+from abacura.plugins.actions.prefilter import PlainLine, PrefilterIndex
+
+
+class Trigger(NamedTuple):
+    compiled_re: re.Pattern
+    color: bool = False
+
+
+def search_all(triggers: list[Trigger], line: str) -> list[Trigger]:
+    return [t for t in triggers if t.compiled_re.search(line)]
+
+
+def search_candidates(triggers: list[Trigger], line: str) -> list[Trigger]:
+    index = PrefilterIndex(triggers)
+    return [t for t in index.candidates(PlainLine(line)) if t.compiled_re.search(line)]
+
+
+@pytest.mark.parametrize("line", [
+    "You find it",
+    "You FIND it",
+    "You fınd it",  # dotless i
+    "You FİND it",  # capital i with dot above
+    "The ſword is here",  # long s
+    "A Key is here",  # Kelvin sign
+    "nothing to see",
+])
+def test_ignore_case_words_match_like_the_regex_engine(line):
+    triggers = [Trigger(re.compile(r"\bfind\b", re.IGNORECASE)),
+                Trigger(re.compile(r"\bsword\b", re.IGNORECASE)),
+                Trigger(re.compile(r"\bkey\b", re.IGNORECASE)),
+                Trigger(re.compile(r"\bfind\b"))]
+
+    assert search_candidates(triggers, line) == search_all(triggers, line)
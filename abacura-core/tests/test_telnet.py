@@ -0,0 +1,63 @@
+import asyncio
+import zlib
+
+from abacura.mud.telnet import TelnetDecoder, TelnetWriter
+
+
+def test_compression_starting_mid_chunk_inflates_the_rest_of_the_chunk():
+    lines = []
+    decoder = TelnetDecoder(on_line=lambda line: lines.append(bytes(line)), on_prompt=lambda line: None,
+                            on_negotiation=lambda command, option: None,
+                            on_subnegotiation=lambda option, payload: decoder.start_decompression())
+
+    compressor = zlib.compressobj()
+    compressed = compressor.compress(b"first\nsecond\n") + compressor.flush(zlib.Z_SYNC_FLUSH)
+    decoder.feed(b"plain\n\xff\xfa\x56\xff\xf0" + compressed[:5])
+    decoder.feed(compressed[5:])
+
+    assert lines == [b"plain", b"first", b"second"]
+    assert decoder.compressed_bytes == len(compressed)
+
+
+class StalledWriter:
+    """A StreamWriter whose peer stopped reading"""
+
+    def __init__(self):
+        self.written = bytearray()
+        self.drained = asyncio.Event()
+
+    def write(self, data: bytes):
+        self.written += data
+
+    def is_closing(self) -> bool:
+        return False
+
+    async def drain(self):
+        await self.drained.wait()
+
+
+def test_writes_beyond_max_queue_are_dropped():
+    async def run():
+        writer = TelnetWriter(StalledWriter(), max_queue=10)
+        assert writer.write(b"12345678")
+        assert not writer.write(b"abc")
+        assert writer.write(b"90")
+        return writer
+
+    writer = asyncio.run(run())
+    assert (writer.writes_dropped, writer.bytes_dropped) == (1, 3)
+    assert writer.writer.written == b"1234567890"
+
+
+def test_drain_waits_for_the_transport():
+    async def run():
+        stalled = StalledWriter()
+        writer = TelnetWriter(stalled)
+        writer.write(b"look\n")
+        drain = asyncio.create_task(writer.drain())
+        await asyncio.sleep(0)
+        assert stalled.written == b"look\n" and not drain.done()
+        stalled.drained.set()
+        await asyncio.wait_for(drain, 1)
+
+    asyncio.run(run())
@@ -1,18 +1,15 @@
-import re
 import sqlite3
 from dataclasses import fields
 from datetime import datetime
 from pathlib import Path
 from typing import List, Dict
 
+from abacura.utils import strip_ansi
+
 from .room import ScannedRoom, Exit, Room
 from .wilderness import WildernessGrid
 
 
-# TODO: Use the abacura methods for strip_ansi_codes
-ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-
-
 class World:
     def __init__(self, db_filename: str):
         db_path = Path(db_filename).expanduser()
@@ -41,8 +38,7 @@ class World:
         :param s: The original string with color codes
         :return: A string with the color codes stripped
         """
-        # ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-        return ansi_escape.sub('', s)
+        return strip_ansi(s)
 
     def del_exit(self, vnum: str, direction: str):
         if vnum not in self.rooms:
@@ -0,0 +1 @@
+"""Stand-in Legends of Kallisti server for load, soak and latency testing"""
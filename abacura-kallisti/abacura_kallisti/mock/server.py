@@ -0,0 +1,238 @@
+"""
+Mock LOK server
+
+Speaks enough telnet for abacura: TTYPE, MSDP (with REPORTABLE_VARIABLES,
+ROOM_EXITS, GROUP and AFFECTS tables), optional MCCP2/MCCP3 and GA prompts,
+then streams synthetic traffic at a configurable rate with optional bursts.
+
+usage: lok-mock-server --port 4000 --lines 200 --msdp 10 --burst 500 --burst-interval 30
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+
+import click
+
+from abacura.mud.telnet import TelnetDecoder, TelnetWriter, DO_BYTE, WILL_BYTE
+from abacura_kallisti.mock.traffic import TrafficGenerator, msdp_sb
+
+IAC_GA = b'\xff\xf9'
+TTYPE = 24
+MSDP = 69
+MCCP2 = 86
+MCCP3 = 87
+
+TTYPE_SEND = b'\xff\xfa\x18\x01\xff\xf0'
+
+
+@dataclass
+class ServerOptions:
+    lines_per_second: float = 100
+    msdp_per_second: float = 10
+    burst: int = 0
+    burst_interval: float = 30
+    ga: bool = True
+    mccp: bool = False
+    wilderness: bool = False
+    mix: dict[str, float] = field(default_factory=lambda: {"combat": 5, "chatter": 2, "room": 1})
+    stats_interval: float = 10
+
+
+class MockConnection:
+    """One connected client"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, options: ServerOptions,
+                 seed: int):
+        self.reader = reader
+        self.writer = TelnetWriter(writer)
+        self.options = options
+        self.traffic = TrafficGenerator(seed=seed, wilderness=options.wilderness)
+        self.reporting = False
+        self.ttype_requests = 0
+        self.lines_sent = 0
+        self.msdp_values_sent = 0
+        self.connected_at = time.monotonic()
+        self.decoder = TelnetDecoder(on_line=self.on_command, on_prompt=lambda _: None,
+                                     on_negotiation=self.on_negotiation, on_subnegotiation=self.on_subnegotiation)
+
+    def send(self, data: bytes):
+        self.writer.write(data)
+
+    def send_lines(self, lines: list[str], prompt: bool = True):
+        buf = "".join(line + "\r\n" for line in lines).encode()
+        if prompt:
+            buf += self.traffic.prompt().encode() + (IAC_GA if self.options.ga else b'')
+        self.send(buf)
+        self.lines_sent += len(lines)
+
+    def add_block(self, lines: list[str], block: list[str]):
+        """Append generated output, a move sends the lines before it and the new room's MSDP values first"""
+        room = self.traffic.take_pending_msdp()
+        if room:
+            if lines:
+                self.send_lines(lines, prompt=False)
+                lines.clear()
+            self.send_msdp(room)
+        lines += block
+
+    def send_msdp(self, values: dict):
+        if self.reporting:
+            self.send(b''.join(msdp_sb(name, value) for name, value in values.items()))
+            self.msdp_values_sent += len(values)
+
+    def on_negotiation(self, command: int, option: int):
+        if command == DO_BYTE and option == MSDP:
+            return
+        if command == WILL_BYTE and option == TTYPE:
+            self.send(TTYPE_SEND)
+        elif command == DO_BYTE and option == MCCP2 and self.options.mccp:
+            self.send(b'\xff\xfa\x56\xff\xf0')
+            self.writer.start_compression()
+
+    def on_subnegotiation(self, option: int, payload: bytearray):
+        if option == TTYPE and self.ttype_requests < 2:
+            self.ttype_requests += 1
+            self.send(TTYPE_SEND)
+        elif option == MCCP3:
+            self.decoder.start_decompression()
+        elif option == MSDP and payload.startswith(b'\x01LIST'):
+            self.send(msdp_sb("REPORTABLE_VARIABLES", self.traffic.reportable_variables()))
+        elif option == MSDP and payload.startswith(b'\x01REPORT'):
+            self.reporting = True
+            self.send_msdp({k: v for k, v in self.traffic.values.items() if k != "REPORTABLE_VARIABLES"})
+
+    def on_command(self, buf: bytearray):
+        cmd = buf.decode(errors="ignore").strip().lower()
+        if cmd in ("n", "s", "e", "w", "u", "d"):
+            lines = self.traffic.move(cmd)
+            self.send_msdp(self.traffic.take_pending_msdp())
+        elif cmd in ("l", "look"):
+            lines = self.traffic.room_lines()
+        elif cmd == "":
+            lines = []
+        else:
+            lines = [f"Huh?!? ({cmd})"]
+        self.send_lines(lines)
+
+    async def read_commands(self):
+        while data := await self.reader.read(65536):
+            self.decoder.feed(data)
+
+    async def negotiate(self):
+        offers = b'\xff\xfb\x45\xff\xfd\x18'
+        if self.options.mccp:
+            offers += b'\xff\xfb\x56\xff\xfb\x57'
+        self.send(offers)
+        self.send_lines(["Welcome to the mock Legends of Kallisti server."] + self.traffic.room_lines())
+
+    async def stream(self):
+        """Send generated traffic at the configured rates"""
+        options = self.options
+        tick = 0.01
+        line_credit = msdp_credit = 0.0
+        next_burst = time.monotonic() + options.burst_interval
+
+        while not self.writer.is_closing():
+            await asyncio.sleep(tick)
+            line_credit += options.lines_per_second * tick
+            msdp_credit += options.msdp_per_second * tick
+
+            lines = []
+            while line_credit >= 1:
+                block = self.traffic.lines(options.mix)
+                self.add_block(lines, block)
+                line_credit -= len(block)
+
+            if options.burst and time.monotonic() >= next_burst:
+                burst_lines = 0
+                while burst_lines < options.burst:
+                    block = self.traffic.lines(options.mix)
+                    self.add_block(lines, block)
+                    burst_lines += len(block)
+                next_burst += options.burst_interval
+
+            while msdp_credit >= 1:
+                self.send_msdp(self.traffic.msdp_update())
+                msdp_credit -= 1
+
+            if lines:
+                self.send_lines(lines)
+
+            # don't generate traffic faster than the client reads it
+            await self.writer.drain()
+
+
+class MockServer:
+    def __init__(self, options: ServerOptions):
+        self.options = options
+        self.connections: list[MockConnection] = []
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        peer = writer.get_extra_info("peername")
+        print(f"connection from {peer}")
+        connection = MockConnection(reader, writer, self.options, seed=len(self.connections))
+        self.connections.append(connection)
+
+        await connection.negotiate()
+        streamer = asyncio.create_task(connection.stream())
+        try:
+            await connection.read_commands()
+        except ConnectionError:
+            pass
+        finally:
+            streamer.cancel()
+            writer.close()
+            self.connections.remove(connection)
+            print(f"{peer} disconnected after {connection.lines_sent} lines, {connection.msdp_values_sent} msdp values")
+
+    async def report(self):
+        while True:
+            await asyncio.sleep(self.options.stats_interval)
+            for c in self.connections:
+                # rates over the life of this connection, clients come and go
+                elapsed = max(time.monotonic() - c.connected_at, 1e-9)
+                print(f"{elapsed:8.0f}s lines={c.lines_sent} ({c.lines_sent / elapsed:.0f}/s) "
+                      f"msdp values={c.msdp_values_sent} ({c.msdp_values_sent / elapsed:.0f}/s) bytes={c.writer.bytes_sent} "
+                      f"queued={c.writer.queue_depth} in_flight={c.writer.bytes_in_flight}")
+
+    async def serve(self, host: str, port: int):
+        server = await asyncio.start_server(self.handle_client, host, port)
+        print(f"mock LOK server listening on {host}:{port}")
+        asyncio.create_task(self.report())
+        async with server:
+            await server.serve_forever()
+
+
+@click.command()
+@click.option("--host", default="127.0.0.1")
+@click.option("--port", default=4000, type=int)
+@click.option("--lines", "lines_per_second", default=100.0, type=float, help="Lines per second")
+@click.option("--msdp", "msdp_per_second", default=10.0, type=float, help="MSDP updates per second")
+@click.option("--burst", default=0, type=int, help="Lines to send in each burst")
+@click.option("--burst-interval", default=30.0, type=float, help="Seconds between bursts")
+@click.option("--mix", default="combat=5,chatter=2,room=1", help="Weights for combat, chatter and room output")
+@click.option("--no-ga", is_flag=True, default=False, help="Send prompts without IAC GA")
+@click.option("--mccp", is_flag=True, default=False, help="Offer MCCP2/MCCP3 compression")
+@click.option("--wilderness", is_flag=True, default=False, help="Rooms are wilderness rooms with a minimap")
+@click.option("--stats-interval", default=10.0, type=float, help="Seconds between statistics reports")
+def main(host, port, lines_per_second, msdp_per_second, burst, burst_interval, mix, no_ga, mccp, wilderness,
+         stats_interval):
+    """Run a stand-in Legends of Kallisti server"""
+    try:
+        weights = {k: float(v) for k, v in (pair.split("=") for pair in mix.split(","))}
+    except ValueError:
+        raise click.BadParameter("Use name=weight pairs such as combat=5,chatter=2,room=1", param_hint="--mix")
+
+    options = ServerOptions(lines_per_second=lines_per_second, msdp_per_second=msdp_per_second, burst=burst,
+                            burst_interval=burst_interval, ga=not no_ga, mccp=mccp, wilderness=wilderness,
+                            mix=weights, stats_interval=stats_interval)
+    try:
+        asyncio.run(MockServer(options).serve(host, port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
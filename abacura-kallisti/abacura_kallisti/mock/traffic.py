@@ -0,0 +1,221 @@
+"""Synthetic LOK output and MSDP values for the mock server"""
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass, fields
+from typing import Union
+
+from abacura_kallisti.mud.msdp import TypedMSDP
+
+IAC = b'\xff'
+SB = b'\xfa'
+SE = b'\xf0'
+MSDP = b'\x45'
+VAR = b'\x01'
+VAL = b'\x02'
+TABLE_OPEN = b'\x03'
+TABLE_CLOSE = b'\x04'
+ARRAY_OPEN = b'\x05'
+ARRAY_CLOSE = b'\x06'
+
+MSDPValue = Union[str, int, list, dict]
+
+# TypedMSDP attribute names that differ from the MSDP variable name
+RENAMES = {'cls': 'CLASS', 'str_': 'STR', 'int_': 'INT'}
+
+WHITE = "\x1b[0;37m"
+BOLD_WHITE = "\x1b[1;37m"
+MAGENTA = "\x1b[1;35m"
+RESET = "\x1b[0m"
+
+WEAPONS = ["slash", "pierce", "smash", "claw", "bite", "blast"]
+VERBS = ["scratches", "grazes", "hits", "injures", "wounds", "mauls", "decimates", "devastates",
+         "maims", "MUTILATES", "DISEMBOWELS", "MASSACRES"]
+CHANNELS = ["gossip", "market", "group", "clan", "tell", "say", "advice"]
+SPEAKERS = ["Kensho", "Grunt", "Varo", "Maelis", "Tobin", "Shadra"]
+CHATTER = ["anyone up for telluria?", "selling a glowing longsword", "heal please",
+           "where do I find the xendorian gate?", "lag monster strikes again", "grats!"]
+MOBS = ["a hill giant", "an orc warrior", "a cave bear", "a skeletal knight", "a goblin shaman"]
+ITEMS = ["a pile of gold coins", "a rusty dagger", "a glowing potion", "a tattered map", "a wooden shield"]
+AFFECTS = ["sanctuary", "haste", "bless", "armor", "fly", "detect invisible", "stoneskin"]
+TERRAIN = "....,,,::^^~~%%TT"
+WEATHER = ["Clear", "Cloudy", "Rain", "Storm"]
+
+
+def encode_msdp_value(value: MSDPValue) -> bytes:
+    """Encode a value, using MSDP tables for dicts and arrays for lists"""
+    if isinstance(value, dict):
+        body = b''.join(VAR + str(k).encode() + VAL + encode_msdp_value(v) for k, v in value.items())
+        return TABLE_OPEN + body + TABLE_CLOSE
+
+    if isinstance(value, list):
+        return ARRAY_OPEN + b''.join(VAL + encode_msdp_value(v) for v in value) + ARRAY_CLOSE
+
+    return str(value).encode()
+
+
+def msdp_sb(name: str, value: MSDPValue) -> bytes:
+    """Build a complete IAC SB MSDP VAR name VAL value IAC SE sequence"""
+    return IAC + SB + MSDP + VAR + name.encode() + VAL + encode_msdp_value(value) + IAC + SE
+
+
+@dataclass
+class Room:
+    vnum: int
+    name: str
+    exits: dict[str, int]
+    mobs: list[str]
+    items: list[str]
+    weather: str
+
+
+class TrafficGenerator:
+    """Generates combat, channel chatter, rooms, minimaps and MSDP variables"""
+
+    def __init__(self, seed: int = 0, wilderness: bool = False, group_size: int = 4):
+        self.rng = random.Random(seed)
+        self.wilderness = wilderness
+        self.group_size = group_size
+        self.room = self.make_room(1000)
+        self.values: dict[str, MSDPValue] = self.initial_values()
+        # variables changed by moves, waiting to be sent ahead of the room description
+        self.pending_msdp: dict[str, MSDPValue] = {}
+
+    @staticmethod
+    def reportable_variables() -> list[str]:
+        """Every variable that TypedMSDP understands"""
+        return [RENAMES.get(f.name, f.name.upper()) for f in fields(TypedMSDP)]
+
+    def initial_values(self) -> dict[str, MSDPValue]:
+        values = {}
+        for f in fields(TypedMSDP):
+            name = RENAMES.get(f.name, f.name.upper())
+            values[name] = 0 if f.type in (int, 'int') else ""
+
+        values.update({"CHARACTER_NAME": "Mockery", "CLASS": "Warrior", "RACE": "Human", "LEVEL": 50,
+                       "HEALTH": 1200, "HEALTH_MAX": 1200, "MANA": 900, "MANA_MAX": 900,
+                       "STAMINA": 300, "STAMINA_MAX": 300, "POSITION": "Standing", "HUNGER": 1, "THIRST": 1,
+                       "AREA_NAME": "The Wilderness" if self.wilderness else "Mock Keep",
+                       "REPORTABLE_VARIABLES": self.reportable_variables(), "REMORT_LEVELS": ""})
+        values.update(self.room_values())
+        values["GROUP"] = self.group()
+        values["AFFECTS"] = self.affects()
+        return values
+
+    def make_room(self, vnum: int) -> Room:
+        rng = self.rng
+        directions = rng.sample("nsewud", rng.randint(1, 4))
+        return Room(vnum=vnum, name=f"{rng.choice(['A Dusty', 'The Great', 'A Narrow', 'A Quiet'])} "
+                                    f"{rng.choice(['Hall', 'Corridor', 'Clearing', 'Cavern'])}",
+                    exits={d: rng.randint(1000, 30000) for d in directions},
+                    mobs=rng.sample(MOBS, rng.randint(0, 3)), items=rng.sample(ITEMS, rng.randint(0, 3)),
+                    weather=rng.choice(WEATHER) if self.wilderness else "")
+
+    def room_values(self) -> dict[str, MSDPValue]:
+        return {"ROOM_VNUM": self.room.vnum, "ROOM_NAME": self.room.name, "ROOM_EXITS": self.room.exits,
+                "ROOM_TERRAIN": "Forest" if self.wilderness else "Inside", "ROOM_WEATHER": self.room.weather}
+
+    def group(self) -> list[dict]:
+        rng = self.rng
+        members = []
+        for i, name in enumerate(SPEAKERS[:self.group_size]):
+            members.append({"name": name, "class": rng.choice(["Warrior", "Cleric", "Mage", "Rogue"]),
+                            "level": rng.randint(30, 50), "position": "Fighting", "flags": "",
+                            "health": rng.randint(0, 100), "mana": rng.randint(0, 100),
+                            "stamina": rng.randint(0, 100), "is_leader": int(i == 0), "is_subleader": 0,
+                            "with_leader": 1, "with_you": 1})
+        return members
+
+    def affects(self) -> dict[str, int]:
+        return {name: self.rng.randint(1, 24) for name in self.rng.sample(AFFECTS, 4)}
+
+    def move(self, direction: str) -> list[str]:
+        """Move through an exit (any exit leads somewhere new) and return the room description"""
+        vnum = self.room.exits.get(direction, self.rng.randint(1000, 30000))
+        self.room = self.make_room(vnum)
+        room_values = self.room_values()
+        self.values.update(room_values)
+        self.pending_msdp.update(room_values)
+        return self.room_lines()
+
+    def take_pending_msdp(self) -> dict[str, MSDPValue]:
+        """Variables changed by moves since the last call"""
+        pending, self.pending_msdp = self.pending_msdp, {}
+        return pending
+
+    def minimap(self) -> list[str]:
+        rows = []
+        for y in range(7):
+            row = "".join(self.rng.choice(TERRAIN) for _ in range(15))
+            if y == 3:
+                row = row[:7] + "@" + row[8:]
+            rows.append(f"  \x1b[0;32m{row}{RESET}")
+        return rows
+
+    def room_lines(self) -> list[str]:
+        room = self.room
+        exits = " ".join(d.upper() for d in room.exits)
+        lines = []
+        if not self.wilderness:
+            lines += self.minimap() + [""]
+            lines.append(f"{MAGENTA}{room.name} [ {exits} ]{RESET}")
+            lines.append(f"{WHITE}   Torches flicker along the walls, casting long shadows across the floor.")
+        else:
+            lines.append(f"{MAGENTA}{room.name}{RESET}")
+            lines += self.minimap()
+
+        lines += [f"{BOLD_WHITE}{mob.capitalize()} is standing here.{RESET}" for mob in room.mobs]
+        lines += [f"{WHITE}{item.capitalize()} lies here.{RESET}" for item in room.items]
+        return lines
+
+    def combat_lines(self) -> list[str]:
+        rng = self.rng
+        mob = rng.choice(MOBS)
+        verb = rng.choice(VERBS)
+        attacker = rng.choice(SPEAKERS)
+        return [f"{WHITE}Your {rng.choice(WEAPONS)} \x1b[1;31m{verb}{WHITE} {mob}!",
+                f"{WHITE}{mob.capitalize()}'s {rng.choice(WEAPONS)} \x1b[1;33m{rng.choice(VERBS)}{WHITE} you.",
+                f"\x1b[0;32m{attacker}'s {rng.choice(WEAPONS)} \x1b[1;32m{verb}\x1b[0;32m {mob}!{WHITE}"]
+
+    def chatter_lines(self) -> list[str]:
+        rng = self.rng
+        channel = rng.choice(CHANNELS)
+        speaker = rng.choice(SPEAKERS)
+        text = rng.choice(CHATTER)
+        if channel == "tell":
+            return [f"\x1b[1;31m{speaker} tells you, '{text}'{WHITE}"]
+        if channel == "say":
+            return [f"\x1b[0;36m{speaker} says, '{text}'{WHITE}"]
+        return [f"\x1b[1;35m[{channel}] {speaker}: {text}{WHITE}"]
+
+    def lines(self, mix: dict[str, float]) -> list[str]:
+        """Pick a block of output according to the weights in mix"""
+        kind = self.rng.choices(list(mix.keys()), weights=list(mix.values()))[0]
+        if kind == "combat":
+            return self.combat_lines()
+        if kind == "chatter":
+            return self.chatter_lines()
+        return self.move(self.rng.choice("nsewud"))
+
+    def prompt(self) -> str:
+        v = self.values
+        return f"{WHITE}<{v['HEALTH']}hp {v['MANA']}mp {v['STAMINA']}sp> "
+
+    def msdp_update(self) -> dict[str, MSDPValue]:
+        """Change a handful of variables the way a fight would"""
+        rng = self.rng
+        v = self.values
+        health = int(v["HEALTH"]) - rng.randint(-40, 60)
+        changed = {"HEALTH": min(max(1, health), int(v["HEALTH_MAX"])),
+                   "MANA": rng.randint(0, int(v["MANA_MAX"])),
+                   "STAMINA": rng.randint(0, int(v["STAMINA_MAX"])),
+                   "OPPONENT_HEALTH": rng.randint(0, 100), "OPPONENT_HEALTH_MAX": 100,
+                   "OPPONENT_NAME": rng.choice(MOBS), "EXPERIENCE": int(v["EXPERIENCE"]) + rng.randint(0, 500)}
+
+        if rng.random() < 0.2:
+            changed["GROUP"] = self.group()
+        if rng.random() < 0.05:
+            changed["AFFECTS"] = self.affects()
+
+        v.update(changed)
+        return changed
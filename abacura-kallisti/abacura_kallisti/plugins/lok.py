@@ -85,7 +85,7 @@ class LegendsOfKallisti(LOKPlugin):
         if account:
             self.send(account, echo_color='')
 
-    @event("core.msdp")
+    @event("core.msdp.*")
     def update_pc(self, msg: MSDPMessage):
         # PC_FIELDS = ["level"]
         # if msg.type in PC_FIELDS:
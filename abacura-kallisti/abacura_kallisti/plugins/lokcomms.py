@@ -5,7 +5,6 @@ from datetime import datetime
 import re
 from typing import Optional
 
-from rich.text import Text
 from textual.widgets import RichLog
 
 from abacura.mud import OutputMessage
@@ -77,7 +76,7 @@ class LOKComms(LOKPlugin):
         if self.comms_toggles[channel] == 'on' and speaker not in self.comms_gag_entities:
             if self.comms_textlog is None:
                 self.comms_textlog = self.session.screen.query_one("#commsTL", expect_type=RichLog)
-            self.comms_textlog.write(Text.from_ansi(msg.message))
+            self.comms_textlog.write(msg.text)
 
     #<Gossip: Taszlehoff (Shade)> 'morning'
     @action(r"^<(\w+): (\w+)( \(.*\))?> '(.*)'", color=False)
@@ -95,7 +94,7 @@ class LOKComms(LOKPlugin):
         speaker = 'MGSE'
         if self.comms_textlog is None:
             self.comms_textlog = self.session.screen.query_one("#commsTL", expect_type=RichLog)
-        self.comms_textlog.write(Text.from_ansi(msg.message))
+        self.comms_textlog.write(msg.text)
 
     #**Whitechain: 'huehuehue'
     @action (r"(^\*\*(\w+): '(.*'))", color=False)
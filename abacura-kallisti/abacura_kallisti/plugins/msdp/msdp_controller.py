@@ -2,11 +2,13 @@
 from __future__ import annotations
 
 from dataclasses import asdict, fields
+from typing import Any, Callable
 
 from rich.panel import Panel
 from rich.pretty import Pretty
 
 from abacura_kallisti.mud.affect import Affect
+from abacura_kallisti.mud.msdp import TypedMSDP
 from abacura_kallisti.plugins import LOKPlugin
 
 from abacura.mud.options.msdp import MSDPMessage
@@ -14,13 +16,49 @@ from abacura.plugins import command, CommandError
 from abacura.plugins.events import event
 
 
-# TODO: disable the abacura @msdp command and let's implement it here
+# MSDP variables whose names are reserved words in python
+RENAMES = {'CLASS': 'cls', 'STR': 'str_', 'INT': 'int_'}
+
+
+def make_converter(variable: str, field_type) -> Callable[[TypedMSDP, Any], None]:
+    """Build a function that converts an MSDP value and stores it in the TypedMSDP slot for variable"""
+    attr_name = RENAMES.get(variable, variable.lower())
+    set_slot = getattr(TypedMSDP, attr_name).__set__
+
+    if field_type is int:
+        return lambda msdp, value: set_slot(msdp, int(value) if value else 0)
+
+    if field_type is str:
+        return lambda msdp, value: set_slot(msdp, str(value))
+
+    if attr_name == 'group':
+        return lambda msdp, value: msdp.group.update_members_from_msdp(value)
+
+    if attr_name == 'affects':
+        def set_affects(msdp, value):
+            if type(value) is dict:
+                value = sorted([Affect(name, int(hrs)) for name, hrs in value.items()], key=lambda a: a.name)
+            set_slot(msdp, value)
+        return set_affects
+
+    return set_slot
+
+
+def build_converters() -> dict[str, Callable[[TypedMSDP, Any], None]]:
+    """Map each MSDP variable name to the converter for its TypedMSDP field"""
+    variables = {attr_name: variable for variable, attr_name in RENAMES.items()}
+    converters = {}
+    for f in fields(TypedMSDP):
+        variable = variables.get(f.name, f.name.upper())
+        converters[variable] = make_converter(variable, f.type)
+    return converters
+
+
 class LOKMSDPController(LOKPlugin):
     """Converts core MSDP into typed LOK MSDP variables"""
     def __init__(self):
         super().__init__()
-        self.msdp_types = {f.name: f.type for f in fields(self.msdp)}
-        print(self.msdp_types)
+        self.converters = build_converters()
 
     @command(name="msdp", override=True)
     def lok_msdp_command(self, variable: str = '', reportable: bool = False, core: bool = False) -> None:
@@ -49,34 +87,11 @@ class LOKMSDPController(LOKPlugin):
 
         self.session.output(panel, highlight=True, actionable=False)
 
-    @event("core.msdp", priority=1)
+    @event("core.msdp.*", priority=1)
     def update_lok_msdp(self, message: MSDPMessage):
-        # self.msdp.values[message.type] = message.value
-        attr_name = message.subtype.lower()
-
-        renames = {'class': 'cls', 'str': 'str_', 'int': 'int_'}
-        attr_name = renames.get(attr_name, attr_name)
-
-        if attr_name == 'ranged':
-            pass
-
-        # if not hasattr(self.msdp, attr_name):
-        #     self.output(f"[red]Missing msdp attribute {attr_name} {message.type}", markup=True)
-        #     return
-
-        value = message.value
-        if self.msdp_types[attr_name] == int:
-            value = 0 if len(message.value) == 0 else int(message.value)
-        elif self.msdp_types[attr_name] == str:
-            value = str(message.value)
-
-        if attr_name == 'group':
-            self.msdp.group.update_members_from_msdp(value)
-            self.msdp.group.update_members_from_msdp(value)
-        elif attr_name == 'affects' and type(value) is dict:
-            self.msdp.affects = sorted([Affect(name, int(hrs)) for name, hrs in value.items()], key=lambda a: a.name)
-        else:
-            setattr(self.msdp, attr_name, value)
+        if message.value == message.oldvalue:
+            return
 
-        # if name == 'MSDP_CHARACTER_NAME':
-        #     self.dispatch.dispatch(event.Event(event.NEW_CHARACTER, value))
+        converter = self.converters.get(message.subtype, None)
+        if converter is not None:
+            converter(self.msdp, message.value)
@@ -29,7 +29,7 @@ class LOKAffectsList(Static):
 
     def on_mount(self) -> None:
         self.msdp = self.screen.session.core_msdp.values
-        self.screen.session.add_listener(self.update_affects)
+        self.screen.session.add_listener(self.update_affects, weak=True)
         self.affects = self.msdp.get("AFFECTS", {})
         self.trigger = 1
 
@@ -47,7 +47,7 @@ class LOKCharacterStatic(Static):
 
     def on_mount(self):
         # Register our listener until we have a RegisterableObject to descend from
-        self.screen.session.add_listener(self.update_reactives)
+        self.screen.session.add_listener(self.update_reactives, weak=True)
         if self.c_name is None:
             self.display = False
 
@@ -72,7 +72,7 @@ class LOKCharacterStatic(Static):
 
         return table
 
-    @event(MSDPMessage.event_type)
+    @event("core.msdp.*")
     def update_reactives(self, message: MSDPMessage):
         MY_REACTIVES = {
          "CHARACTER_NAME": "c_name",
@@ -88,7 +88,7 @@ class LOKCombat(Static):
         self.opponent_block.add_columns("H","hval","S","sval")
 
     def on_mount(self):
-        self.screen.session.add_listener(self.update_combat_values)
+        self.screen.session.add_listener(self.update_combat_values, weak=True)
 
     def compose(self) -> ComposeResult:
         yield self.combat_title
@@ -175,7 +175,7 @@ class LOKCombat(Static):
         else:
             self.opponent_block.add_row("", "", "",  "")
 
-    @event("core.msdp")
+    @event("core.msdp.*")
     def update_combat_values(self, msg: MSDPMessage):
         if msg.subtype == "POSITION":
             self.combat_top.c_position = msg.value
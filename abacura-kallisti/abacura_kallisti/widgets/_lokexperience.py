@@ -59,12 +59,12 @@ class LOKExperience(Static):
 
     def on_mount(self):
         """Set up listeners, update visibility state"""
-        self.screen.session.add_listener(self.update_reactives)
+        self.screen.session.add_listener(self.update_reactives, weak=True)
         self.setup_progress_bars()
         if not self.c_level:
             self.display = False
 
-    @event("core.msdp")
+    @event("core.msdp.*")
     def update_reactives(self, message: MSDPMessage):
         """Update reactive values for this widget"""
         
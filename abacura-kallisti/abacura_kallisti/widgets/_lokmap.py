@@ -123,7 +123,7 @@ class LOKMap(Container):
 
     def on_mount(self) -> None:
         # Register our listener until we have a RegisterableObject to descend from
-        self.screen.session.director.register_object(self)
+        self.screen.session.director.register_object(self, weak=True)
         self.screen.session.dispatch(MapUpdateRequest())
 
     def unregister(self):
@@ -132,7 +132,7 @@ class LOKMap(Container):
     def on_resize(self, _event: Resize):
         self.update_map()
 
-    @event(MapUpdateMessage.event_type)
+    @event(MapUpdateMessage.event_type, deferred=True)
     def process_map_update(self, message: MapUpdateMessage):
         """Event to trigger map redraws on movement"""
 
@@ -79,7 +79,7 @@ class LOKOdometer(Static):
         yield self.queue_display
 
     def on_mount(self):
-        self.screen.session.add_listener(self.update_odometers)
+        self.screen.session.add_listener(self.update_odometers, weak=True)
         self.queue_display.add_column("Mission", key="mission", width=10)
         self.queue_display.add_column("Elapsed", key="elapsed")
         self.queue_display.add_column("Kills/h", key="kills")
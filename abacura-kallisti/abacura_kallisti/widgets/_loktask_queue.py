@@ -21,14 +21,14 @@ class LOKTaskQueue(Static):
         yield self.queue_display
 
     def on_mount(self):
-        self.screen.session.add_listener(self.update_task_queue)
-        self.screen.session.add_listener(self.update_mud_queue)
+        self.screen.session.add_listener(self.update_task_queue, weak=True)
+        self.screen.session.add_listener(self.update_mud_queue, weak=True)
         self.queue_display.add_column("Cmd", key="cmd")
         self.queue_display.add_column("Wait", key="wait")
         self.queue_display.add_column("Duration", key="duration")
         self.queue_display.add_column("Queue", key="queue")
 
-    @event("core.msdp", priority=1)
+    @event("core.msdp.*", priority=1)
     def update_mud_queue(self, message: MSDPMessage):
         if message.subtype == "QUEUE":
             self.queue_title.update(f"Task Queue [{message.value}]")
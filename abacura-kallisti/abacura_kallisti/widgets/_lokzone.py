@@ -18,7 +18,7 @@ class LOKZoneHeading(Static):
         self.classes = "WidgetTitle"
 
     def on_mount(self):
-        self.screen.session.add_listener(self.update_zone_name)
+        self.screen.session.add_listener(self.update_zone_name, weak=True)
 
     def render(self) -> str:
         return f"{self.z_name}"
@@ -51,9 +51,9 @@ class LOKZoneInfo(Static):
         self.display = False
     
     def on_mount(self):
-        self.screen.session.add_listener(self.update_room_name)
-        self.screen.session.add_listener(self.update_room_vnum)
-        self.screen.session.add_listener(self.update_room_weather)
+        self.screen.session.add_listener(self.update_room_name, weak=True)
+        self.screen.session.add_listener(self.update_room_vnum, weak=True)
+        self.screen.session.add_listener(self.update_room_weather, weak=True)
 
 
     def render(self) -> str:
@@ -0,0 +1,97 @@
+"""
+LOK MSDP controller cost per update
+
+Feeds MSDP messages from the mock server's traffic generator through the
+original update_lok_msdp logic and the precompiled converter table, and
+reports the cost per update and the share of one core at 1k and 10k updates/s.
+
+usage: python msdp_controller.py [--updates N]
+"""
+import argparse
+import time
+from dataclasses import fields
+
+from abacura.mud.options.msdp import MSDPMessage
+from abacura_kallisti.mock.traffic import TrafficGenerator
+from abacura_kallisti.mud.affect import Affect
+from abacura_kallisti.mud.msdp import TypedMSDP
+from abacura_kallisti.plugins.msdp.msdp_controller import build_converters
+
+
+def legacy_update(msdp: TypedMSDP, msdp_types: dict, message: MSDPMessage):
+    """The original update_lok_msdp"""
+    attr_name = message.subtype.lower()
+
+    renames = {'class': 'cls', 'str': 'str_', 'int': 'int_'}
+    attr_name = renames.get(attr_name, attr_name)
+
+    value = message.value
+    if msdp_types[attr_name] == int:
+        value = 0 if len(message.value) == 0 else int(message.value)
+    elif msdp_types[attr_name] == str:
+        value = str(message.value)
+
+    if attr_name == 'group':
+        msdp.group.update_members_from_msdp(value)
+        msdp.group.update_members_from_msdp(value)
+    elif attr_name == 'affects' and type(value) is dict:
+        msdp.affects = sorted([Affect(name, int(hrs)) for name, hrs in value.items()], key=lambda a: a.name)
+    else:
+        setattr(msdp, attr_name, value)
+
+
+def stringify(value):
+    """Values arrive from the core MSDP decoder as strings, dicts and lists"""
+    if isinstance(value, dict):
+        return {k: stringify(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [stringify(v) for v in value]
+    return str(value)
+
+
+def make_messages(count: int) -> list[MSDPMessage]:
+    traffic = TrafficGenerator(seed=1)
+    values = {}
+    messages = []
+    while len(messages) < count:
+        for var, value in traffic.msdp_update().items():
+            value = stringify(value)
+            messages.append(MSDPMessage(subtype=var, value=value, oldvalue=values.get(var)))
+            values[var] = value
+    return messages[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=200000)
+    args = parser.parse_args()
+
+    messages = make_messages(args.updates)
+    unchanged = sum(m.value == m.oldvalue for m in messages)
+    print(f"{len(messages):,} updates, {unchanged:,} unchanged")
+
+    msdp = TypedMSDP()
+    msdp_types = {f.name: f.type for f in fields(msdp)}
+    start = time.perf_counter()
+    for message in messages:
+        legacy_update(msdp, msdp_types, message)
+    legacy = (time.perf_counter() - start) / len(messages)
+
+    msdp = TypedMSDP()
+    converters = build_converters()
+    start = time.perf_counter()
+    for message in messages:
+        if message.value == message.oldvalue:
+            continue
+        converter = converters.get(message.subtype, None)
+        if converter is not None:
+            converter(msdp, message.value)
+    table = (time.perf_counter() - start) / len(messages)
+
+    print(f"{'':>12} {'us/update':>10} {'cpu @1k/s':>10} {'cpu @10k/s':>11}")
+    for name, cost in (("legacy", legacy), ("converters", table)):
+        print(f"{name:>12} {cost * 1e6:>10.2f} {cost * 1e3:>9.2%} {cost * 1e4:>10.2%}")
+
+
+if __name__ == "__main__":
+    main()
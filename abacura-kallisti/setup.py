@@ -19,5 +19,9 @@ setup(
         "abacura~=0.0.13",
         "pillow",
         ],
+    entry_points="""
+    [console_scripts]
+    lok-mock-server=abacura_kallisti.mock.server:main
+    """,
 )
 